@@ -42,9 +42,12 @@ INSTALLED_APPS = [
     'users',
     'recipe',
     'followers',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',
+    'monitoring.middleware.RequestProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -54,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.middleware.CPUProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -160,13 +164,23 @@ EMAIL_HOST_PASSWORD = config('EMAIL_PASSWORD')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'monitoring.authentication.TimedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # orjson/msgspec when installed, the standard library otherwise.
+    'DEFAULT_RENDERER_CLASSES': (
+        'recipe.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'recipe.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -207,4 +221,151 @@ SIMPLE_JWT = {
 }
 
 # Password reset token lifetime
-DJANGO_REST_MULTITOKENAUTH_RESET_TOKEN_EXPIRY_TIME = 3  # in hours
\ No newline at end of file
+DJANGO_REST_MULTITOKENAUTH_RESET_TOKEN_EXPIRY_TIME = 3  # in hours
+
+# Home feed: authors with more followers than this are not fanned out on
+# write; their recipes are merged into followers' feeds at read time.
+FEED_FANOUT_FOLLOWER_THRESHOLD = 5000
+FEED_BACKFILL_LIMIT = 200
+
+
+# Caches
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'yummly': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yummly',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'recipes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipes',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Recipe detail and list payload cache: seconds an entry lives. Entries are
+# keyed by the same database version as the ETag, so a per-process ALIAS
+# stays correct with several workers; a shared one (Redis, Memcached) only
+# raises the hit ratio.
+RECIPE_CACHE = {
+    'ALIAS': 'recipes',
+    'TTL': 600,
+}
+
+# Per-request profiling (monitoring app): Server-Timing headers and the
+# SLOWEST slowest requests per worker at /api/monitoring/slowest-requests/.
+# Statements run DUPLICATE_THRESHOLD or more times in a request are
+# reported as duplicated (N+1 queries). Off unless enabled.
+REQUEST_PROFILING = {
+    'ENABLED': config('REQUEST_PROFILING', default=False, cast=bool),
+    'SLOWEST': 50,
+    'DUPLICATE_THRESHOLD': 2,
+    'SERVER_TIMING': True,
+}
+
+# CPU profiles of single requests (monitoring app), taken when a staff user
+# sends the HEADER header or for a SAMPLE_RATE fraction of all requests,
+# with the 'sample' (stack sampling) or 'cprofile' profiler. The KEEP
+# slowest profiles per route are stored in the database; list and export
+# them with `manage.py cpu_profiles`. Off unless enabled.
+CPU_PROFILING = {
+    'ENABLED': config('CPU_PROFILING', default=False, cast=bool),
+    'PROFILER': 'sample',
+    'INTERVAL': 0.001,
+    'SAMPLE_RATE': config('CPU_PROFILING_SAMPLE_RATE', default=0.0, cast=float),
+    'HEADER': 'X-Profile',
+    'KEEP': 5,
+}
+
+# Prometheus metrics at /metrics (monitoring app). Under gunicorn set
+# PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) so the workers' samples
+# are summed. Scrapers must send TOKEN as a bearer token; without one the
+# metrics are only served with DEBUG on.
+METRICS = {
+    'ENABLED': True,
+    'TOKEN': config('METRICS_TOKEN', default=''),
+}
+
+# Yummly proxy response cache: seconds an answer stays fresh per endpoint,
+# and how long a stale answer may still be served while it is refreshed.
+YUMMLY_CACHE = {
+    'ALIAS': 'yummly',
+    'DEFAULT_TTL': 300,
+    'STALE_TTL': 3600,
+    'TTLS': {
+        'categories/list': 24 * 60 * 60,
+        'feeds/auto-complete': 60 * 60,
+        'feeds/list': 15 * 60,
+        'feeds/list-similarities': 60 * 60,
+        'feeds/search': 15 * 60,
+    },
+}
+
+# Yummly (RapidAPI) HTTP client
+YUMMLY_CLIENT = {
+    'API_KEY': config('RAPIDAPI_KEY', default='0a6b63336amshbafb527ce18a6c9p184c71jsnaa99550c9707'),
+    'POOL_SIZE': 10,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'MAX_RETRIES': 2,
+    'BACKOFF': 0.2,
+    'FAILURE_THRESHOLD': 5,
+    'RECOVERY_TIME': 30,
+}
+
+# Full-text recipe search index (SQLite FTS5 file). Tests use a temporary
+# one (config.test_runner). The file is per machine: searches rebuild it
+# when missing and index recipes saved elsewhere every SYNC_INTERVAL seconds.
+RECIPE_SEARCH_INDEX = {
+    'PATH': BASE_DIR / 'recipe_search.sqlite3',
+    'SYNC_INTERVAL': 60,
+}
+
+TEST_RUNNER = 'config.test_runner.TestRunner'
+
+# Recommenders: each worker keeps its indexes in memory and rebuilds them
+# in the background, at most every REBUILD_INTERVAL seconds, after recipes
+# change. Pantry staples count as available in "what can I cook" queries.
+# The similar-recipes index is patched from a log of changed recipes instead.
+# The collaborative model is trained by `manage.py train_recommender` and
+# published in the database; workers pick up a new one within
+# MODEL_CHECK_INTERVAL seconds and unpack it into their local MODEL_DIR.
+RECIPE_RECOMMENDER = {
+    'REBUILD_INTERVAL': 60,
+    'BACKGROUND_REBUILD': True,
+    'PANTRY_STAPLES': ['salt', 'pepper', 'black pepper', 'water', 'oil', 'olive oil', 'vegetable oil'],
+    'MODEL_DIR': BASE_DIR / 'recommender_model',
+    'MODEL_CHECK_INTERVAL': 30,
+    'NEIGHBORS': 50,
+    'LIKE_WEIGHT': 1.0,
+    'BOOKMARK_WEIGHT': 2.0,
+    'HISTORY_LIMIT': 200,
+    # Similar recipes: hashed feature columns and IVF parameters. Catalogues
+    # smaller than EXACT_BELOW recipes are scored exhaustively.
+    'SIMILAR': {
+        'FEATURES': 2 ** 14,
+        'LISTS': None,
+        'PROBES': 32,
+        'CENTROID_TERMS': 256,
+        'EXACT_BELOW': 20000,
+        'MAX_OVERLAY': 5000,
+    },
+}
+
+# Time-of-day feed snapshots: each daypart's Yummly feed plus its most liked
+# local recipes, rendered to PATH by `manage.py build_feed_snapshots` (run it
+# from cron every REFRESH_INTERVAL seconds) or, with SCHEDULE on, by a
+# background thread in every worker. Otherwise the first request to find a
+# snapshot older than REFRESH_INTERVAL rebuilds it in the background. A
+# request finding none waits up to BUILD_TIMEOUT seconds for it to be built.
+FEED_SNAPSHOTS = {
+    'PATH': BASE_DIR / 'feed_snapshots',
+    'REFRESH_INTERVAL': 15 * 60,
+    'YUMMLY_LIMIT': 5,
+    'LOCAL_LIMIT': 5,
+    'SCHEDULE': False,
+    'BUILD_TIMEOUT': 10,
+}
@@ -0,0 +1,25 @@
+import tempfile
+from pathlib import Path
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests against a recipe search index in a temporary directory.
+    Any test saving a recipe updates the index on commit, which would
+    otherwise write into the developer's own index.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._search_directory = tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
+        self._search_override = override_settings(
+            RECIPE_SEARCH_INDEX={'PATH': Path(self._search_directory.name) / 'recipe_search.sqlite3'})
+        self._search_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._search_override.disable()
+        self._search_directory.cleanup()
+        super().teardown_test_environment(**kwargs)
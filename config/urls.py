@@ -4,11 +4,15 @@ from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from monitoring.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('users.urls', namespace='users')),
     path('api/recipe/', include('recipe.urls', namespace='recipe')),
     path('api/followers/', include('followers.urls', namespace='follower')),
+    path('api/monitoring/', include('monitoring.urls', namespace='monitoring')),
+    path('metrics', metrics_view, name='metrics'),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
     path('api/user/password/reset/',
          include('django_rest_passwordreset.urls', namespace='password_reset')),
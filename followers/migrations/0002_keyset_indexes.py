@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('followers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follower',
+            index=models.Index(fields=['to_user', 'from_user'], name='follower_to_user_idx'),
+        ),
+    ]
@@ -29,11 +29,19 @@ class FollowingManager(models.Manager):
 
         Follower.objects.create(from_user=user, to_user=to_user)
 
+        from recipe.feed import backfill_feed, update_celebrity
+        update_celebrity(to_user.pk)
+        backfill_feed(user, to_user)
+
     def remove_follow(self, user, to_user):
         """ Stop following user """
         try:
             qs = Follower.objects.filter(to_user=to_user, from_user=user)
             qs.delete()
+
+            from recipe.feed import prune_feed, update_celebrity
+            prune_feed(user, to_user)
+            update_celebrity(to_user.pk)
             return True
         except Follower.DoesNotExist:
             return False
@@ -57,6 +65,9 @@ class Follower(models.Model):
         verbose_name = _("Follower")
         verbose_name_plural = _("Followers")
         unique_together = ("from_user", "to_user")
+        indexes = [
+            models.Index(fields=["to_user", "from_user"], name="follower_to_user_idx"),
+        ]
 
     def __str__(self):
         return f"User  #{self.from_user_id} is following #{self.to_user_id} "
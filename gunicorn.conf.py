@@ -0,0 +1,24 @@
+"""
+gunicorn settings, read automatically from the working directory.
+
+Each worker writes its Prometheus samples to files in
+PROMETHEUS_MULTIPROC_DIR, which /metrics sums; the directory is emptied
+when the server starts so samples of a previous run are not counted.
+"""
+import os
+import shutil
+import tempfile
+
+multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'recipe-api-metrics'))
+
+
+def on_starting(server):
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
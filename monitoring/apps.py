@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    name = 'monitoring'
+
+    def ready(self):
+        from .metrics import count_query, get_metrics_setting
+        from .profiling import get_profiling_setting, install_execute_wrapper, install_instrumentation
+
+        if get_metrics_setting('ENABLED'):
+            install_execute_wrapper(count_query)
+        if get_profiling_setting('ENABLED'):
+            install_instrumentation()
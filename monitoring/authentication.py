@@ -0,0 +1,29 @@
+import time
+
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .metrics import AUTH_LATENCY
+from .profiling import span
+
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` observing the time taken to authenticate, by
+    outcome: ``authenticated``, ``anonymous`` (no token) or ``failed``.
+    """
+
+    def authenticate(self, request):
+        start = time.perf_counter()
+        outcome = 'failed'
+        try:
+            with span('auth'):
+                result = super().authenticate(request)
+            outcome = 'anonymous' if result is None else 'authenticated'
+            return result
+        finally:
+            AUTH_LATENCY.labels(outcome).observe(time.perf_counter() - start)
+
+
+class TimedJWTScheme(SimpleJWTScheme):
+    target_class = TimedJWTAuthentication
@@ -0,0 +1,243 @@
+"""
+On-demand CPU profiles of individual requests.
+
+``CPUProfilingMiddleware`` profiles a request when a staff user sends the
+``CPU_PROFILING['HEADER']`` header, or at random for a ``SAMPLE_RATE``
+fraction of requests. Two profilers are available:
+
+* ``sample``: a thread that records the stack of the request thread about
+  every ``INTERVAL`` seconds. Cheap enough for production; the result is a
+  set of collapsed stacks (one line per distinct stack with the
+  microseconds it was seen for) that flame graph tools and speedscope
+  read.
+* ``cprofile``: the standard library's deterministic profiler. Exact call
+  counts and times, at several times the cost of the request.
+
+Profiles are stored in the database (``CPUProfile``), shared by every
+worker and dyno, keeping only the ``KEEP`` slowest per route. The
+``cpu_profiles`` management command lists and exports them.
+"""
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .models import CPUProfile
+
+DEFAULTS = {
+    'ENABLED': False,
+    'PROFILER': 'sample',
+    'INTERVAL': 0.001,
+    'SAMPLE_RATE': 0.0,
+    'HEADER': 'X-Profile',
+    'KEEP': 5,
+}
+
+# Export formats of each kind of profile, the default first.
+FORMATS = {
+    'sample': ('speedscope', 'collapsed'),
+    'cprofile': ('text', 'pstats'),
+}
+
+
+def get_cpu_profiling_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'CPU_PROFILING', {})}[name]
+
+
+def frame_name(code):
+    filename = code.co_filename
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread from a background thread. ``stacks``
+    maps each stack, outermost frame first and frames joined by ``;``, to
+    the microseconds it was seen for.
+
+    The sampler needs the GIL to run, so it wakes up at most every
+    ``sys.getswitchinterval()`` while the sampled thread computes; each
+    sample is weighted by the time since the previous one, not by the
+    nominal interval. Requests shorter than that may record no stacks;
+    use ``cprofile`` for those.
+    """
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval or get_cpu_profiling_setting('INTERVAL')
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        names = {}
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code not in names:
+                    names[code] = frame_name(code)
+                stack.append(names[code])
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += round(elapsed * 1_000_000)
+
+
+def profile_call(profiler, function):
+    """
+    Run ``function()`` under ``profiler`` (``sample`` or ``cprofile``).
+    Returns its result and the profile data: collapsed stacks, or the
+    ``cProfile.Profile``.
+    """
+    if profiler == 'cprofile':
+        profile = cProfile.Profile()
+        result = profile.runcall(function)
+        return result, profile
+    sampler = StackSampler()
+    sampler.start()
+    try:
+        result = function()
+    finally:
+        sampler.stop()
+    return result, dict(sampler.stacks)
+
+
+def to_speedscope(meta, stacks):
+    """
+    Collapsed stacks as a speedscope sampled profile.
+    """
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, microseconds in stacks.items():
+        sample = []
+        for name in stack.split(';'):
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({'name': name})
+            sample.append(index[name])
+        samples.append(sample)
+        weights.append(microseconds / 1000)
+    name = f"{meta['method']} {meta['path']}"
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'recipe-api',
+        'activeProfileIndex': 0,
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled', 'name': name, 'unit': 'milliseconds',
+            'startValue': 0, 'endValue': sum(weights), 'samples': samples, 'weights': weights,
+        }],
+    }
+
+
+class ProfileStore:
+    """
+    Profiles in the ``CPUProfile`` table, the ``keep`` slowest per route.
+    """
+    # Metadata fields, as passed to save() and returned by list().
+    fields = ('route', 'method', 'path', 'status', 'started_at', 'duration_ms', 'profiler', 'interval')
+
+    def __init__(self, keep=None):
+        self._keep = keep
+
+    @property
+    def keep(self):
+        return self._keep or get_cpu_profiling_setting('KEEP')
+
+    def save(self, meta, data):
+        """
+        Store a profile unless ``keep`` slower ones of its route are stored.
+        Returns its id, or None when it was not kept.
+        """
+        route = meta['route'] or 'unmatched'
+        of_route = CPUProfile.objects.filter(route=route)
+        threshold = of_route.order_by('-duration_ms').values_list('duration_ms', flat=True)[self.keep - 1:self.keep]
+        if threshold and meta['duration_ms'] <= threshold[0]:
+            return None
+
+        if meta['profiler'] == 'cprofile':
+            data = marshal.dumps(pstats.Stats(data).stats)
+        else:
+            data = json.dumps(data).encode()
+        profile = CPUProfile.objects.create(**{**meta, 'route': route, 'data': data})
+        stale = of_route.order_by('-duration_ms', '-pk').values_list('pk', flat=True)[self.keep:]
+        CPUProfile.objects.filter(pk__in=list(stale)).delete()
+        return profile.pk
+
+    def list(self, route=None):
+        """
+        Metadata of the stored profiles, slowest first, each with its
+        ``id``.
+        """
+        profiles = CPUProfile.objects.order_by('-duration_ms')
+        if route:
+            profiles = profiles.filter(route=route)
+        return [{'id': values.pop('pk'), **values} for values in profiles.values('pk', *self.fields)]
+
+    def export(self, profile_id, format=None):
+        """
+        The profile ``profile_id`` as bytes in ``format``: ``speedscope``
+        or ``collapsed`` for sampled profiles, ``text`` or ``pstats`` for
+        cProfile ones, the first by default. Raises ``LookupError`` for
+        unknown ids and ``ValueError`` for formats the profile cannot be
+        exported to.
+        """
+        try:
+            profile = CPUProfile.objects.get(pk=int(profile_id))
+        except (ValueError, CPUProfile.DoesNotExist):
+            raise LookupError(f'No profile {profile_id}')
+        format = format or FORMATS[profile.profiler][0]
+        if format not in FORMATS[profile.profiler]:
+            raise ValueError(f"A {profile.profiler} profile exports to {' or '.join(FORMATS[profile.profiler])}")
+
+        data = bytes(profile.data)
+        if format == 'collapsed':
+            stacks = json.loads(data)
+            return ''.join(f'{stack} {microseconds}\n' for stack, microseconds in stacks.items()).encode()
+        if format == 'speedscope':
+            meta = {'method': profile.method, 'path': profile.path}
+            return json.dumps(to_speedscope(meta, json.loads(data))).encode()
+        if format == 'pstats':
+            # The file format of pstats.Stats.dump_stats().
+            return data
+        # pstats.Stats reads marshalled statistics from files only.
+        with tempfile.NamedTemporaryFile(suffix='.prof', delete=False) as f:
+            f.write(data)
+        try:
+            out = io.StringIO()
+            pstats.Stats(f.name, stream=out).sort_stats('cumulative').print_stats(50)
+        finally:
+            os.unlink(f.name)
+        return out.getvalue().encode()
+
+    def clear(self):
+        CPUProfile.objects.all().delete()
+
+
+profile_store = ProfileStore()
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.cpu_profiling import FORMATS, profile_store
+
+
+class Command(BaseCommand):
+    """
+    List the CPU profiles stored by ``CPUProfilingMiddleware``, slowest
+    first, or export one of them: sampled profiles as collapsed stacks
+    (for flamegraph.pl and similar) or speedscope JSON, cProfile ones as a
+    ``pstats`` dump (snakeviz, ``python -m pstats``) or a text report.
+    """
+    help = 'List or export stored request CPU profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', help='Only list profiles of this route name, e.g. recipe:feed.')
+        parser.add_argument('--export', metavar='ID', help='Export the profile with this id.')
+        parser.add_argument('--format', choices=sorted({name for names in FORMATS.values() for name in names}),
+                            help='Export format; speedscope or text by default.')
+        parser.add_argument('--output', help='Write the export to this file instead of stdout; '
+                                              'needed for the binary pstats format.')
+        parser.add_argument('--clear', action='store_true', help='Delete every stored profile.')
+
+    def handle(self, *args, route, export, format, output, clear, **options):
+        if clear:
+            profile_store.clear()
+            self.stdout.write(self.style.SUCCESS('Deleted every stored profile.'))
+        elif export:
+            self.export(export, format, output)
+        else:
+            self.list(route)
+
+    def list(self, route):
+        profiles = profile_store.list(route)
+        if not profiles:
+            self.stdout.write('No profiles stored.')
+            return
+        self.stdout.write(f"{'id':>8} {'route':<32} {'ms':>9} {'status':>6} {'profiler':<8} {'started at':<32} path")
+        for profile in profiles:
+            self.stdout.write(f"{profile['id']:>8} {profile['route']:<32} {profile['duration_ms']:>9.1f} "
+                              f"{profile['status']:>6} {profile['profiler']:<8} "
+                              f"{profile['started_at'].isoformat():<32} {profile['method']} {profile['path']}")
+
+    def export(self, profile_id, format, output):
+        if format == 'pstats' and not output:
+            raise CommandError('pstats exports are binary; pass --output.')
+        try:
+            data = profile_store.export(profile_id, format)
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        if output:
+            with open(output, 'wb') as f:
+                f.write(data)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {profile_id} to {output}.'))
+        else:
+            self.stdout.write(data.decode(), ending='')
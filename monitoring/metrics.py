@@ -0,0 +1,112 @@
+"""
+Prometheus metrics of the API, exposed at ``/metrics``.
+
+Under gunicorn every worker is a separate process; with the
+``PROMETHEUS_MULTIPROC_DIR`` environment variable set (``gunicorn.conf.py``
+does) each worker writes its samples to memory-mapped files in that
+directory and ``/metrics`` adds up the files of all workers. Without it
+samples live in the process, as under ``runserver`` and in tests.
+
+Cache hit ratios are left to the query language, e.g.
+``rate(cache_events_total{event="hits"}[5m])`` over the sum of hits and
+misses.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from prometheus_client import Counter, Histogram
+
+from .profiling import span
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TOKEN': '',
+}
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route.', ['method', 'route', 'status'])
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries run per request, by route.', ['route'], buckets=QUERY_BUCKETS)
+REQUEST_DB_TIME = Counter(
+    'http_request_db_seconds', 'Time spent in database queries, by route.', ['route'])
+CACHE_EVENTS = Counter(
+    'cache_events', 'Lookups and builds of the payload caches, by outcome.', ['cache', 'event'])
+UPSTREAM_LATENCY = Histogram(
+    'upstream_request_duration_seconds', 'Duration of calls to upstream APIs, retries included.',
+    ['service', 'endpoint'])
+UPSTREAM_ERRORS = Counter(
+    'upstream_request_errors', 'Failed calls to upstream APIs, by the status reported.',
+    ['service', 'endpoint', 'status'])
+AUTH_LATENCY = Histogram(
+    'jwt_authentication_duration_seconds', 'Time to authenticate a request from its JWT.', ['outcome'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1))
+
+_request_queries = ContextVar('request_queries', default=None)
+
+
+def get_metrics_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}[name]
+
+
+class QueryTally:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+@contextmanager
+def count_queries():
+    """
+    Tally the database queries run by the enclosed code.
+    """
+    tally = QueryTally()
+    token = _request_queries.set(tally)
+    try:
+        yield tally
+    finally:
+        _request_queries.reset(token)
+
+
+def count_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding each query to the current tally.
+    """
+    tally = _request_queries.get()
+    if tally is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tally.count += 1
+        tally.seconds += time.perf_counter() - start
+
+
+def observe_request(method, route, status, seconds, tally):
+    REQUEST_LATENCY.labels(method, route, status).observe(seconds)
+    REQUEST_QUERIES.labels(route).observe(tally.count)
+    REQUEST_DB_TIME.labels(route).inc(tally.seconds)
+
+
+@contextmanager
+def upstream_call(service, endpoint):
+    """
+    Time a call to an upstream API, for the metrics and for the ``service``
+    span of a profiled request. An exception counts as an error with its
+    ``status_code``, if it has one.
+    """
+    start = time.perf_counter()
+    try:
+        with span(service):
+            yield
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(service, endpoint, getattr(e, 'status_code', 'error')).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(service, endpoint).observe(time.perf_counter() - start)
@@ -0,0 +1,165 @@
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .cpu_profiling import get_cpu_profiling_setting, profile_call, profile_store
+from .metrics import count_queries, get_metrics_setting, observe_request
+from .profiling import get_profiling_setting, profile_request, slowest_requests
+
+logger = logging.getLogger(__name__)
+
+
+def _route(request):
+    # The URL pattern name rather than the path, to keep label values few.
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile every request: time per span, query count, database time and
+    duplicated queries. Adds a ``Server-Timing`` header and keeps the
+    slowest profiles for the ``monitoring:slowest-requests`` endpoint.
+
+    Opt-in with ``REQUEST_PROFILING['ENABLED']``; when disabled the
+    middleware removes itself from the chain at startup.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_profiling_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = get_profiling_setting('SERVER_TIMING')
+        self.threshold = get_profiling_setting('DUPLICATE_THRESHOLD')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with profile_request(request.method, request.path) as profile:
+            response = self.get_response(request)
+        self.finish(request, response, profile)
+        return response
+
+    async def __acall__(self, request):
+        with profile_request(request.method, request.path) as profile:
+            response = await self.get_response(request)
+        self.finish(request, response, profile)
+        return response
+
+    def finish(self, request, response, profile):
+        profile.route = _route(request)
+        profile.status = response.status_code
+        slowest_requests.add(profile)
+        if self.server_timing:
+            response['Server-Timing'] = profile.server_timing(self.threshold)
+
+
+class MetricsMiddleware:
+    """
+    Observe the latency and database queries of every request in the
+    Prometheus metrics of ``monitoring.metrics``, labelled by route.
+
+    On unless ``METRICS['ENABLED']`` is off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_metrics_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with count_queries() as tally:
+            response = self.get_response(request)
+        self.finish(request, response, time.perf_counter() - start, tally)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with count_queries() as tally:
+            response = await self.get_response(request)
+        self.finish(request, response, time.perf_counter() - start, tally)
+        return response
+
+    def finish(self, request, response, seconds, tally):
+        observe_request(request.method, _route(request) or 'unmatched', response.status_code, seconds, tally)
+
+
+class CPUProfilingMiddleware:
+    """
+    Profile the CPU time of a request, when a staff user asks for it with
+    the ``CPU_PROFILING['HEADER']`` header or at random for a
+    ``SAMPLE_RATE`` fraction of requests, and store the profile if it is
+    among the slowest of its route (``monitoring.cpu_profiling``). A
+    stored profile's id is returned in the ``X-Profile-Id`` header.
+
+    Opt-in with ``CPU_PROFILING['ENABLED']``. Profilers follow one thread,
+    so this middleware is synchronous; under ASGI the view runs in a
+    worker thread along with it.
+    """
+
+    def __init__(self, get_response):
+        if not get_cpu_profiling_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.profiler = get_cpu_profiling_setting('PROFILER')
+        self.sample_rate = get_cpu_profiling_setting('SAMPLE_RATE')
+        self.header = get_cpu_profiling_setting('HEADER')
+
+    def __call__(self, request):
+        if not (random.random() < self.sample_rate or (self.header in request.headers and _is_staff(request))):
+            return self.get_response(request)
+
+        started_at = timezone.now()
+        start = time.perf_counter()
+        response, data = profile_call(self.profiler, lambda: self.get_response(request))
+        duration = time.perf_counter() - start
+        try:
+            profile_id = profile_store.save({
+                'route': _route(request),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'started_at': started_at,
+                'duration_ms': round(duration * 1000, 3),
+                'profiler': self.profiler,
+                'interval': get_cpu_profiling_setting('INTERVAL'),
+            }, data)
+        except Exception:
+            # Never fail the request over its profile.
+            logger.exception('Failed to store a CPU profile')
+            profile_id = None
+        if profile_id:
+            response['X-Profile-Id'] = profile_id
+        return response
+
+
+def _is_staff(request):
+    """
+    Whether the request comes from a staff user, by session or JWT. API
+    views authenticate later, in DRF, so the token is checked here.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user, _ = JWTAuthentication().authenticate(request) or (None, None)
+        except (AuthenticationFailed, InvalidToken):
+            return False
+    return bool(user and user.is_staff)
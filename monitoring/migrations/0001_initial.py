@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-18 21:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CPUProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('route', models.CharField(max_length=200)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.TextField()),
+                ('status', models.PositiveSmallIntegerField()),
+                ('started_at', models.DateTimeField()),
+                ('duration_ms', models.FloatField()),
+                ('profiler', models.CharField(max_length=20)),
+                ('interval', models.FloatField()),
+                ('data', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'CPU profile',
+                'verbose_name_plural': 'CPU profiles',
+                'indexes': [models.Index(fields=['route', '-duration_ms'], name='monitoring_profile_route_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class CPUProfile(models.Model):
+    """
+    A request CPU profile kept by ``CPUProfilingMiddleware``: collapsed
+    stacks (JSON) for the ``sample`` profiler, marshalled ``pstats`` data
+    for ``cprofile``. Kept in the database so every worker and dyno, and
+    the ``cpu_profiles`` command, see the same profiles.
+    """
+    route = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    status = models.PositiveSmallIntegerField()
+    started_at = models.DateTimeField()
+    duration_ms = models.FloatField()
+    profiler = models.CharField(max_length=20)
+    interval = models.FloatField()
+    data = models.BinaryField()
+
+    class Meta:
+        verbose_name = _('CPU profile')
+        verbose_name_plural = _('CPU profiles')
+        indexes = [
+            models.Index(fields=['route', '-duration_ms'], name='monitoring_profile_route_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.1f} ms)'
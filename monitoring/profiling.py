@@ -0,0 +1,240 @@
+"""
+Per-request timing and SQL instrumentation.
+
+``RequestProfilingMiddleware`` makes a ``RequestProfile`` current for the
+duration of a request. Code that wants its time accounted for wraps the
+work in ``span(name)``; database queries are recorded by an execute
+wrapper installed on every connection. Both are a context variable lookup
+when no request is being profiled.
+
+Queries are fingerprinted by their SQL with parameters left out and ``IN``
+lists collapsed, so the same statement run once per row of a list (an N+1)
+shows up as one fingerprint with a high count.
+
+Profiles of the slowest requests are kept in memory per process, in
+``slowest_requests``.
+"""
+import heapq
+import itertools
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils import timezone
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SLOWEST': 50,
+    'DUPLICATE_THRESHOLD': 2,
+    'SERVER_TIMING': True,
+}
+
+_current = ContextVar('request_profile', default=None)
+# Names of the spans open in the current task; concurrent tasks each get
+# their own copy, so overlapping upstream calls are all counted.
+_open_spans = ContextVar('open_spans', default=frozenset())
+
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+
+
+def get_profiling_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_PROFILING', {})}[name]
+
+
+def fingerprint(sql):
+    return IN_LIST.sub('IN (...)', sql)
+
+
+class RequestProfile:
+    """
+    Time spent in a request, per span name, and the queries it ran.
+    """
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.started_at = timezone.now()
+        self.duration = 0.0
+        self.spans = {}
+        self.query_count = 0
+        self.query_time = 0.0
+        self.fingerprints = Counter()
+
+    def add_span(self, name, seconds):
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + seconds, count + 1)
+
+    def add_query(self, sql, seconds):
+        self.query_count += 1
+        self.query_time += seconds
+        self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        """
+        ``(fingerprint, count)`` of statements run at least ``threshold``
+        times, most repeated first.
+        """
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+    def server_timing(self, threshold):
+        """
+        ``Server-Timing`` header value, durations in milliseconds.
+        """
+        duplicated = sum(count for _, count in self.duplicates(threshold))
+        entries = [f'db;dur={self.query_time * 1000:.1f};desc="{self.query_count} queries, {duplicated} duplicated"']
+        for name, (seconds, count) in sorted(self.spans.items()):
+            entries.append(f'{name};dur={seconds * 1000:.1f};desc="{count} calls"')
+        entries.append(f'total;dur={self.duration * 1000:.1f}')
+        return ', '.join(entries)
+
+    def as_dict(self, threshold):
+        return {
+            'method': self.method,
+            'path': self.path,
+            'route': self.route,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 2),
+            'queries': self.query_count,
+            'db_ms': round(self.query_time * 1000, 2),
+            'spans': {name: {'ms': round(seconds * 1000, 2), 'calls': count}
+                      for name, (seconds, count) in self.spans.items()},
+            'duplicated_queries': [{'sql': sql, 'count': count} for sql, count in self.duplicates(threshold)],
+        }
+
+
+def current_profile():
+    return _current.get()
+
+
+@contextmanager
+def profile_request(method, path):
+    """
+    Make a new ``RequestProfile`` current for the enclosed code.
+    """
+    profile = RequestProfile(method, path)
+    token = _current.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.duration = time.perf_counter() - start
+        _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """
+    Add the time spent in the enclosed code to the ``name`` span of the
+    current request, if it is being profiled. Nested spans of the same name
+    count once; concurrent ones add up.
+    """
+    profile = _current.get()
+    open_spans = _open_spans.get()
+    if profile is None or name in open_spans:
+        yield
+        return
+    token = _open_spans.set(open_spans | {name})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, time.perf_counter() - start)
+        _open_spans.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding each query to the current profile.
+    """
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - start)
+
+
+def install_execute_wrapper(wrapper):
+    """
+    Add ``wrapper`` to the execute wrappers of every database connection,
+    open now or later.
+    """
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    def install(sender, connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False, dispatch_uid=f'monitoring.{wrapper.__qualname__}')
+    for connection in connections.all(initialized_only=True):
+        install(None, connection)
+
+
+def _timed_data(prop):
+    def data(self):
+        with span('serializer'):
+            return prop.fget(self)
+    data.profiled = True
+    return property(data)
+
+
+def install_instrumentation():
+    """
+    Record the queries of every database connection and time DRF
+    serializers. Called at startup when profiling is enabled.
+    """
+    from rest_framework import serializers
+
+    install_execute_wrapper(record_query)
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, 'profiled', False):
+            cls.data = _timed_data(cls.data)
+
+
+class SlowestRequests:
+    """
+    The ``size`` slowest request profiles seen by this process.
+    """
+
+    def __init__(self, size=None):
+        self._size = size
+        self._lock = threading.Lock()
+        self._heap = []
+        self._order = itertools.count()
+
+    @property
+    def size(self):
+        return self._size or get_profiling_setting('SLOWEST')
+
+    def add(self, profile):
+        entry = (profile.duration, next(self._order), profile)
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def profiles(self):
+        """
+        Recorded profiles, slowest first.
+        """
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [profile for _, _, profile in entries]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+
+
+slowest_requests = SlowestRequests()
@@ -0,0 +1,121 @@
+import datetime
+import json
+import pstats
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from monitoring.cpu_profiling import ProfileStore, profile_call
+from users.tests.factories import UserFactory
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return 'done'
+
+
+def meta(route='recipe:feed', duration_ms=10.0, profiler='sample'):
+    return {'route': route, 'method': 'GET', 'path': '/api/recipe/feed/', 'status': 200,
+            'started_at': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc), 'duration_ms': duration_ms, 'profiler': profiler,
+            'interval': 0.001}
+
+
+class ProfileStoreTest(TestCase):
+    def setUp(self):
+        self.store = ProfileStore(keep=2)
+
+    def test_keeps_the_slowest_per_route(self):
+        for duration in (30.0, 10.0, 20.0):
+            self.store.save(meta(duration_ms=duration), {'a;b': 100})
+        self.assertIsNone(self.store.save(meta(duration_ms=5.0), {'a;b': 100}))
+        self.store.save(meta(route='recipe:recipe-list'), {'a': 100})
+
+        self.assertEqual([profile['duration_ms'] for profile in self.store.list('recipe:feed')], [30.0, 20.0])
+        self.assertEqual(len(self.store.list()), 3)
+
+    def test_sampled_profile_exports(self):
+        result, stacks = profile_call('sample', lambda: busy(0.05))
+        self.assertEqual(result, 'done')
+        self.assertTrue(any('busy (' in stack for stack in stacks))
+        profile_id = self.store.save(meta(), stacks)
+
+        collapsed = self.store.export(profile_id, 'collapsed').decode()
+        self.assertRegex(collapsed.splitlines()[0], r'^\S.* \d+$')
+        speedscope = json.loads(self.store.export(profile_id))
+        self.assertEqual(speedscope['profiles'][0]['type'], 'sampled')
+        self.assertGreater(speedscope['profiles'][0]['endValue'], 25)
+        with self.assertRaises(ValueError):
+            self.store.export(profile_id, 'pstats')
+
+    def test_cprofile_exports(self):
+        result, profile = profile_call('cprofile', lambda: busy(0.01))
+        profile_id = self.store.save(meta(profiler='cprofile'), profile)
+
+        self.assertIn('busy', self.store.export(profile_id).decode())
+        with tempfile.NamedTemporaryFile(suffix='.prof') as f:
+            f.write(self.store.export(profile_id, 'pstats'))
+            f.flush()
+            self.assertTrue(any(name == 'busy' for _, _, name in pstats.Stats(f.name).stats))
+
+    def test_unknown_profiles(self):
+        for profile_id in ('nope', '0'):
+            with self.assertRaises(LookupError):
+                self.store.export(profile_id)
+
+
+class CPUProfilingMiddlewareTest(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def settings(self, **options):
+        return override_settings(CPU_PROFILING={'ENABLED': True, **options})
+
+    def get(self, user=None, **headers):
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+        return self.client.get(reverse('recipe:recipe-list'), **headers)
+
+    def test_header_profiles_staff_requests(self):
+        with self.settings():
+            self.assertNotIn('X-Profile-Id', self.get(UserFactory(is_staff=True)))
+            self.assertNotIn('X-Profile-Id', self.get(UserFactory(), HTTP_X_PROFILE='1'))
+            response = self.get(UserFactory(is_staff=True), HTTP_X_PROFILE='1')
+            self.assertEqual(response.status_code, 200)
+            profile_id = response['X-Profile-Id']
+
+            out = StringIO()
+            call_command('cpu_profiles', '--route', 'recipe:recipe-list', stdout=out)
+            self.assertRegex(out.getvalue(), rf'\n +{profile_id} recipe:recipe-list ')
+            out = StringIO()
+            call_command('cpu_profiles', '--export', profile_id, stdout=out)
+            self.assertEqual(json.loads(out.getvalue())['name'], 'GET /api/recipe/')
+
+    def test_sample_rate(self):
+        with self.settings(SAMPLE_RATE=1.0, PROFILER='cprofile'):
+            profile_id = self.get()['X-Profile-Id']
+            with self.assertRaises(CommandError):
+                call_command('cpu_profiles', '--export', profile_id, '--format', 'pstats')
+            output = self.directory / 'export.prof'
+            call_command('cpu_profiles', '--export', profile_id, '--format', 'pstats', '--output', str(output),
+                         stdout=StringIO())
+            self.assertTrue(pstats.Stats(str(output)).stats)
+
+    def test_failed_save_does_not_fail_the_request(self):
+        with self.settings(SAMPLE_RATE=1.0), \
+                mock.patch('monitoring.middleware.profile_store.save', side_effect=RuntimeError), \
+                self.assertLogs('monitoring.middleware', 'ERROR'):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from prometheus_client.parser import text_string_to_metric_families
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from recipe.response_cache import recipe_cache
+from recipe.tests.factories import RecipeFactory
+from recipe.tests.fake_yummly import FakeYummlyServer
+from recipe.yummly.client import YummlyClient
+from users.tests.factories import UserFactory
+
+# Run in a separate process: record one recipe cache hit.
+RECORD_HIT = '''
+import django
+django.setup()
+from monitoring.metrics import CACHE_EVENTS
+CACHE_EVENTS.labels('recipes', 'hits').inc()
+'''
+
+
+@override_settings(METRICS={'ENABLED': True, 'TOKEN': 's3cret'})
+class MetricsTest(APITestCase):
+    def setUp(self):
+        recipe_cache.cache.clear()
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        samples = {}
+        for family in text_string_to_metric_families(response.content.decode()):
+            for sample in family.samples:
+                samples[sample.name, tuple(sorted(sample.labels.items()))] = sample.value
+        return samples
+
+    def sample(self, samples, name, **labels):
+        return samples.get((name, tuple(sorted(labels.items()))), 0)
+
+    def test_requests_queries_cache_and_auth(self):
+        RecipeFactory()
+        user = UserFactory()
+        token = RefreshToken.for_user(user).access_token
+        labels = {'method': 'GET', 'route': 'recipe:recipe-list', 'status': '200'}
+        before = self.scrape()
+
+        for _ in range(2):
+            self.client.get(reverse('recipe:recipe-list'), HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        after = self.scrape()
+        self.assertEqual(self.sample(after, 'http_request_duration_seconds_count', **labels)
+                         - self.sample(before, 'http_request_duration_seconds_count', **labels), 2)
+        self.assertGreater(self.sample(after, 'http_request_db_queries_sum', route='recipe:recipe-list'),
+                           self.sample(before, 'http_request_db_queries_sum', route='recipe:recipe-list'))
+        for event in ('misses', 'hits'):
+            self.assertEqual(self.sample(after, 'cache_events_total', cache='recipes', event=event)
+                             - self.sample(before, 'cache_events_total', cache='recipes', event=event), 1)
+        self.assertEqual(self.sample(after, 'jwt_authentication_duration_seconds_count', outcome='authenticated')
+                         - self.sample(before, 'jwt_authentication_duration_seconds_count', outcome='authenticated'),
+                         2)
+
+    def test_upstream_latency_and_errors(self):
+        server = FakeYummlyServer().start()
+        self.addCleanup(server.stop)
+        server.add('/feeds/auto-complete', {}, status=500)
+        client = YummlyClient(base_url=server.url, backoff=0, max_retries=0)
+        before = self.scrape()
+
+        with mock.patch('recipe.views.yummly_client', client):
+            self.client.get(reverse('recipe:yummly_autocomplete'), {'query': 'chick'})
+
+        after = self.scrape()
+        labels = {'service': 'yummly', 'endpoint': 'feeds/auto-complete'}
+        self.assertEqual(self.sample(after, 'upstream_request_duration_seconds_count', **labels)
+                         - self.sample(before, 'upstream_request_duration_seconds_count', **labels), 1)
+        self.assertEqual(self.sample(after, 'upstream_request_errors_total', status='500', **labels)
+                         - self.sample(before, 'upstream_request_errors_total', status='500', **labels), 1)
+
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS={'ENABLED': True, 'TOKEN': ''})
+    def test_no_token_only_with_debug(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_200_OK)
+
+    def test_sums_worker_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory, 'DJANGO_SETTINGS_MODULE': 'config.settings'}
+            for _ in range(2):
+                subprocess.run([sys.executable, '-c', RECORD_HIT], env=env, cwd=settings.BASE_DIR.parent, check=True)
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                samples = self.scrape()
+        self.assertEqual(self.sample(samples, 'cache_events_total', cache='recipes', event='hits'), 2)
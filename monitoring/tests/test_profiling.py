@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from monitoring.middleware import RequestProfilingMiddleware
+from monitoring.profiling import (RequestProfile, SlowestRequests, fingerprint, install_instrumentation,
+                                  profile_request, slowest_requests, span)
+from recipe.response_cache import recipe_cache
+from recipe.tests.factories import RecipeFactory
+from recipe.tests.fake_yummly import FakeYummlyServer
+from recipe.yummly.client import YummlyClient
+from users.tests.factories import UserFactory
+
+
+class ProfilingTest(SimpleTestCase):
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+                         fingerprint('SELECT * FROM t WHERE id IN (%s)'))
+
+    def test_spans_only_record_inside_a_profiled_request(self):
+        with span('yummly'):
+            pass
+        with profile_request('GET', '/') as profile:
+            with span('yummly'):
+                with span('yummly'):
+                    pass
+            with span('yummly'):
+                pass
+        self.assertEqual(profile.spans['yummly'][1], 2)
+        self.assertGreater(profile.duration, 0)
+
+    def test_duplicated_queries(self):
+        profile = RequestProfile('GET', '/')
+        for pk in range(3):
+            profile.add_query('SELECT * FROM recipe WHERE id = %s', 0.001)
+        profile.add_query('SELECT COUNT(*) FROM recipe', 0.001)
+        self.assertEqual(profile.duplicates(2), [('SELECT * FROM recipe WHERE id = %s', 3)])
+        self.assertIn('4 queries, 3 duplicated', profile.server_timing(2))
+
+    def test_keeps_the_slowest_requests(self):
+        slowest = SlowestRequests(size=2)
+        for duration in (0.3, 0.1, 0.5, 0.2):
+            profile = RequestProfile('GET', f'/{duration}')
+            profile.duration = duration
+            slowest.add(profile)
+        self.assertEqual([profile.duration for profile in slowest.profiles()], [0.5, 0.3])
+
+    @override_settings(REQUEST_PROFILING={'ENABLED': False})
+    def test_disabled_middleware_is_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestProfilingMiddleware(lambda request: None)
+
+
+@override_settings(REQUEST_PROFILING={'ENABLED': True})
+class RequestProfilingMiddlewareTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        install_instrumentation()
+
+    def setUp(self):
+        recipe_cache.cache.clear()
+        slowest_requests.clear()
+        self.user = UserFactory()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        RecipeFactory.create_batch(2)
+        response = self.client.get(reverse('recipe:recipe-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries')
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_times_yummly_calls(self):
+        server = FakeYummlyServer().start()
+        self.addCleanup(server.stop)
+        server.add('/feeds/search', {'feed': []})
+        client = YummlyClient(base_url=server.url, backoff=0, max_retries=0)
+        with mock.patch('recipe.views.yummly_client', client):
+            response = self.client.get(reverse('recipe:yummly_search'), {'query': 'soup'})
+        self.assertIn('yummly;dur=', response['Server-Timing'])
+        self.assertIn('desc="1 calls"', response['Server-Timing'])
+
+    async def test_profiles_asgi_requests(self):
+        response = await self.async_client.get(reverse('recipe:recipe-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries')
+
+    def test_slowest_requests_endpoint_is_admin_only(self):
+        self.client.get(reverse('recipe:recipe-list'))
+        url = reverse('monitoring:slowest-requests')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(UserFactory(is_staff=True))
+        requests = {entry['route']: entry for entry in self.client.get(url).data['requests']}
+        self.assertEqual(set(requests), {'recipe:recipe-list', 'monitoring:slowest-requests'})
+        self.assertEqual(set(requests['recipe:recipe-list']), {'method', 'path', 'route', 'status', 'started_at', 'duration_ms',
+                                            'queries', 'db_ms', 'spans', 'duplicated_queries'})
+
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        # Only the DELETE itself is left.
+        self.assertEqual([profile.method for profile in slowest_requests.profiles()], ['DELETE'])
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import slowest_requests_view
+
+app_name = 'monitoring'
+
+urlpatterns = [
+    path('slowest-requests/', slowest_requests_view, name='slowest-requests'),
+]
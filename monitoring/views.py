@@ -0,0 +1,55 @@
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .metrics import get_metrics_setting
+from .profiling import get_profiling_setting, slowest_requests
+
+
+@extend_schema(
+    description='Profiles of the slowest requests served by this worker process since it started or was '
+                'last cleared: time per span, query count, database time and duplicated queries. '
+                'DELETE clears them. Empty unless REQUEST_PROFILING is enabled.',
+    summary='Slowest Requests',
+    responses={200: OpenApiTypes.OBJECT, 204: None}
+)
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def slowest_requests_view(request):
+    if request.method == 'DELETE':
+        slowest_requests.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    threshold = get_profiling_setting('DUPLICATE_THRESHOLD')
+    return Response({
+        'enabled': get_profiling_setting('ENABLED'),
+        'requests': [profile.as_dict(threshold) for profile in slowest_requests.profiles()],
+    })
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of ``monitoring.metrics``, summed over every
+    worker process when ``PROMETHEUS_MULTIPROC_DIR`` is set. Scrapers
+    must send ``METRICS['TOKEN']`` as a bearer token; without a token the
+    metrics are only served with ``DEBUG`` on.
+    """
+    token = get_metrics_setting('TOKEN')
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    elif not settings.DEBUG:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import RecipeCategory, Recipe, RecipeLike
+from .models import Ingredient, RecipeCategory, Recipe, RecipeLike
 
 # Register your models here.
 admin.site.register(RecipeCategory)
 admin.site.register(Recipe)
 admin.site.register(RecipeLike)
+admin.site.register(Ingredient)
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        import recipe.signals  # noqa
+
+        if getattr(settings, 'FEED_SNAPSHOTS', {}).get('SCHEDULE'):
+            from recipe.snapshots import snapshot_scheduler
+            snapshot_scheduler.start()
@@ -0,0 +1,136 @@
+"""
+Native async versions of the Yummly proxy views.
+
+Served under ASGI (``config.asgi``) these never block a worker thread on
+upstream I/O. They share the response cache and parsers of the sync views.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed
+
+from .renderers import JsonResponse
+from .views import (_parse_category_feed, _parse_search_feed,
+                    time_based_feed_response)
+from .yummly.async_client import async_yummly_client
+from .yummly.cache import yummly_cache
+from .yummly.exceptions import YummlyError
+
+BATCH_MAX_ITEMS = 10
+BATCH_CONCURRENCY = 10
+
+
+def require_GET(view):
+    """
+    ``django.views.decorators.http.require_GET`` for coroutine views, which
+    Django 4.2's decorator does not support.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def close_yummly_client(view):
+    """
+    Under WSGI every call of a coroutine view runs in an event loop of its
+    own, so close that loop's upstream client when the view is done rather
+    than leak one per request. ASGI keeps one loop and one pooled client.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await async_yummly_client.aclose_loop()
+    return wrapper
+
+
+async def acached_yummly(path, params=None, parse=None):
+    """
+    Async counterpart of ``views.cached_yummly``.
+    """
+    async def fetch():
+        data = await async_yummly_client.get_json(path, params)
+        return parse(data) if parse else data
+    variant = parse.__name__ if parse else ''
+    return await yummly_cache.aget_or_fetch(path, params, fetch, variant=variant)
+
+
+@require_GET
+@close_yummly_client
+async def yummly_search(request):
+    params = {
+        "q": request.GET.get('query', ''),
+        "start": request.GET.get('start', '0'),
+        "maxResult": request.GET.get('maxResults', '20 '),
+    }
+    try:
+        parsed_recipes = await acached_yummly("feeds/search", params, _parse_search_feed)
+    except YummlyError as e:
+        return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=e.status_code)
+    return JsonResponse({"data": parsed_recipes}, safe=False)
+
+
+@require_GET
+@close_yummly_client
+async def category_feed(request):
+    params = {
+        "start": request.GET.get('start', '0'),
+        "limit": request.GET.get('limit', '10'),
+        "tag": request.GET.get('tag', ''),
+    }
+    try:
+        filtered_data = await acached_yummly("feeds/list", params, _parse_category_feed)
+    except YummlyError as e:
+        return JsonResponse({"error": "Failed to fetch data from Yummly2 API", "status_code": e.status_code}, status=e.status_code)
+    return JsonResponse(filtered_data, safe=False)
+
+
+@require_GET
+async def time_based_yummly_feeds(request):
+    # Served from the daypart snapshot, which is built with the sync client.
+    return await sync_to_async(time_based_feed_response)(request)
+
+
+@require_GET
+@close_yummly_client
+async def yummly_batch(request):
+    """
+    Fetch several category feeds (``?tag=``) and searches (``?query=``)
+    concurrently. Each result is either ``{"data": ...}`` or
+    ``{"error": ..., "status_code": ...}`` so one failure does not sink the
+    whole batch.
+    """
+    tags = request.GET.getlist('tag')
+    queries = request.GET.getlist('query')
+    if not tags and not queries:
+        return JsonResponse({"error": "Provide at least one tag or query."}, status=400)
+    if len(tags) + len(queries) > BATCH_MAX_ITEMS:
+        return JsonResponse({"error": f"At most {BATCH_MAX_ITEMS} tags and queries per batch."}, status=400)
+
+    limit = request.GET.get('limit', '10')
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def fetch(path, params, parse):
+        async with semaphore:
+            try:
+                return {"data": await acached_yummly(path, params, parse)}
+            except YummlyError as e:
+                return {"error": str(e), "status_code": e.status_code}
+
+    results = await asyncio.gather(
+        *(fetch("feeds/list", {"start": '0', "limit": limit, "tag": tag}, _parse_category_feed)
+          for tag in tags),
+        *(fetch("feeds/search", {"q": query, "start": '0', "maxResult": limit}, _parse_search_feed)
+          for query in queries),
+    )
+    return JsonResponse({
+        "tags": dict(zip(tags, results[:len(tags)])),
+        "queries": dict(zip(queries, results[len(tags):])),
+    })
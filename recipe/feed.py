@@ -0,0 +1,164 @@
+"""
+Home feed of recipes from followed authors.
+
+Recipes are fanned out on write into ``FeedEntry`` rows for every follower
+of their author, so reading a feed is one indexed range scan. Authors with
+more followers than ``FEED_FANOUT_FOLLOWER_THRESHOLD`` are recorded as
+``FeedCelebrity`` rows and not fanned out; their recipes are pulled at read
+time and merged into the page instead. When such an author drops back
+under the threshold, the recipes they posted meanwhile are fanned out.
+"""
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from followers.models import Follower
+
+from .models import FeedCelebrity, FeedEntry, Recipe
+from .pagination import keyset_filter
+
+
+def get_fanout_threshold():
+    return getattr(settings, 'FEED_FANOUT_FOLLOWER_THRESHOLD', 5000)
+
+
+def get_backfill_limit():
+    return getattr(settings, 'FEED_BACKFILL_LIMIT', 200)
+
+
+def _bulk_create_entries(entries):
+    FeedEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+def _latest_recipes(author_id, since=None):
+    recipes = Recipe.objects.filter(author_id=author_id)
+    if since is not None:
+        recipes = recipes.filter(created_at__gte=since)
+    return list(recipes.order_by('-created_at', '-id').values_list('pk', 'created_at')[:get_backfill_limit()])
+
+
+def _demote(celebrity):
+    """
+    Stop pulling an author's recipes and fan out those posted while they
+    were pulled (the latest ``FEED_BACKFILL_LIMIT``) to every follower.
+    """
+    author_id = celebrity.author_id
+    celebrity.delete()
+    recipes = _latest_recipes(author_id, celebrity.since)
+    if not recipes:
+        return
+    follower_ids = Follower.objects.filter(to_user_id=author_id).values_list('from_user_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator(chunk_size=1000):
+        batch.extend(FeedEntry(user_id=user_id, recipe_id=pk, created_at=created_at)
+                     for pk, created_at in recipes)
+        if len(batch) >= 10000:
+            _bulk_create_entries(batch)
+            batch = []
+    _bulk_create_entries(batch)
+
+
+def update_celebrity(author_id):
+    """
+    Start or stop pulling an author's recipes after their follower count
+    changed. Returns whether they are pulled.
+    """
+    threshold = get_fanout_threshold()
+    if Follower.objects.filter(to_user_id=author_id)[threshold:threshold + 1].exists():
+        FeedCelebrity.objects.get_or_create(author_id=author_id, defaults={'since': timezone.now()})
+        return True
+    celebrity = FeedCelebrity.objects.filter(author_id=author_id).first()
+    if celebrity is not None:
+        _demote(celebrity)
+    return False
+
+
+def update_celebrities():
+    """
+    ``update_celebrity()`` for every author, e.g. after follows were loaded
+    in bulk. Returns the number of authors pulled.
+    """
+    counted = set(
+        Follower.objects.values('to_user').annotate(total=Count('pk'))
+        .filter(total__gt=get_fanout_threshold()).values_list('to_user', flat=True)
+    )
+    recorded = set(FeedCelebrity.objects.values_list('author_id', flat=True))
+    FeedCelebrity.objects.bulk_create([FeedCelebrity(author_id=pk) for pk in counted - recorded])
+    for celebrity in FeedCelebrity.objects.filter(author_id__in=recorded - counted):
+        _demote(celebrity)
+    return len(counted)
+
+
+def fan_out_recipe(recipe):
+    """
+    Push a new recipe into the feed of every follower of its author.
+    Returns the number of feeds written, 0 for celebrity authors.
+    """
+    threshold = get_fanout_threshold()
+    follower_ids = list(
+        Follower.objects.filter(to_user_id=recipe.author_id)
+        .values_list('from_user_id', flat=True)[:threshold + 1]
+    )
+    if len(follower_ids) > threshold:
+        # The author just became (or already is) a celebrity: make sure
+        # readers pull their recipes.
+        FeedCelebrity.objects.get_or_create(author_id=recipe.author_id, defaults={'since': recipe.created_at})
+        return 0
+    celebrity = FeedCelebrity.objects.filter(author_id=recipe.author_id).first()
+    if celebrity is not None:
+        # Followers were removed without update_celebrity(); this recipe
+        # is fanned out with the rest.
+        _demote(celebrity)
+    _bulk_create_entries([
+        FeedEntry(user_id=user_id, recipe_id=recipe.pk, created_at=recipe.created_at)
+        for user_id in follower_ids
+    ])
+    return len(follower_ids)
+
+
+def backfill_feed(user, author):
+    """
+    Copy the latest recipes of a newly followed author into the user's
+    feed, celebrities' too: they are fanned out if the author drops back
+    under the threshold.
+    """
+    _bulk_create_entries([
+        FeedEntry(user_id=user.pk, recipe_id=pk, created_at=created_at)
+        for pk, created_at in _latest_recipes(author.pk)
+    ])
+
+
+def prune_feed(user, author):
+    """
+    Remove an unfollowed author's recipes from the user's feed.
+    """
+    FeedEntry.objects.filter(user=user, recipe__author=author).delete()
+
+
+def get_feed_keys(user, limit, position=None):
+    """
+    Return the ``(created_at, recipe_id)`` keys of up to ``limit`` recipes
+    for the user's feed, newest first, strictly older than ``position``.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    if position is not None:
+        entries = entries.filter(keyset_filter('created_at', 'recipe_id', position))
+    keys = list(
+        entries.order_by('-created_at', '-recipe_id')
+        .values_list('created_at', 'recipe_id')[:limit]
+    )
+
+    pulled_authors = list(
+        Follower.objects.filter(from_user=user, to_user__in=FeedCelebrity.objects.values('author'))
+        .values_list('to_user_id', flat=True)
+    )
+    if pulled_authors:
+        pulled = Recipe.objects.filter(author__in=pulled_authors)
+        if position is not None:
+            pulled = pulled.filter(keyset_filter('created_at', 'id', position))
+        keys = sorted(
+            set(keys) | set(pulled.order_by('-created_at', '-id')
+                           .values_list('created_at', 'id')[:limit]),
+            reverse=True,
+        )[:limit]
+    return keys
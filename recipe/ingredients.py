@@ -0,0 +1,144 @@
+"""
+Ingredient normalization.
+
+``Recipe.ingredients`` holds free-form lines such as ``"2 cups finely chopped
+onions"`` or ``{"name": "Onions", "amount": "2 cups"}``. These helpers reduce
+each line to a canonical ingredient name (``"onion"``) by dropping
+quantities, units, preparation words and parentheticals, folding plurals and
+a few common synonyms. The names are stored as ``Ingredient`` rows linked to
+their recipes, which the recommenders index.
+"""
+import re
+import unicodedata
+
+MAX_NAME_LENGTH = 100
+
+UNITS = frozenset("""
+    c cup cups tbsp tbs tbl tablespoon tablespoons tsp teaspoon teaspoons
+    oz ounce ounces fl lb lbs pound pounds g gr gram grams kg kilogram kilograms
+    mg ml milliliter milliliters millilitre millilitres l liter liters litre litres
+    dl cl qt quart quarts pt pint pints gal gallon gallons
+    pinch pinches dash dashes drop drops handful handfuls
+    clove cloves can cans tin tins jar jars package packages pkg pkgs packet packets
+    bag bags box boxes bottle bottles carton cartons container containers
+    slice slices stick sticks bunch bunches sprig sprigs stalk stalks head heads
+    piece pieces fillet fillets inch inches cm sheet sheets scoop scoops
+    envelope envelopes cube cubes
+""".split())
+
+DESCRIPTORS = frozenset("""
+    a an the of about approximately plus more extra additional
+    fresh freshly dried dry frozen thawed canned cooked uncooked raw ripe
+    chopped minced diced sliced cubed grated shredded crushed ground mashed
+    peeled seeded pitted cored trimmed halved quartered julienned torn
+    finely roughly coarsely thinly thickly lightly well freshly
+    large small medium big little whole boneless skinless
+    softened melted beaten sifted packed heaping level rounded
+    divided optional room temperature
+    good quality organic homemade store bought prepared
+""".split())
+
+# Applied to the whole name after the other steps.
+ALIASES = {
+    'scallion': 'green onion',
+    'spring onion': 'green onion',
+    'garbanzo bean': 'chickpea',
+    'garbanzo': 'chickpea',
+    'coriander leaf': 'cilantro',
+    'confectioner sugar': 'powdered sugar',
+    'icing sugar': 'powdered sugar',
+    'caster sugar': 'sugar',
+    'granulated sugar': 'sugar',
+    'white sugar': 'sugar',
+    'all purpose flour': 'flour',
+    'plain flour': 'flour',
+    'extra virgin olive oil': 'olive oil',
+    'virgin olive oil': 'olive oil',
+    'kosher salt': 'salt',
+    'sea salt': 'salt',
+    'table salt': 'salt',
+    'ground black pepper': 'black pepper',
+    'black peppercorn': 'black pepper',
+    'egg yolk': 'egg',
+    'egg white': 'egg',
+}
+
+# Words ending in "s" that are not plurals.
+NOT_PLURAL = frozenset("""
+    asparagus couscous hummus molasses swiss grits bass octopus citrus
+    lemongrass hibiscus series species floss schnapps
+""".split())
+
+PARENTHETICAL_RE = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+# Stop at the first clause that describes preparation rather than the
+# ingredient: "onion, finely chopped", "butter for greasing", "salt to taste".
+CLAUSE_RE = re.compile(r',|;|\bfor\b|\bto taste\b|\bas needed\b|\bif desired\b|\bsuch as\b')
+QUANTITY_RE = re.compile(r'\d+(?:\s*[/⁄.,]\s*\d+)?(?:\s*[-–]\s*\d+(?:\s*[/⁄.,]\s*\d+)?)?')
+ALTERNATIVE_RE = re.compile(r'\bor\b|/')
+# "salt and pepper" names two ingredients.
+CONJUNCTION_RE = re.compile(r'\band\b|&|\+')
+WORD_RE = re.compile(r'[a-z]+')
+
+
+def _singular(word):
+    if len(word) <= 3 or word in NOT_PLURAL or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith(('eaves', 'oaves', 'alves')):
+        return word[:-3] + 'f'
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'sses', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def _line_text(line):
+    if isinstance(line, dict):
+        for key in ('name', 'ingredient', 'wholeLine', 'text'):
+            if isinstance(line.get(key), str):
+                return line[key]
+        return ''
+    return line if isinstance(line, str) else ''
+
+
+def _canonical_name(text):
+    text = ALTERNATIVE_RE.split(text, 1)[0]
+    words = [word for word in WORD_RE.findall(text.replace('-', ' '))
+             if word not in UNITS and word not in DESCRIPTORS]
+    if not words:
+        return ''
+    words[-1] = _singular(words[-1])
+    name = ' '.join(words)
+    return ALIASES.get(name, name)[:MAX_NAME_LENGTH]
+
+
+def ingredient_names(line):
+    """
+    Return the canonical names in one ingredient line: usually one, none
+    when nothing recognisable is left, several for "salt and pepper".
+    """
+    text = unicodedata.normalize('NFKD', _line_text(line))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    text = PARENTHETICAL_RE.sub(' ', text)
+    text = QUANTITY_RE.sub(' ', text)
+    text = CLAUSE_RE.split(text, 1)[0]
+    names = (_canonical_name(part) for part in CONJUNCTION_RE.split(text))
+    return [name for name in names if name]
+
+
+def normalize_ingredients(lines):
+    """
+    Return the distinct canonical names of a recipe's ingredient lines, in
+    order of first appearance.
+    """
+    if isinstance(lines, (str, dict)):
+        lines = [lines]
+    elif not isinstance(lines, (list, tuple)):
+        return []
+    names = {}
+    for line in lines:
+        for name in ingredient_names(line):
+            names[name] = None
+    return list(names)
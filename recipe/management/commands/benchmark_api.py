@@ -0,0 +1,320 @@
+import json
+import logging
+import math
+import statistics
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test.utils import (CaptureQueriesContext, override_settings, setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import URLResolver, get_resolver, reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from followers.models import Follower
+from recipe.feed import backfill_feed
+from recipe.seed import PASSWORD, seed_dataset
+from recipe.tests.fake_yummly import FakeYummlyServer, fixture
+from recipe.yummly.async_client import AsyncYummlyClient
+from recipe.yummly.client import YummlyClient
+from users.models import Certificate
+
+BASELINE = Path(__file__).resolve().parents[2] / 'benchmarks' / 'api_baseline.json'
+NAMESPACES = ('recipe', 'users', 'follower')
+CATEGORY_TAG = 'list.recipe.search_based:fq:attribute_s_mv:(course^course-Breakfast and Brunch)'
+
+# One request per route. ``kwargs`` (URL arguments) and ``data`` (query
+# parameters or body) may be callables of ``(context, n)`` for requests
+# that must differ each time, e.g. liking a new recipe.
+Route = namedtuple('Route', 'name method kwargs data format', defaults=('get', None, None, 'json'))
+
+ROUTES = [
+    Route('recipe:recipe-list', data={'limit': 20}),
+    Route('recipe:recipe-detail', kwargs=lambda c, n: {'pk': c.recipe}),
+    Route('recipe:recipe-create', 'post', data=lambda c, n: {
+        'category_name': 'Dinner', 'title': f'Benchmark stew {n}', 'desc': 'Hearty.', 'cook_time': '01:00',
+        'ingredients': ['2 cup rice', '1 tbsp butter'], 'procedure': ['Cook the rice.', 'Stir in the butter.'],
+    }),
+    Route('recipe:recipe-similar', kwargs=lambda c, n: {'pk': c.recipe}),
+    Route('recipe:recipe-like', 'post', kwargs=lambda c, n: {'pk': c.recipe_ids[n]}),
+    Route('recipe:recipe-comment', 'post', kwargs=lambda c, n: {'pk': c.recipe}, data={'text': 'Lovely.'}),
+    Route('recipe:recipe-comments', kwargs=lambda c, n: {'recipe_id': c.recipe}),
+    Route('recipe:view-user-recipe'),
+    Route('recipe:feed'),
+    Route('recipe:recipe-search', data={'q': 'chicken'}),
+    Route('recipe:recipe-recommend-by-ingredients', data={'ingredients': 'chicken breast,garlic,onion,rice'}),
+    Route('recipe:recipe-recommended'),
+    Route('recipe:yummly_autocomplete', data={'query': 'chick'}),
+    Route('recipe:yummly_search', data={'query': 'chicken'}),
+    Route('recipe:yummly_feeds_list'),
+    Route('recipe:category_feed', data={'tag': CATEGORY_TAG}),
+    Route('recipe:get_categories_list'),
+    Route('recipe:get_list_similarities', data={'id': 'Chicken-Stew-1'}),
+    Route('recipe:get_time_based_feed'),
+    Route('recipe:yummly_cache_stats'),
+    Route('recipe:recipe_cache_stats'),
+    Route('recipe:yummly_search_async', data={'query': 'chicken'}),
+    Route('recipe:category_feed_async', data={'tag': CATEGORY_TAG}),
+    Route('recipe:get_time_based_feed_async'),
+    Route('recipe:yummly_batch', data={'tag': CATEGORY_TAG, 'query': 'chicken'}),
+    Route('users:create-user', 'post', data=lambda c, n: {
+        'username': f'newcook{n}', 'email': f'newcook{n}@example.com', 'password': PASSWORD}),
+    Route('users:login-user', 'post', data=lambda c, n: {'email': c.user.email, 'password': PASSWORD}),
+    Route('users:token-refresh', 'post', data=lambda c, n: {'refresh': str(RefreshToken.for_user(c.user))}),
+    Route('users:logout-user', 'post', data=lambda c, n: {'refresh': str(RefreshToken.for_user(c.user))}),
+    Route('users:user-info'),
+    Route('users:upload_certificate', 'post', format='multipart', data=lambda c, n: _certificate(c.user.profile)),
+    Route('users:user-profile'),
+    Route('users:user-avatar'),
+    Route('users:user-verified'),
+    Route('users:user-bookmark', kwargs=lambda c, n: {'pk': c.user.pk}),
+    Route('users:change-password', 'put', data={'old_password': PASSWORD, 'new_password': PASSWORD}),
+    Route('follower:followers-list'),
+    Route('follower:follow-user', 'post', data=lambda c, n: {'user_id': c.unfollowed[n]}),
+]
+
+
+def _certificate(profile):
+    # A profile holds one certificate; drop the last upload before the next.
+    Certificate.objects.filter(profile=profile).delete()
+    return {'profile': profile.pk, 'cert': SimpleUploadedFile('cert.pdf', b'%PDF-1.4 benchmark')}
+
+
+def route_names(resolver=None, namespace=None):
+    """
+    Names of every route under ``NAMESPACES``, e.g. ``recipe:feed``.
+    """
+    names = set()
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern, pattern.namespace or namespace)
+        elif namespace in NAMESPACES and pattern.name:
+            names.add(f'{namespace}:{pattern.name}')
+    return names
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile: the smallest value at least ``fraction`` of
+    ``values`` do not exceed.
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def _resolve(value, context, n):
+    return value(context, n) if callable(value) else value
+
+
+def measure(client, route, context, requests, warmup):
+    """
+    Send ``warmup`` unrecorded and ``requests`` recorded requests to
+    ``route``; return the status, the most queries any request ran, the
+    median and 95th percentile latency and the median body size.
+    """
+    timings, queries, sizes, statuses = [], [], [], []
+    for n in range(warmup + requests):
+        url = reverse(route.name, kwargs=_resolve(route.kwargs, context, n))
+        data = _resolve(route.data, context, n)
+        send = getattr(client, route.method)
+        # The query log is capped; a full one would hide new queries.
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            if route.method == 'get':
+                response = send(url, data)
+            else:
+                response = send(url, data, format=route.format)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - start
+        if n >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+            sizes.append(len(body))
+            statuses.append(response.status_code)
+    return {
+        'status': max(set(statuses), key=statuses.count),
+        'queries': max(queries),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'bytes': int(statistics.median(sizes)),
+    }
+
+
+def regressions(results, baseline, latency_tolerance, bytes_tolerance, latency_floor):
+    """
+    Messages for every route that got worse than ``baseline``: a
+    different status, more queries, or bytes or p95 latency beyond the
+    tolerances (fractions of the baseline). Latency changes smaller than
+    ``latency_floor`` milliseconds are noise and ignored.
+    """
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['status'] != before['status']:
+            found.append(f"{name}: status {before['status']} -> {result['status']}")
+        if result['queries'] > before['queries']:
+            found.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+        if result['bytes'] > before['bytes'] * (1 + bytes_tolerance):
+            found.append(f"{name}: bytes {before['bytes']} -> {result['bytes']}")
+        limit = max(before['p95_ms'] * (1 + latency_tolerance), before['p95_ms'] + latency_floor)
+        if result['p95_ms'] > limit:
+            found.append(f"{name}: p95 {before['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms")
+    return found
+
+
+class Command(BaseCommand):
+    """
+    Seed a throwaway test database with a large synthetic dataset
+    (``recipe.seed``), send every API route a series of requests through
+    the test client, and compare query counts, latency and response size
+    with a stored JSON baseline. Exits with an error on regressions.
+
+    The Yummly proxy routes are served by a local fake Yummly API from the
+    test fixtures. Latency baselines are only comparable on the machine
+    that recorded them; query counts, statuses and sizes are portable.
+    """
+    help = 'Benchmark every API route against a seeded dataset and check for regressions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Users to seed.')
+        parser.add_argument('--recipes', type=int, default=100000, help='Recipes to seed.')
+        parser.add_argument('--likes', type=int, default=1000000, help='Likes to seed.')
+        parser.add_argument('--follows', type=int, default=200000, help='Follows to seed (power law).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset.')
+        parser.add_argument('--requests', type=int, default=20, help='Recorded requests per route.')
+        parser.add_argument('--warmup', type=int, default=2, help='Unrecorded requests per route first.')
+        parser.add_argument('--route', action='append', help='Only benchmark these route names.')
+        parser.add_argument('--baseline', type=Path, default=BASELINE, help='Baseline JSON file.')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Write the results as the new baseline instead of comparing.')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                            help='Allowed p95 latency growth, as a fraction of the baseline.')
+        parser.add_argument('--latency-floor', type=float, default=5.0,
+                            help='p95 latency growth in ms that is never reported.')
+        parser.add_argument('--bytes-tolerance', type=float, default=0.1,
+                            help='Allowed response size growth, as a fraction of the baseline.')
+
+    def handle(self, *args, route, baseline, update_baseline, **options):
+        missing = route_names() - {spec.name for spec in ROUTES}
+        if missing:
+            raise CommandError(f"No benchmark for route(s): {', '.join(sorted(missing))}. Add them to ROUTES.")
+        routes = [spec for spec in ROUTES if not route or spec.name in route]
+
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                results = self.run(routes, Path(directory), options)
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+        if update_baseline:
+            recorded = json.loads(baseline.read_text()) if route and baseline.exists() else {}
+            baseline.parent.mkdir(parents=True, exist_ok=True)
+            baseline.write_text(json.dumps({**recorded, **results}, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline}.'))
+            return
+        if not baseline.exists():
+            raise CommandError(f'No baseline at {baseline}; run with --update-baseline first.')
+        found = regressions(results, json.loads(baseline.read_text()), options['latency_tolerance'],
+                            options['bytes_tolerance'], options['latency_floor'])
+        if found:
+            raise CommandError('Regressions:\n  ' + '\n  '.join(found))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline}.'))
+
+    def run(self, routes, directory, options):
+        with override_settings(
+            MEDIA_ROOT=str(directory / 'media'),
+            RECIPE_SEARCH_INDEX={'PATH': directory / 'search.sqlite3'},
+            RECIPE_RECOMMENDER={**settings.RECIPE_RECOMMENDER, 'MODEL_DIR': directory / 'model',
+                                'BACKGROUND_REBUILD': False},
+            FEED_SNAPSHOTS={**settings.FEED_SNAPSHOTS, 'PATH': directory / 'snapshots', 'SCHEDULE': False},
+        ), self.fake_yummly():
+            for cache in caches.all():
+                cache.clear()
+            started = time.perf_counter()
+            dataset = seed_dataset(options['users'], options['recipes'], options['likes'], options['follows'],
+                                   options['seed'], progress=lambda message: self.stdout.write(f'Seeded {message}'))
+            self.stdout.write(f'Seeding took {time.perf_counter() - started:.0f} s')
+            context = self.context(dataset, options['requests'] + options['warmup'])
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(context.user)
+            # Failing routes are reported in the results, not logged per request.
+            logger = logging.getLogger('django.request')
+            level = logger.level
+            logger.setLevel(logging.CRITICAL)
+            try:
+                return {spec.name: measure(client, spec, context, options['requests'], options['warmup'])
+                        for spec in routes}
+            finally:
+                logger.setLevel(level)
+
+    @staticmethod
+    def context(dataset, requests):
+        """
+        The benchmark user, a median follower with the feed and rights of
+        a staff member, and the ids the write routes consume.
+        """
+        User = get_user_model()
+        user_ids, recipe_ids = dataset['user_ids'], dataset['recipe_ids']
+        user = User.objects.get(pk=user_ids[len(user_ids) // 2])
+        User.objects.filter(pk=user.pk).update(is_staff=True)
+        user.refresh_from_db()
+        for followed in User.objects.filter(friends__from_user=user):
+            backfill_feed(user, followed)
+        following = set(Follower.objects.filter(from_user=user).values_list('to_user_id', flat=True))
+        return SimpleNamespace(
+            user=user,
+            recipe=recipe_ids[0],
+            recipe_ids=recipe_ids[-requests:],
+            unfollowed=[pk for pk in reversed(user_ids) if pk != user.pk and pk not in following][:requests],
+        )
+
+    @staticmethod
+    def fake_yummly():
+        server = FakeYummlyServer()
+        feed = fixture('feeds_list_breakfast_0.json')
+        for path, body in (('/feeds/list', feed), ('/feeds/search', feed),
+                           ('/categories/list', fixture('categories_list.json')),
+                           ('/feeds/auto-complete', {'ingredients': ['chicken'], 'searches': ['chicken soup']}),
+                           ('/feeds/list-similarities', feed)):
+            server.add(path, body)
+        client = YummlyClient(base_url=server.url, api_key='benchmark', backoff=0, max_retries=0)
+        async_client = AsyncYummlyClient(base_url=server.url, api_key='benchmark', backoff=0, max_retries=0)
+        patches = [mock.patch(target, client) for target in ('recipe.views.yummly_client',
+                                                               'recipe.snapshots.yummly_client')]
+        patches.append(mock.patch('recipe.async_views.async_yummly_client', async_client))
+
+        class Patched:
+            def __enter__(self):
+                server.start()
+                for patch in patches:
+                    patch.start()
+
+            def __exit__(self, *exc_info):
+                for patch in patches:
+                    patch.stop()
+                server.stop()
+
+        return Patched()
+
+    def report(self, results):
+        self.stdout.write(f"{'route':<44} {'status':>6} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>9}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<44} {result['status']:>6} {result['queries']:>7} {result['p50_ms']:>8.2f} "
+                              f"{result['p95_ms']:>8.2f} {result['bytes']:>9}")
@@ -0,0 +1,64 @@
+import datetime
+import io
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from recipe import renderers
+from recipe.models import Recipe, RecipeCategory
+from recipe.renderers import FastJSONParser, FastJSONRenderer
+from recipe.serializers import RecipeSerializer
+
+
+def sample_recipes(count):
+    """
+    Unsaved recipes shaped like real ones: a dozen ingredient lines and a
+    handful of procedure steps each.
+    """
+    User = get_user_model()
+    category = RecipeCategory(pk=1, name='Dinner')
+    recipes = []
+    for i in range(count):
+        author = User(pk=i % 50 + 1, username=f'cook{i % 50}')
+        recipes.append(Recipe(
+            pk=i + 1, author=author, category=category, title=f'Roast chicken with lemon no. {i}',
+            desc='Crisp skin, juicy meat and a bright pan sauce — ready in an hour.',
+            cook_time=datetime.time(1, 15),
+            ingredients=[f'{n + 1} tbsp ingredient number {n} (optional), finely chopped' for n in range(12)],
+            procedure=[f'Step {n + 1}: heat, stir and season the mixture until it is golden.' for n in range(6)],
+            like_count=i % 97, comment_count=i % 13, bookmark_count=i % 7,
+        ))
+    return recipes
+
+
+class Command(BaseCommand):
+    """
+    Time DRF's stock ``JSONRenderer``/``JSONParser`` against the
+    ``recipe.renderers`` pair on a serialized list of recipes, the payload
+    of a large ``/api/recipe/`` page.
+    """
+    help = 'Benchmark JSON rendering and parsing of recipe list payloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000, help='Recipes in the payload.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timing runs; the best is reported.')
+
+    def handle(self, *args, recipes, repeat, **options):
+        data = {'results': RecipeSerializer(sample_recipes(recipes), many=True).data}
+        body = JSONRenderer().render(data)
+        self.stdout.write(f'{recipes} recipes, {len(body) / 1024:.0f} KiB, backend {renderers.BACKEND}')
+
+        def best(function):
+            return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+        for name, stock, fast in (
+            ('render', lambda: JSONRenderer().render(data), lambda: FastJSONRenderer().render(data)),
+            ('parse', lambda: JSONParser().parse(io.BytesIO(body)),
+             lambda: FastJSONParser().parse(io.BytesIO(body))),
+        ):
+            before, after = best(stock), best(fast)
+            self.stdout.write(f'{name:>6}: stdlib {before:7.2f} ms, fast {after:7.2f} ms '
+                              f'({before / after:.1f}x, {before - after:.2f} ms saved)')
@@ -0,0 +1,126 @@
+import copy
+import json
+import timeit
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from recipe.yummly.parsers import (FeedItem, category_feed_result, feeds_list_result, iter_json_array, parse_feed,
+                                   search_result)
+
+FIXTURE = Path(__file__).resolve().parents[2] / 'tests' / 'fixtures' / 'yummly' / 'feeds_list_breakfast_0.json'
+
+
+# The parsers the Yummly views used before recipe.yummly.parsers, kept as
+# the baseline.
+
+def legacy_search_feed(data):
+    parsed_recipes = []
+    for item in data.get('feed', []):
+        tags = item.get('content', {}).get('tags', {})
+        parsed_recipes.append({
+            'title': item.get('content', {}).get('details', {}).get('name'),
+            'image_url': item.get('content', {}).get('details', {}).get('images', [{}])[0].get('hostedLargeUrl'),
+            'total_time': item.get('content', {}).get('details', {}).get('totalTime'),
+            'tags': {
+                group: [{'display-name': tag.get('display-name'), 'tag-url': tag.get('tag-url')}
+                        for tag in tags.get(group, [])]
+                for group in ('course', 'cuisine', 'holiday', 'technique')
+            },
+            'preparation_steps': item.get('content', {}).get('preparationSteps', []),
+            'ingredient_lines': [line.get('wholeLine') for line in item.get('content', {}).get('ingredientLines', [])],
+        })
+    return parsed_recipes
+
+
+def legacy_category_feed(data):
+    filtered_data = []
+    for item in data.get('feed', []):
+        content = item.get('content', {})
+        details = content.get('details', {})
+        tags = content.get('tags', {})
+        images = details.get('images', [])
+        filtered_data.append({
+            'title': item.get('display', {}).get('displayName'),
+            'description': content.get('description', {}).get('text'),
+            'image': images[0].get('hostedLargeUrl') if images else None,
+            'ingredients': [ingredient.get('wholeLine') for ingredient in content.get('ingredientLines', [])],
+            'preparationSteps': content.get('preparationSteps', []),
+            'course': [tag.get('display-name') for tag in tags.get('course', [])],
+            'difficulty': [tag.get('display-name') for tag in tags.get('difficulty', [])],
+            'nutrition': [tag.get('display-name') for tag in tags.get('nutrition', [])],
+            'technique': [tag.get('display-name') for tag in tags.get('technique', [])],
+            'total_time': details.get('totalTime'),
+            'rating': details.get('rating'),
+            'author': details.get('displayName'),
+        })
+    return filtered_data
+
+
+def legacy_feeds_list(data):
+    filtered_data = []
+    for item in data.get('feed', []):
+        details = item.get('content', {}).get('details', {})
+        content = item.get('content', {})
+        ingredients = []
+        for ingredient in content.get('ingredientLines', []):
+            amount_imperial = ingredient.get('amount', {}).get('imperial', {})
+            ingredients.append(f"{amount_imperial.get('quantity')} "
+                               f"{amount_imperial.get('unit', {}).get('abbreviation', '')} "
+                               f"{ingredient.get('ingredient')}")
+        filtered_data.append({
+            'name': details.get('name'),
+            'image': details.get('images', [{}])[0].get('resizableImageUrl'),
+            'totalTime': details.get('totalTime'),
+            'preparationSteps': content.get('preparationSteps', []),
+            'ingredients': ingredients,
+            'rating': details.get('rating'),
+        })
+    return filtered_data
+
+
+def _peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    """
+    Compare ``recipe.yummly.parsers`` with the per-view parsers it
+    replaced, on a synthetic ``feeds/list`` page built from the recorded
+    fixture, and the peak memory of decoding the page whole versus
+    streaming it.
+    """
+    help = 'Micro-benchmark the Yummly response parsers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000, help='Feed items in the page.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing runs; the best is reported.')
+
+    def handle(self, *args, items, repeat, **options):
+        recipes = [item for item in json.loads(FIXTURE.read_text())['feed'] if item.get('content')]
+        feed = [copy.deepcopy(recipes[i % len(recipes)]) for i in range(items)]
+        data = {'feed': feed, 'seo': {}}
+        body = json.dumps(data).encode()
+
+        self.stdout.write(f'{items} items, {len(body) / 1024:.0f} KiB')
+        for name, legacy, build in (('search', legacy_search_feed, search_result),
+                                    ('category feed', legacy_category_feed, category_feed_result),
+                                    ('feeds list', legacy_feeds_list, feeds_list_result)):
+            before = min(timeit.repeat(lambda: legacy(data), number=1, repeat=repeat))
+            after = min(timeit.repeat(lambda: parse_feed(data, build), number=1, repeat=repeat))
+            self.stdout.write(f'{name:>14}: legacy {before * 1000:7.2f} ms, shared {after * 1000:7.2f} ms '
+                              f'({before / after:.2f}x)')
+
+        chunks = [body[i:i + 65536] for i in range(0, len(body), 65536)]
+        whole = _peak_memory(lambda: parse_feed(json.loads(b''.join(chunks)), feeds_list_result))
+        # A streaming consumer (such as the importer) handles one item at a time.
+        streamed = _peak_memory(lambda: [feeds_list_result(FeedItem(item)) and None
+                                         for item in iter_json_array(chunks)])
+        self.stdout.write(f'{"peak memory":>14}: whole body {whole / 1024:7.0f} KiB, '
+                          f'streamed {streamed / 1024:7.0f} KiB')
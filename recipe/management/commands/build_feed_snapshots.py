@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.snapshots import DAYPARTS, build_all_snapshots
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the time-of-day feed snapshots served by
+    ``/api/recipe/get-time-based-recipes/``.
+
+    Meant to run from cron every ``FEED_SNAPSHOTS['REFRESH_INTERVAL']``
+    seconds. A daypart whose Yummly feed cannot be fetched keeps the feed
+    of its previous snapshot.
+    """
+    help = 'Rebuild the time-of-day feed snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--daypart', action='append', choices=[d.name for d in DAYPARTS],
+                            help='Only rebuild this daypart; may be repeated.')
+        parser.add_argument('--max-age', type=int, default=None,
+                            help='Skip snapshots younger than this many seconds.')
+
+    def handle(self, *args, daypart, max_age, **options):
+        dayparts = [d for d in DAYPARTS if not daypart or d.name in daypart]
+        built = build_all_snapshots(dayparts, max_age=max_age)
+        if not built and max_age is None:
+            raise CommandError('No snapshot was built; another build is running or Yummly is unavailable.')
+        self.stdout.write(self.style.SUCCESS(
+            f"Built feed snapshots: {', '.join(built) or 'none'}."))
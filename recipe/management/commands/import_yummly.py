@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.yummly.exceptions import YummlyError
+from recipe.yummly.importer import AUTHOR_EMAIL, Checkpoint, YummlyImporter, category_tags, get_import_author
+
+
+class Command(BaseCommand):
+    """
+    Copy Yummly recipes into the local ``Recipe`` and ``RecipeCategory``
+    tables so popular upstream content can be served from our own indexed
+    database.
+
+    Each tag's ``feeds/list`` is paged through until a short page comes
+    back. Recipes are upserted by their Yummly id, so running the import
+    again refreshes them instead of duplicating them. Progress is recorded
+    in ``--checkpoint`` after every page; rerunning after a failure resumes
+    from there, and the file is removed once every tag is done.
+    """
+    help = 'Import recipes from Yummly feeds into the local database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tag', action='append', dest='tags', default=None,
+                            help='Yummly feed tag to import; may be repeated. '
+                                 'All browse categories by default.')
+        parser.add_argument('--category', default=None,
+                            help='Category for recipes of --tag without a Yummly course.')
+        parser.add_argument('--checkpoint', default='yummly_import.json',
+                            help='File recording the progress of each tag.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore an existing checkpoint and start from the first page.')
+        parser.add_argument('--page-size', type=int, default=40,
+                            help='Recipes requested per feeds/list call.')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Recipes upserted per bulk_create.')
+        parser.add_argument('--max-pages', type=int, default=None,
+                            help='Pages fetched per tag in this run.')
+        parser.add_argument('--author', default=AUTHOR_EMAIL,
+                            help='Email of the user imported recipes belong to; created if missing.')
+
+    def handle(self, *args, tags, category, checkpoint, restart, page_size, chunk_size, max_pages,
+               author, verbosity, **options):
+        def progress(tag, start, count):
+            if verbosity > 1:
+                self.stdout.write(f'{tag}: {count} recipes, next offset {start}')
+
+        state = Checkpoint(checkpoint)
+        if restart:
+            state.delete()
+        importer = YummlyImporter(author=get_import_author(author), checkpoint=state, page_size=page_size,
+                                  chunk_size=chunk_size, max_pages=max_pages, progress=progress)
+        try:
+            pairs = [(tag, category) for tag in tags] if tags else category_tags()
+            total = importer.run(pairs)
+        except YummlyError as e:
+            raise CommandError(f'{e}; run the command again to resume from {checkpoint}.')
+        self.stdout.write(self.style.SUCCESS(f'Imported {total} recipes.'))
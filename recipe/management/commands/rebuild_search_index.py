@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipe.search import get_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text recipe search index from the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Number of recipes indexed per transaction.')
+
+    def handle(self, *args, batch_size, **options):
+        total = get_search_index().rebuild(batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} recipes.'))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipe.models import Recipe
+from recipe.response_cache import recipe_cache
+
+
+class Command(BaseCommand):
+    """
+    Repair drift in the denormalized like, comment and bookmark counters.
+
+    The counters are kept up to date by the signal handlers in
+    ``recipe.signals``, but bulk deletes that bypass signals (for example the
+    bookmark rows removed when a profile is deleted) leave them stale.
+    """
+    help = 'Recount likes, comments and bookmarks and fix drifted recipe counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of recipes checked per query.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted recipes without fixing them.')
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        last_pk = 0
+        checked = drifted = 0
+        while True:
+            batch = list(
+                Recipe.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+
+            stale = list(
+                Recipe.objects.filter(pk__in=batch).with_counted_stats()
+                .exclude(like_count=F('counted_like_count'),
+                         comment_count=F('counted_comment_count'),
+                         bookmark_count=F('counted_bookmark_count'))
+                .values_list('pk', flat=True)
+            )
+            drifted += len(stale)
+            if stale and not dry_run:
+                Recipe.objects.filter(pk__in=stale).reconcile_counters()
+                recipe_cache.invalidate_recipes(stale)
+
+        action = 'found' if dry_run else 'fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} recipes, {action} {drifted} with drifted counters.'))
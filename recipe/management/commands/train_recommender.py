@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from recipe.recommender.base import get_recommender_setting
+from recipe.recommender.collaborative import train_model
+
+
+class Command(BaseCommand):
+    """
+    Train the item-item collaborative filtering model served by
+    ``/api/recipe/recommended/``.
+
+    Similarities are computed and written to the memory-mapped model files
+    a batch of recipes at a time, so memory use is bounded by
+    ``--batch-size`` rather than by the number of recipes. The model is
+    published in the database, and running workers on every dyno switch to
+    it within ``MODEL_CHECK_INTERVAL`` seconds.
+    """
+    help = 'Train the recipe recommendation model from likes and bookmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help="Model directory, RECIPE_RECOMMENDER['MODEL_DIR'] by default.")
+        parser.add_argument('--neighbors', type=int, default=None,
+                            help='Similar recipes kept per recipe.')
+        parser.add_argument('--batch-size', type=int, default=1024,
+                            help='Number of recipes whose similarities are computed at once.')
+        parser.add_argument('--keep', type=int, default=2,
+                            help='Number of model versions kept.')
+
+    def handle(self, *args, output, neighbors, batch_size, keep, verbosity, **options):
+        def progress(done, total):
+            if verbosity > 1:
+                self.stdout.write(f'{done}/{total} recipes')
+
+        path = train_model(output or get_recommender_setting('MODEL_DIR'), neighbors=neighbors,
+                           batch_size=batch_size, keep=keep, progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Trained recommender model {path}.'))
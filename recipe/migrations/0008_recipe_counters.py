@@ -0,0 +1,52 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:57
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk')).values('total')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    RecipeLike = apps.get_model('recipe', 'RecipeLike')
+    RecipeComment = apps.get_model('recipe', 'RecipeComment')
+    Bookmark = apps.get_model('users', 'Profile').bookmarks.through
+    Recipe.objects.update(
+        like_count=_count(RecipeLike, 'recipe'),
+        comment_count=_count(RecipeComment, 'recipe'),
+        bookmark_count=_count(Bookmark, 'recipe'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_alter_recipe_picture'),
+        ('users', '0013_remove_profile_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='bookmark_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def backfill_feeds(apps, schema_editor):
+    """
+    Materialize the feeds of existing follow relations.
+    """
+    Follower = apps.get_model('followers', 'Follower')
+    Recipe = apps.get_model('recipe', 'Recipe')
+    FeedEntry = apps.get_model('recipe', 'FeedEntry')
+    threshold = getattr(settings, 'FEED_FANOUT_FOLLOWER_THRESHOLD', 5000)
+    limit = getattr(settings, 'FEED_BACKFILL_LIMIT', 200)
+
+    celebrities = set(
+        Follower.objects.values('to_user').annotate(total=Count('pk'))
+        .filter(total__gt=threshold).values_list('to_user', flat=True)
+    )
+    follows = Follower.objects.exclude(to_user__in=celebrities).values_list('from_user_id', 'to_user_id')
+    for user_id, author_id in follows.iterator():
+        recipes = (
+            Recipe.objects.filter(author_id=author_id).order_by('-created_at', '-id')
+            .values_list('pk', 'created_at')[:limit]
+        )
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=pk, created_at=created_at)
+            for pk, created_at in recipes
+        ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0008_recipe_counters'),
+        ('followers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipe.recipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Feed entry',
+                'verbose_name_plural': 'Feed entries',
+                'indexes': [models.Index(fields=['user', '-created_at', '-recipe'], name='recipe_feed_user_created_idx')],
+                'unique_together': {('user', 'recipe')},
+            },
+        ),
+        migrations.RunPython(backfill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at', '-id'], name='recipe_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipecomment',
+            index=models.Index(fields=['recipe', 'created', 'id'], name='recipe_comment_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='yummly_id',
+            field=models.CharField(blank=True, editable=False, help_text='Set on recipes imported from Yummly', max_length=255, null=True, unique=True, verbose_name='Yummly id'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:43
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_categories(apps, schema_editor):
+    """
+    Keep the oldest category of each name and move the recipes of the
+    others onto it, so the name can be made unique.
+    """
+    RecipeCategory = apps.get_model('recipe', 'RecipeCategory')
+    Recipe = apps.get_model('recipe', 'Recipe')
+    duplicated = (RecipeCategory.objects.values('name')
+                  .annotate(total=Count('pk'), keep=Min('pk')).filter(total__gt=1))
+    for row in duplicated:
+        others = RecipeCategory.objects.filter(name=row['name']).exclude(pk=row['keep'])
+        Recipe.objects.filter(category__in=others).update(category_id=row['keep'])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0012_recipe_yummly_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0013_dedupe_recipe_categories'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipecategory',
+            name='name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Category name'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='recipe_author_created_idx'),
+        ),
+        # The composite index serves every lookup the plain FK index did.
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
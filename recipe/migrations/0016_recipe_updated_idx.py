@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0015_index_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_at'], name='recipe_updated_idx'),
+        ),
+    ]
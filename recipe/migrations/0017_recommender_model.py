@@ -0,0 +1,26 @@
+# Generated by Django 4.2.11 on 2026-10-18 22:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0016_recipe_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommenderModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=32, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('archive', models.BinaryField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-like_count', '-created_at', '-id'], name='recipe_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.11 on 2026-10-18 22:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def mark_celebrities(apps, schema_editor):
+    """
+    Record the authors whose recipes were pulled, as counted until now.
+    """
+    Follower = apps.get_model('followers', 'Follower')
+    FeedCelebrity = apps.get_model('recipe', 'FeedCelebrity')
+    threshold = getattr(settings, 'FEED_FANOUT_FOLLOWER_THRESHOLD', 5000)
+    celebrities = (
+        Follower.objects.values('to_user').annotate(total=Count('pk'))
+        .filter(total__gt=threshold).values_list('to_user', flat=True)
+    )
+    FeedCelebrity.objects.bulk_create([FeedCelebrity(author_id=pk) for pk in celebrities])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_remove_profile_status'),
+        ('recipe', '0018_recipe_version'),
+        ('followers', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCelebrity',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('since', models.DateTimeField(null=True)),
+            ],
+            options={
+                'verbose_name': 'Feed celebrity',
+                'verbose_name_plural': 'Feed celebrities',
+            },
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
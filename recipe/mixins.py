@@ -0,0 +1,110 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .response_cache import recipe_cache
+from .serializers import RecipeListSerializer
+
+
+class RecipeListMixin:
+    """
+    ``list()`` for generic recipe list views: reads ``.values()`` rows and
+    serializes them with ``RecipeListSerializer``, honouring ``?fields=``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        try:
+            serializer = RecipeListSerializer.from_request(request)
+        except ValueError as e:
+            return Response({"status": 0, "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = serializer.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET for API views.
+
+    ``get_validators()`` returns a version of the data behind the response
+    and its last-modified datetime, read with one cheap query. The ETag
+    hashes the version with the URL and ``Accept`` header; a matching
+    ``If-None-Match`` (or ``If-Modified-Since``) is answered with a 304
+    before the body is loaded or serialized. The version is kept as
+    ``data_version`` for ``CachedPayloadMixin``.
+    """
+    # Whether the last-modified datetime moves on every change to the
+    # response. Aggregate maxima miss deletions and ``updated_at`` misses
+    # counter changes, so views over them only honour If-None-Match and
+    # send Last-Modified for information.
+    last_modified_is_exact = True
+
+    def get_validators(self):
+        """
+        Return ``(version, last_modified)``, or None when there is nothing
+        to validate (the view then answers as usual, e.g. with a 404).
+        """
+        raise NotImplementedError
+
+    # The version read by get_validators() for the current request.
+    data_version = None
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+        version, last_modified = validators
+        self.data_version = version
+        key = repr((request.get_full_path(), request.headers.get('Accept', ''), version))
+        etag = quote_etag(hashlib.sha1(key.encode()).hexdigest()[:20])
+        timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp if self.last_modified_is_exact else None)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_cache_control(response, no_cache=True)
+        return response
+
+
+class CachedPayloadMixin:
+    """
+    Serves GET bodies from ``recipe_cache``. ``get_cache_scopes()`` names
+    the scopes the body depends on; the absolute URL, which fixes the
+    query string and the host of picture URLs, tells bodies apart.
+    Only 200 responses are cached.
+
+    Scope versions are bumped by the process that writes, which other
+    workers with a per-process cache never see; so the key also holds the
+    ``data_version`` read from the database by ``ConditionalGetMixin``,
+    which must come first. A cached body then always matches its ETag.
+    """
+
+    def get_cache_scopes(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        built = []
+
+        def build():
+            response = super(CachedPayloadMixin, self).get(request, *args, **kwargs)
+            built.append(response)
+            return response.data if response.status_code == status.HTTP_200_OK else None
+
+        variant = (request.build_absolute_uri(), getattr(self, 'data_version', None))
+        data = recipe_cache.get_or_build(self.get_cache_scopes(), variant, build)
+        if built:
+            return built[0]
+        if data is None:
+            # Another request built an uncacheable response; answer ours.
+            return super().get(request, *args, **kwargs)
+        return Response(data)
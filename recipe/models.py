@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
@@ -7,7 +9,7 @@ class RecipeCategory(models.Model):
     """
     Recipe categories
     """
-    name = models.CharField(_('Category name'), max_length=100)
+    name = models.CharField(_('Category name'), max_length=100, unique=True)
 
     class Meta:
         verbose_name = _('Recipe Category')
@@ -17,6 +19,16 @@ class RecipeCategory(models.Model):
         return self.name
 
 
+class Ingredient(models.Model):
+    """
+    Canonical ingredient name, as produced by ``recipe.ingredients``
+    """
+    name = models.CharField(_('Ingredient name'), max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
 def get_default_recipe_category():
     """
     Returns a default recipe type.
@@ -24,12 +36,64 @@ def get_default_recipe_category():
     return RecipeCategory.objects.get_or_create(name='Others')[0]
 
 
+def _count_rows(model, field):
+    rows = (
+        model.objects.filter(**{field: models.OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk')).values('total')
+    )
+    return Coalesce(models.Subquery(rows), 0)
+
+
+def _counted_stats():
+    """
+    Subquery expressions counting the related rows behind each counter
+    column of a recipe.
+    """
+    return {
+        'like_count': _count_rows(RecipeLike, 'recipe'),
+        'comment_count': _count_rows(RecipeComment, 'recipe'),
+        'bookmark_count': _count_rows(Recipe.bookmarked_by.through, 'recipe'),
+    }
+
+
+class RecipeQuerySet(models.QuerySet):
+    """
+    Recipe queryset
+    """
+
+    def with_stats(self):
+        """
+        Prefetch the author and category so a list of recipes is serialized
+        in a constant number of queries. The like, comment and bookmark
+        totals are read from the denormalized counter columns.
+        """
+        return self.select_related('author', 'category')
+
+    def with_counted_stats(self):
+        """
+        Annotate the like, comment and bookmark totals counted from the
+        related tables, as ``counted_<column>``.
+        """
+        return self.annotate(**{
+            'counted_' + column: expression
+            for column, expression in _counted_stats().items()
+        })
+
+    def reconcile_counters(self):
+        """
+        Overwrite the counter columns with the totals counted from the
+        related tables. Returns the number of rows updated.
+        """
+        return self.update(**_counted_stats(), version=F('version') + 1)
+
+
 class Recipe(models.Model):
     """
     Recipe model
     """
+    # Indexed by recipe_author_created_idx, which leads with the author.
     author = models.ForeignKey(
-        settings.AUTH_USER_MODEL, related_name="recipes", on_delete=models.CASCADE)
+        settings.AUTH_USER_MODEL, related_name="recipes", on_delete=models.CASCADE, db_index=False)
     category = models.ForeignKey(
         RecipeCategory, related_name="recipe_list", on_delete=models.SET(get_default_recipe_category))
     picture = models.ImageField(upload_to='uploads', blank=True, null=True)
@@ -38,15 +102,48 @@ class Recipe(models.Model):
     cook_time = models.TimeField()
     ingredients = models.JSONField(default=list)
     procedure = models.JSONField(default=list)
+    normalized_ingredients = models.ManyToManyField(
+        Ingredient, related_name='recipes', blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    bookmark_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped by changes that leave updated_at alone but show in the recipe's
+    # responses (counters, the author's username); part of its ETag.
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    yummly_id = models.CharField(
+        _('Yummly id'), max_length=255, unique=True, null=True, blank=True, editable=False,
+        help_text=_('Set on recipes imported from Yummly'))
+
+    objects = RecipeQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('like_count', 'comment_count', 'bookmark_count')
 
     class Meta:
         ordering = ('-created_at', )
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='recipe_created_id_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='recipe_author_created_idx'),
+            # Search index catch-up (search.RecipeSearchIndex.sync).
+            models.Index(fields=['updated_at'], name='recipe_updated_idx'),
+            # Most liked first, the recommendations' fallback.
+            models.Index(fields=['-like_count', '-created_at', '-id'], name='recipe_popular_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # The counters are only changed through F() updates; saving an edited
+        # recipe must not write back the copy loaded with the instance.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def get_total_number_of_likes(self):
         return self.recipelike_set.count()
 
@@ -83,5 +180,82 @@ class RecipeComment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipe', 'created', 'id'], name='recipe_comment_created_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username}: {self.text[:20]}'
+
+
+class FeedEntry(models.Model):
+    """
+    Materialized home feed row: a recipe fanned out to one follower of its
+    author. ``created_at`` mirrors the recipe's so the feed is a single
+    range scan over ``(user, created_at)``.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             related_name='feed_entries', on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = _('Feed entry')
+        verbose_name_plural = _('Feed entries')
+        unique_together = ('user', 'recipe')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-recipe'],
+                         name='recipe_feed_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipe_id}'
+
+
+class FeedCelebrity(models.Model):
+    """
+    An author with more followers than ``FEED_FANOUT_FOLLOWER_THRESHOLD``,
+    whose recipes are pulled into feeds at read time instead of fanned out
+    (``recipe.feed``). ``since`` is when that started, None if unknown:
+    recipes posted since then are fanned out if the author drops back.
+    """
+    author = models.OneToOneField(settings.AUTH_USER_MODEL, primary_key=True,
+                                  related_name='+', on_delete=models.CASCADE)
+    since = models.DateTimeField(null=True)
+
+    class Meta:
+        verbose_name = _('Feed celebrity')
+        verbose_name_plural = _('Feed celebrities')
+
+    def __str__(self):
+        return str(self.author_id)
+
+
+class IndexVersion(models.Model):
+    """
+    Version of a recommender index, bumped on every change to the data it
+    is built from. Kept in the database so every worker sees it
+    (``recipe.recommender.base.VersionedIndex``).
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+
+class RecommenderModel(models.Model):
+    """
+    A collaborative filtering model trained by ``manage.py
+    train_recommender``: a zip of its arrays and metadata. Kept in the
+    database so every worker and dyno serves the same model; each unpacks
+    it into its own ``MODEL_DIR`` to memory-map it
+    (``recipe.recommender.collaborative``).
+    """
+    version = models.CharField(max_length=32, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    archive = models.BinaryField()
+
+    def __str__(self):
+        return self.version
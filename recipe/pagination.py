@@ -0,0 +1,139 @@
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.utils.dateparse import parse_datetime
+
+
+def keyset_filter(created_field, id_field, position, descending=True):
+    """
+    Return a Q matching rows strictly after ``position``, a
+    ``(created_at, id)`` pair, in the given sort direction.
+    """
+    created_at, pk = position
+    op = 'lt' if descending else 'gt'
+    return (Q(**{f'{created_field}__{op}': created_at})
+            | Q(**{created_field: created_at, f'{id_field}__{op}': pk}))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on ``(created_at, id)``.
+
+    Pages are fetched with an indexed range condition instead of an OFFSET,
+    so every page costs the same and rows inserted meanwhile do not shift
+    the results. Cursors are signed so clients cannot forge positions.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor.'
+    salt = 'recipe.pagination.cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        created_field, id_field = (field.lstrip('-') for field in self.ordering)
+        descending = self.ordering[0].startswith('-')
+
+        def fetch(position, limit):
+            if position is not None:
+                queryset_page = queryset.filter(
+                    keyset_filter(created_field, id_field, position, descending))
+            else:
+                queryset_page = queryset
+            return list(queryset_page.order_by(*self.ordering)[:limit])
+
+        return self.paginate(request, fetch)
+
+    def paginate(self, request, fetch):
+        """
+        Paginate with ``fetch(position, limit)``, a callable returning at
+        most ``limit`` objects after ``position`` in cursor order.
+        """
+        self.request = request
+        limit = self.get_page_size(request)
+        results = fetch(self.decode_cursor(request), limit + 1)
+        self.next_position = None
+        if len(results) > limit:
+            results = results[:limit]
+            self.next_position = self.get_position(results[-1])
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_position(self, obj):
+        created_field, id_field = (field.lstrip('-') for field in self.ordering)
+        if isinstance(obj, dict):
+            # A .values() row.
+            return obj[created_field], obj[id_field]
+        return getattr(obj, created_field), getattr(obj, id_field)
+
+    def encode_cursor(self, position):
+        created_at, pk = position
+        return signing.dumps([created_at.isoformat(), pk], salt=self.salt)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            created_at, pk = signing.loads(cursor, salt=self.salt)
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class CommentPagination(KeysetPagination):
+    """
+    Comments read oldest first.
+    """
+    ordering = ('created', 'id')
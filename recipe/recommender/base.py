@@ -0,0 +1,169 @@
+"""
+Process-local copies of recommender indexes.
+
+Indexes are built from the database into NumPy/SciPy arrays and kept in
+memory by each worker. Writers call ``invalidate()``, which bumps a version
+number in the database (``IndexVersion``), the one place every worker
+reads; readers notice the new version and rebuild,
+at most once every ``REBUILD_INTERVAL`` seconds and in a background thread
+while the previous copy keeps being served.
+
+Indexes that can be patched in place also get an ``update`` function.
+Writers then log the ids they changed under each version in the default
+cache, and readers that are only a few versions behind apply just those
+changes instead of waiting for a rebuild. A log that is missing, as in
+workers with a per-process cache, just means a rebuild.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# Versions a reader may lag behind and still catch up from the change log.
+MAX_LOGGED_CHANGES = 1000
+CHANGE_LOG_TIMEOUT = 24 * 60 * 60
+
+DEFAULTS = {
+    'REBUILD_INTERVAL': 60,
+    'BACKGROUND_REBUILD': True,
+    'MODEL_DIR': 'recommender_model',
+    'MODEL_CHECK_INTERVAL': 30,
+    'NEIGHBORS': 50,
+    'LIKE_WEIGHT': 1.0,
+    'BOOKMARK_WEIGHT': 2.0,
+    'HISTORY_LIMIT': 200,
+}
+
+
+def get_recommender_setting(name, default=None):
+    config = {**DEFAULTS, **getattr(settings, 'RECIPE_RECOMMENDER', {})}
+    return config.get(name, default)
+
+
+class VersionedIndex:
+    """
+    Holds the latest copy of the index built by ``build()``.
+
+    ``update(index, ids)``, when given, returns a copy of ``index`` with the
+    objects in ``ids`` re-read, or None when a full rebuild is preferable.
+    """
+
+    def __init__(self, name, build, update=None):
+        self.name = name
+        self.build = build
+        self.update = update
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._built_at = 0.0
+        self._rebuilding = False
+
+    def current_version(self):
+        from ..models import IndexVersion
+
+        version = IndexVersion.objects.filter(name=self.name).values_list('version', flat=True).first()
+        return version or 0
+
+    def _change_key(self, version):
+        return f'recommender:{self.name}:changes:{version}'
+
+    def invalidate(self, changed=None):
+        """
+        Mark every process's copy as out of date. ``changed`` lists the ids
+        of the changed objects, if known.
+        """
+        from ..models import IndexVersion
+
+        versions = IndexVersion.objects.filter(name=self.name)
+        with transaction.atomic():
+            # The update locks the row, so the version read back is ours.
+            if not versions.update(version=F('version') + 1):
+                IndexVersion.objects.get_or_create(name=self.name)
+                versions.update(version=F('version') + 1)
+            version = versions.values_list('version', flat=True).get()
+        if changed is not None:
+            cache.set(self._change_key(version), list(changed), CHANGE_LOG_TIMEOUT)
+
+    def reset(self):
+        """
+        Drop this process's copy; the next ``get()`` rebuilds it.
+        """
+        with self._lock:
+            self._index = None
+            self._version = None
+
+    def get(self):
+        version = self.current_version()
+        with self._lock:
+            index, built_version, built_at = self._index, self._version, self._built_at
+        if index is None:
+            return self._rebuild(version)
+        if built_version == version:
+            return index
+        if self.update is not None:
+            updated = self._apply_changes(index, built_version, version)
+            if updated is not None:
+                return updated
+        if time.monotonic() - built_at >= get_recommender_setting('REBUILD_INTERVAL'):
+            if get_recommender_setting('BACKGROUND_REBUILD'):
+                self._rebuild_in_background(version)
+            else:
+                return self._rebuild(version)
+        return index
+
+    def _apply_changes(self, index, built_version, version):
+        """
+        Bring ``index`` from ``built_version`` up to ``version`` from the
+        change log. Returns None when the log does not cover the gap.
+        """
+        if not 0 < version - built_version <= MAX_LOGGED_CHANGES:
+            return None
+        keys = [self._change_key(v) for v in range(built_version + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        updated = self.update(index, set().union(*changes.values()))
+        if updated is None:
+            return None
+        with self._lock:
+            # Keep a copy another thread has moved on since.
+            if self._version == built_version:
+                self._index, self._version = updated, version
+        return updated
+
+    def _rebuild(self, version):
+        with self._build_lock:
+            with self._lock:
+                if self._index is not None and self._version == version:
+                    return self._index
+            started = time.monotonic()
+            index = self.build()
+            with self._lock:
+                self._index, self._version, self._built_at = index, version, time.monotonic()
+            logger.info('Built %s index in %.2fs', self.name, time.monotonic() - started)
+            return index
+
+    def _rebuild_in_background(self, version):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def rebuild():
+            try:
+                self._rebuild(version)
+            except Exception:
+                logger.exception('Failed to rebuild the %s index', self.name)
+            finally:
+                connection.close()
+                with self._lock:
+                    self._rebuilding = False
+
+        threading.Thread(target=rebuild, daemon=True).start()
@@ -0,0 +1,125 @@
+"""
+"What can I cook" recommendations.
+
+Recipes are ranked by how much of their ingredient list the user already
+has. The index is a sparse binary recipe x ingredient matrix (CSR) plus its
+transpose, which serves as the ingredient -> recipe posting lists. A query
+only touches the postings of the ingredients it names: matches per recipe
+are counted with ``bincount`` and the best recipes are picked with a
+partial sort, so its cost grows with the number of matching postings rather
+than with the size of the catalogue.
+"""
+import itertools
+
+import numpy as np
+from scipy import sparse
+
+from ..ingredients import normalize_ingredients
+from ..models import Ingredient, Recipe
+from .base import VersionedIndex, get_recommender_setting
+
+DEFAULT_PANTRY_STAPLES = ('salt', 'pepper', 'black pepper', 'water', 'oil', 'olive oil', 'vegetable oil')
+
+
+def get_pantry_staples():
+    """
+    Ingredients every user is assumed to have.
+    """
+    return normalize_ingredients(list(get_recommender_setting('PANTRY_STAPLES', DEFAULT_PANTRY_STAPLES)))
+
+
+class IngredientIndex:
+    """
+    Immutable recipe x ingredient index.
+    """
+
+    def __init__(self, recipe_ids, ingredient_names, matrix):
+        # Row i of ``matrix`` is recipe ``recipe_ids[i]``, column j is
+        # ingredient ``ingredient_names[j]``.
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.ingredient_names = list(ingredient_names)
+        self.columns = {name: column for column, name in enumerate(self.ingredient_names)}
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.int8)
+        self.postings = self.matrix.T.tocsr()
+        self.sizes = np.diff(self.matrix.indptr)
+
+    @classmethod
+    def from_pairs(cls, recipe_ids, ingredient_ids, names):
+        """
+        Build the index from parallel arrays of (recipe id, ingredient id)
+        links and a mapping of ingredient id to name.
+        """
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+        row_ids, rows = np.unique(recipe_ids, return_inverse=True)
+        column_ids, columns = np.unique(ingredient_ids, return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int8), (rows, columns)),
+            shape=(len(row_ids), len(column_ids)))
+        # Duplicate links would be summed; keep the matrix binary.
+        matrix.data[:] = 1
+        return cls(row_ids, [names[pk] for pk in column_ids.tolist()], matrix)
+
+    @classmethod
+    def from_db(cls):
+        links = Recipe.normalized_ingredients.through.objects.values_list('recipe_id', 'ingredient_id')
+        pairs = np.fromiter(
+            itertools.chain.from_iterable(links.iterator(chunk_size=20000)), dtype=np.int64,
+        ).reshape(-1, 2)
+        names = dict(Ingredient.objects.values_list('pk', 'name'))
+        return cls.from_pairs(pairs[:, 0], pairs[:, 1], names)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def recommend(self, ingredients, limit=20, max_missing=None, staples=()):
+        """
+        Rank recipes using at least one of ``ingredients`` (canonical names)
+        by the fraction of their ingredients covered by ``ingredients`` plus
+        ``staples``, then by the number covered.
+
+        Returns ``(recipe_id, coverage, missing_names)`` tuples, best first.
+        """
+        wanted = self._columns(ingredients)
+        if not wanted.size or limit <= 0:
+            return []
+        staples = np.setdiff1d(self._columns(staples), wanted)
+
+        counts = np.bincount(self._postings_of(wanted), minlength=len(self))
+        candidates = np.flatnonzero(counts)
+        matched = counts[candidates]
+        if staples.size:
+            matched += np.bincount(self._postings_of(staples), minlength=len(self))[candidates]
+        missing = self.sizes[candidates] - matched
+        if max_missing is not None:
+            keep = missing <= max_missing
+            candidates, matched, missing = candidates[keep], matched[keep], missing[keep]
+        coverage = matched / self.sizes[candidates]
+
+        if len(candidates) > limit:
+            # Everything tied with the limit-th best coverage stays in the
+            # running; only that shortlist is fully sorted.
+            threshold = np.partition(coverage, len(coverage) - limit)[len(coverage) - limit]
+            shortlist = coverage >= threshold
+            candidates, matched, coverage = candidates[shortlist], matched[shortlist], coverage[shortlist]
+        order = np.lexsort((candidates, -matched, -coverage))[:limit]
+
+        in_pantry = np.zeros(len(self.ingredient_names), dtype=bool)
+        in_pantry[wanted] = True
+        in_pantry[staples] = True
+        results = []
+        for row, score in zip(candidates[order].tolist(), coverage[order].tolist()):
+            columns = self.matrix.indices[self.matrix.indptr[row]:self.matrix.indptr[row + 1]]
+            missing_names = [self.ingredient_names[column] for column in columns[~in_pantry[columns]]]
+            results.append((int(self.recipe_ids[row]), score, sorted(missing_names)))
+        return results
+
+    def _columns(self, names):
+        return np.array(sorted({self.columns[name] for name in names if name in self.columns}),
+                        dtype=np.int64)
+
+    def _postings_of(self, columns):
+        return self.postings[columns].indices
+
+
+ingredient_index = VersionedIndex('ingredients', IngredientIndex.from_db)
@@ -0,0 +1,273 @@
+"""
+Item-item collaborative filtering from likes and bookmarks.
+
+``manage.py train_recommender`` builds a user x recipe matrix of implicit
+feedback (likes and bookmarks, weighted by ``LIKE_WEIGHT`` and
+``BOOKMARK_WEIGHT``), computes the cosine similarity between recipes a
+mini-batch of rows at a time and keeps each recipe's ``NEIGHBORS`` most
+similar recipes. The arrays are written as ``.npy`` files under
+``MODEL_DIR/<version>/`` and published by saving them, zipped, as a
+``RecommenderModel`` row, which every dyno can read.
+
+Workers unpack the latest model into their own ``MODEL_DIR`` once and
+memory-map it, so serving a user only gathers the neighbours of the
+recipes they recently liked or bookmarked; nothing is trained per request.
+"""
+import datetime
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from users.models import Profile
+
+from ..models import Recipe, RecipeLike, RecommenderModel
+from .base import get_recommender_setting
+
+MODEL_FILES = ('item_ids.npy', 'neighbors.npy', 'scores.npy', 'meta.json')
+
+
+def _pairs(queryset):
+    return np.fromiter(
+        itertools.chain.from_iterable(queryset.iterator(chunk_size=20000)), dtype=np.int64,
+    ).reshape(-1, 2)
+
+
+def build_interactions(like_weight=1.0, bookmark_weight=1.0):
+    """
+    Return ``(user_ids, recipe_ids, matrix)`` where ``matrix`` is a CSR
+    user x recipe matrix of summed feedback weights.
+    """
+    likes = _pairs(RecipeLike.objects.values_list('user_id', 'recipe_id'))
+    bookmarks = _pairs(Profile.bookmarks.through.objects.values_list('profile__user_id', 'recipe_id'))
+    pairs = np.concatenate([likes, bookmarks])
+    weights = np.concatenate([np.full(len(likes), like_weight, dtype=np.float32),
+                              np.full(len(bookmarks), bookmark_weight, dtype=np.float32)])
+    user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    recipe_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix((weights, (rows, columns)), shape=(len(user_ids), len(recipe_ids)))
+    return user_ids, recipe_ids, matrix
+
+
+def item_neighbors(matrix, neighbors, batch_size=1024):
+    """
+    Yield ``(start, ids, scores)`` blocks of the ``neighbors`` most similar
+    items (columns of ``matrix``) to items ``start``, ``start + 1``, ...
+    Rows are padded with id -1 and score 0 where an item has fewer
+    neighbours. Only one block of similarities is held in memory at a time.
+    """
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = (matrix @ sparse.diags(1 / norms)).astype(np.float32).tocsc()
+    by_item = normalized.T.tocsr()
+    count = matrix.shape[1]
+
+    for start in range(0, count, batch_size):
+        stop = min(start + batch_size, count)
+        similarities = (by_item[start:stop] @ normalized).tocsr()
+        ids = np.full((stop - start, neighbors), -1, dtype=np.int32)
+        scores = np.zeros((stop - start, neighbors), dtype=np.float32)
+        for offset in range(stop - start):
+            begin, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+            columns = similarities.indices[begin:end]
+            values = similarities.data[begin:end]
+            keep = columns != start + offset
+            columns, values = columns[keep], values[keep]
+            if len(values) > neighbors:
+                top = np.argpartition(-values, neighbors)[:neighbors]
+                columns, values = columns[top], values[top]
+            order = np.argsort(-values, kind='stable')
+            ids[offset, :len(order)] = columns[order]
+            scores[offset, :len(order)] = values[order]
+        yield start, ids, scores
+
+
+def train_model(directory, neighbors=None, batch_size=1024, keep=2, progress=None):
+    """
+    Train a model from the current likes and bookmarks into ``directory``,
+    publish it in the database and delete all but the ``keep`` newest
+    versions of both. Returns the path of the new version.
+    """
+    neighbors = neighbors or get_recommender_setting('NEIGHBORS')
+    directory = Path(directory)
+    _, recipe_ids, matrix = build_interactions(get_recommender_setting('LIKE_WEIGHT'),
+                                               get_recommender_setting('BOOKMARK_WEIGHT'))
+
+    version = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    path = directory / version
+    path.mkdir(parents=True)
+    np.save(path / 'item_ids.npy', recipe_ids)
+    shape = (len(recipe_ids), neighbors)
+    neighbor_ids = np.lib.format.open_memmap(path / 'neighbors.npy', mode='w+', dtype=np.int32, shape=shape)
+    neighbor_scores = np.lib.format.open_memmap(path / 'scores.npy', mode='w+', dtype=np.float32, shape=shape)
+    for start, ids, scores in item_neighbors(matrix, neighbors, batch_size):
+        neighbor_ids[start:start + len(ids)] = ids
+        neighbor_scores[start:start + len(ids)] = scores
+        if progress:
+            progress(start + len(ids), len(recipe_ids))
+    neighbor_ids.flush()
+    neighbor_scores.flush()
+    del neighbor_ids, neighbor_scores
+
+    (path / 'meta.json').write_text(json.dumps({
+        'version': version,
+        'users': matrix.shape[0],
+        'recipes': matrix.shape[1],
+        'interactions': int(matrix.nnz),
+        'neighbors': neighbors,
+    }))
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zipped:
+        for name in MODEL_FILES:
+            zipped.write(path / name, name)
+    RecommenderModel.objects.create(version=version, archive=archive.getvalue())
+
+    if keep:
+        kept = RecommenderModel.objects.order_by('-version').values_list('version', flat=True)[:keep]
+        RecommenderModel.objects.exclude(version__in=list(kept)).delete()
+    versions = sorted(child for child in directory.iterdir() if child.is_dir() and child.name[0] != '.')
+    for old in versions[:-keep] if keep else []:
+        shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def unpack_model(directory, version):
+    """
+    Return the path of ``version`` under ``directory``, first unpacking it
+    from the database unless this machine already has it.
+    """
+    directory = Path(directory)
+    path = directory / version
+    if (path / 'meta.json').exists():
+        return path
+    archive = RecommenderModel.objects.filter(version=version).values_list('archive', flat=True).get()
+    directory.mkdir(parents=True, exist_ok=True)
+    # Unpacked next to its final place and renamed, so other workers never
+    # see half a model.
+    unpacked = Path(tempfile.mkdtemp(prefix='.unpack-', dir=directory))
+    try:
+        with zipfile.ZipFile(io.BytesIO(archive)) as zipped:
+            zipped.extractall(unpacked)
+        os.replace(unpacked, path)
+    except OSError:
+        if not (path / 'meta.json').exists():
+            raise
+    finally:
+        shutil.rmtree(unpacked, ignore_errors=True)
+    return path
+
+
+class CollaborativeModel:
+    """
+    A trained model, memory-mapped read-only.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / 'meta.json').read_text())
+        self.item_ids = np.load(self.path / 'item_ids.npy')
+        self.neighbors = np.load(self.path / 'neighbors.npy', mmap_mode='r')
+        self.scores = np.load(self.path / 'scores.npy', mmap_mode='r')
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    def _rows(self, recipe_ids):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        rows = np.searchsorted(self.item_ids, recipe_ids)
+        rows = np.minimum(rows, max(len(self.item_ids) - 1, 0))
+        found = self.item_ids[rows] == recipe_ids if len(self.item_ids) else np.zeros(len(rows), bool)
+        return rows[found]
+
+    def recommend(self, history, limit=20):
+        """
+        Return ``(recipe_id, score)`` pairs for the recipes most similar to
+        those in ``history``, excluding ``history`` itself, best first.
+        """
+        rows = self._rows(history)
+        if not rows.size or limit <= 0:
+            return []
+        rows = np.unique(rows)
+        ids = np.asarray(self.neighbors[rows]).ravel()
+        scores = np.asarray(self.scores[rows]).ravel()
+        valid = (ids >= 0) & ~np.isin(ids, rows)
+        candidates, inverse = np.unique(ids[valid], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[valid], minlength=len(candidates))
+        if len(candidates) > limit:
+            top = np.argpartition(-totals, limit)[:limit]
+            candidates, totals = candidates[top], totals[top]
+        order = np.lexsort((candidates, -totals))
+        return [(int(self.item_ids[row]), float(score))
+                for row, score in zip(candidates[order], totals[order])]
+
+
+class LatestModel:
+    """
+    Loads the latest published model into ``MODEL_DIR``, checking for a
+    newer one at most every ``MODEL_CHECK_INTERVAL`` seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model = None
+        self._checked_at = None
+        self._directory = None
+
+    def reset(self):
+        with self._lock:
+            self._model = self._checked_at = self._directory = None
+
+    def get(self):
+        directory = Path(get_recommender_setting('MODEL_DIR'))
+        now = time.monotonic()
+        with self._lock:
+            if (self._directory == directory and self._checked_at is not None
+                    and now - self._checked_at < get_recommender_setting('MODEL_CHECK_INTERVAL')):
+                return self._model
+            version = RecommenderModel.objects.order_by('-version').values_list('version', flat=True).first()
+            if version is None:
+                self._model = None
+            elif self._model is None or self._directory != directory or self._model.version != version:
+                self._model = CollaborativeModel(unpack_model(directory, version))
+            self._directory, self._checked_at = directory, now
+            return self._model
+
+
+latest_model = LatestModel()
+
+
+def recommend_for_user(user, limit=20):
+    """
+    Return ids of recipes to recommend to ``user``: neighbours of their
+    recently liked and bookmarked recipes, topped up with the most liked
+    recipes they have not interacted with (all of it for new users or
+    before a model has been trained).
+    """
+    history_limit = get_recommender_setting('HISTORY_LIMIT')
+    history = list(
+        RecipeLike.objects.filter(user=user).order_by('-created')
+        .values_list('recipe_id', flat=True)[:history_limit]
+    ) + list(
+        Profile.bookmarks.through.objects.filter(profile__user=user).order_by('-pk')
+        .values_list('recipe_id', flat=True)[:history_limit]
+    )
+
+    model = latest_model.get()
+    recipe_ids = [pk for pk, _ in model.recommend(history, limit)] if model and history else []
+    if len(recipe_ids) < limit:
+        recipe_ids += list(
+            Recipe.objects.exclude(pk__in=history + recipe_ids)
+            .order_by('-like_count', '-created_at', '-id')
+            .values_list('pk', flat=True)[:limit - len(recipe_ids)]
+        )
+    return recipe_ids
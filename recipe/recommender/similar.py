@@ -0,0 +1,303 @@
+"""
+Content-based "similar recipes".
+
+Each recipe is described by hashed TF-IDF features of its title,
+description, category and normalized ingredients, L2-normalized so a dot
+product is the cosine similarity. Nearest neighbours are found with an
+inverted-file (IVF) index: spherical k-means splits the recipes into
+``LISTS`` clusters whose centroids are pruned to their ``CENTROID_TERMS``
+heaviest terms, and a query ranks exactly only the recipes in the
+``PROBES`` clusters closest to it, which bounds its cost. Small catalogues
+(below ``EXACT_BELOW`` recipes) are simply scored in full.
+
+The index is patched on recipe save and delete: changed recipes are
+re-vectorized into a small overlay scanned in full by every query and
+hidden from the base arrays, which are only rebuilt once the overlay grows
+past ``MAX_OVERLAY`` recipes.
+"""
+import collections
+import re
+import zlib
+
+import numpy as np
+from scipy import sparse
+
+from ..models import Recipe
+from .base import VersionedIndex, get_recommender_setting
+
+DEFAULTS = {
+    'FEATURES': 2 ** 14,
+    # Number of clusters; 4 * sqrt(recipes) when None.
+    'LISTS': None,
+    'PROBES': 32,
+    'CENTROID_TERMS': 256,
+    'TRAIN_ITERATIONS': 10,
+    'TRAIN_SAMPLE_PER_LIST': 30,
+    'EXACT_BELOW': 20000,
+    'MAX_OVERLAY': 5000,
+}
+
+FIELD_WEIGHTS = {'title': 3.0, 'desc': 1.0, 'category': 2.0, 'ingredient': 2.0}
+WORD_RE = re.compile(r'[a-z]{2,}')
+STOP_WORDS = frozenset("""
+    and the with for from into this that your you are our its of in on to or
+    an at by is it be as so my me we
+""".split())
+SEED = 20240301
+
+
+def get_similar_setting(name):
+    return {**DEFAULTS, **get_recommender_setting('SIMILAR', {})}[name]
+
+
+def _tokens(title, desc, category, ingredient_ids):
+    for field, text in (('title', title), ('desc', desc)):
+        for word in WORD_RE.findall((text or '').lower()):
+            if word not in STOP_WORDS:
+                yield field, word
+    if category:
+        yield 'category', category.lower()
+    for ingredient_id in ingredient_ids:
+        yield 'ingredient', str(ingredient_id)
+
+
+def hashed_features(title, desc, category, ingredient_ids, dims):
+    """
+    Return ``(columns, weights)`` of the field-weighted term counts of a
+    recipe, hashed into ``dims`` columns.
+    """
+    counts = collections.Counter()
+    for field, token in _tokens(title, desc, category, ingredient_ids):
+        counts[zlib.crc32(f'{field}:{token}'.encode()) % dims] += FIELD_WEIGHTS[field]
+    columns = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    order = np.argsort(columns)
+    return columns[order], weights[order]
+
+
+def _term_matrix(documents, dims):
+    """
+    ``documents`` yields ``(recipe_id, title, desc, category, ingredient_ids)``.
+    Returns the recipe ids and a CSR matrix of their term weights.
+    """
+    ids, indptr, indices, data = [], [0], [], []
+    for recipe_id, title, desc, category, ingredient_ids in documents:
+        columns, weights = hashed_features(title, desc, category, ingredient_ids, dims)
+        ids.append(recipe_id)
+        indices.append(columns)
+        data.append(weights)
+        indptr.append(indptr[-1] + len(columns))
+    matrix = sparse.csr_matrix(
+        (np.concatenate(data) if data else np.zeros(0, np.float32),
+         np.concatenate(indices) if indices else np.zeros(0, np.int32),
+         np.asarray(indptr, dtype=np.int64)),
+        shape=(len(ids), dims))
+    return np.asarray(ids, dtype=np.int64), matrix
+
+
+def _l2_normalize(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms).astype(np.float32) @ matrix)
+
+
+def _prune_rows(matrix, terms):
+    """
+    Keep the ``terms`` largest entries of each row of a CSR matrix and
+    L2-normalize the rows.
+    """
+    matrix = sparse.csr_matrix(matrix)
+    indptr, indices, data = [0], [], []
+    for row in range(matrix.shape[0]):
+        begin, end = matrix.indptr[row], matrix.indptr[row + 1]
+        columns, values = matrix.indices[begin:end], matrix.data[begin:end]
+        if len(values) > terms:
+            top = np.argpartition(-values, terms)[:terms]
+            columns, values = columns[top], values[top]
+        norm = np.sqrt(np.dot(values, values)) or 1.0
+        indices.append(columns)
+        data.append(values / norm)
+        indptr.append(indptr[-1] + len(columns))
+    return sparse.csr_matrix(
+        (np.concatenate(data).astype(np.float32), np.concatenate(indices), indptr),
+        shape=matrix.shape)
+
+
+def _nearest_centroid(vectors, centroids_t, batch_size=5000):
+    """
+    Index of the most similar centroid for each row of ``vectors``. Rows
+    sharing no term with any centroid are spread evenly over the clusters.
+    """
+    nearest = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], batch_size):
+        similarities = (vectors[start:start + batch_size] @ centroids_t).toarray()
+        best = similarities.argmax(axis=1)
+        unmatched = similarities[np.arange(len(best)), best] <= 0
+        best[unmatched] = (np.flatnonzero(unmatched) + start) % centroids_t.shape[1]
+        nearest[start:start + batch_size] = best
+    return nearest
+
+
+def train_centroids(vectors, lists, terms, iterations, sample_per_list, seed=SEED):
+    """
+    Spherical k-means on a sample of ``vectors``. Returns a sparse
+    ``lists`` x features matrix of unit-length, pruned centroids.
+    """
+    rng = np.random.default_rng(seed)
+    count = vectors.shape[0]
+    sample = vectors[rng.choice(count, min(count, lists * sample_per_list), replace=False)]
+    centroids = _prune_rows(sample[rng.choice(sample.shape[0], lists, replace=False)], terms)
+    for _ in range(iterations):
+        nearest = _nearest_centroid(sample, centroids.T.tocsr())
+        members = sparse.csr_matrix(
+            (np.ones(len(nearest), dtype=np.float32), (nearest, np.arange(len(nearest)))),
+            shape=(lists, sample.shape[0]))
+        sums = _prune_rows(members @ sample, terms)
+        # Clusters left without members keep their previous centroid.
+        empty = np.diff(sums.indptr) == 0
+        if empty.any():
+            sums = sparse.vstack([
+                centroids[row] if is_empty else sums[row] for row, is_empty in enumerate(empty)
+            ], format='csr')
+        centroids = sums
+    return centroids
+
+
+def load_documents(recipe_ids=None):
+    """
+    Yield the fields hashed for each recipe, all of them or ``recipe_ids``.
+    """
+    links = Recipe.normalized_ingredients.through.objects.all()
+    recipes = Recipe.objects.order_by('pk')
+    if recipe_ids is not None:
+        links = links.filter(recipe_id__in=recipe_ids)
+        recipes = recipes.filter(pk__in=recipe_ids)
+    ingredients = collections.defaultdict(list)
+    for recipe_id, ingredient_id in links.values_list('recipe_id', 'ingredient_id').iterator(chunk_size=20000):
+        ingredients[recipe_id].append(ingredient_id)
+    for pk, title, desc, category in recipes.values_list('pk', 'title', 'desc', 'category__name').iterator(chunk_size=5000):
+        yield pk, title, desc, category, ingredients.get(pk, ())
+
+
+class SimilarIndex:
+    """
+    IVF index over recipe feature vectors, with an overlay of recently
+    changed recipes. Instances are never modified; ``with_changes`` returns
+    a new one sharing the base arrays.
+    """
+
+    def __init__(self, recipe_ids, vectors, idf, dims, centroids=None):
+        self.dims = dims
+        self.recipe_ids = recipe_ids
+        self.vectors = vectors
+        self.idf = idf
+        self.centroids_t = None
+        if centroids is not None:
+            self.centroids_t = centroids.T.tocsr()
+            nearest = _nearest_centroid(vectors, self.centroids_t)
+            # Rows of each cluster, contiguous: lists[bounds[c]:bounds[c + 1]].
+            self.lists = np.argsort(nearest, kind='stable').astype(np.int32)
+            self.bounds = np.searchsorted(nearest[self.lists], np.arange(centroids.shape[0] + 1))
+
+        self.overlay_ids = np.zeros(0, dtype=np.int64)
+        self.overlay_vectors = sparse.csr_matrix((0, dims), dtype=np.float32)
+        self.hidden = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def build(cls, documents, dims=None):
+        dims = dims or get_similar_setting('FEATURES')
+        ids, terms = _term_matrix(documents, dims)
+        frequencies = np.bincount(terms.indices, minlength=dims)
+        idf = (np.log((1 + len(ids)) / (1 + frequencies)) + 1).astype(np.float32)
+        vectors = _l2_normalize(terms @ sparse.diags(idf))
+
+        centroids = None
+        if len(ids) >= get_similar_setting('EXACT_BELOW'):
+            lists = get_similar_setting('LISTS') or int(4 * np.sqrt(len(ids)))
+            centroids = train_centroids(
+                vectors, min(lists, len(ids)), get_similar_setting('CENTROID_TERMS'),
+                get_similar_setting('TRAIN_ITERATIONS'), get_similar_setting('TRAIN_SAMPLE_PER_LIST'))
+        return cls(ids, vectors, idf, dims, centroids)
+
+    @classmethod
+    def from_db(cls):
+        return cls.build(load_documents())
+
+    def __len__(self):
+        return len(self.recipe_ids) - len(self.hidden) + len(self.overlay_ids)
+
+    def vectorize(self, documents):
+        """
+        Return the ids and normalized vectors of ``documents``, weighted
+        with this index's IDF.
+        """
+        ids, terms = _term_matrix(documents, self.dims)
+        return ids, _l2_normalize(terms @ sparse.diags(self.idf))
+
+    def with_changes(self, documents, recipe_ids):
+        """
+        Return a copy in which the recipes in ``recipe_ids`` are replaced by
+        ``documents`` (recipes missing from it were deleted), or None once
+        the overlay would exceed ``MAX_OVERLAY`` recipes.
+        """
+        changed = np.asarray(sorted(recipe_ids), dtype=np.int64)
+        ids, vectors = self.vectorize(documents)
+        keep = ~np.isin(self.overlay_ids, changed)
+        if keep.sum() + len(ids) > get_similar_setting('MAX_OVERLAY'):
+            return None
+        updated = object.__new__(SimilarIndex)
+        updated.__dict__.update(self.__dict__)
+        updated.overlay_ids = np.concatenate([self.overlay_ids[keep], ids])
+        updated.overlay_vectors = sparse.vstack([self.overlay_vectors[keep], vectors], format='csr')
+        updated.hidden = np.union1d(self.hidden, changed)
+        return updated
+
+    def similar(self, vector, limit=10, exclude=()):
+        """
+        Return ``(recipe_id, similarity)`` pairs for the recipes closest to
+        ``vector`` (one normalized row from ``vectorize``), best first.
+        """
+        if limit <= 0:
+            return []
+        rows = self._candidates(vector)
+        ids = np.concatenate([self.recipe_ids[rows], self.overlay_ids])
+        scores = np.concatenate([
+            (self.vectors[rows] @ vector.T).toarray().ravel(),
+            (self.overlay_vectors @ vector.T).toarray().ravel(),
+        ])
+        keep = scores > 0
+        keep[:len(rows)] &= ~np.isin(ids[:len(rows)], self.hidden)
+        keep &= ~np.isin(ids, np.asarray(list(exclude), dtype=np.int64))
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            ids, scores = ids[top], scores[top]
+        order = np.lexsort((ids, -scores))
+        return [(int(pk), float(score)) for pk, score in zip(ids[order], scores[order])]
+
+    def _candidates(self, vector):
+        if self.centroids_t is None:
+            return np.arange(len(self.recipe_ids))
+        similarities = (vector @ self.centroids_t).toarray().ravel()
+        probes = min(get_similar_setting('PROBES'), len(similarities))
+        closest = np.argpartition(-similarities, probes - 1)[:probes]
+        return np.concatenate([self.lists[self.bounds[c]:self.bounds[c + 1]] for c in closest])
+
+
+def update_similar_index(index, recipe_ids):
+    return index.with_changes(load_documents(recipe_ids), recipe_ids)
+
+
+similar_index = VersionedIndex('similar', SimilarIndex.from_db, update=update_similar_index)
+
+
+def similar_recipes(recipe, limit=10):
+    """
+    Return ``(recipe_id, similarity)`` pairs for the recipes most similar
+    to ``recipe``.
+    """
+    index = similar_index.get()
+    _, vectors = index.vectorize(load_documents([recipe.pk]))
+    if not vectors.shape[0]:
+        return []
+    return index.similar(vectors[0], limit, exclude=[recipe.pk])
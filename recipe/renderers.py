@@ -0,0 +1,132 @@
+"""
+Fast JSON rendering and parsing.
+
+``dumps``/``loads`` use the fastest JSON library installed: orjson, then
+msgspec, then the standard library. Output matches DRF's compact
+``JSONRenderer``: UTF-8, no whitespace, DRF's encoding of dates, decimals
+and lazy strings, and U+2028/U+2029 escaped.
+
+``FastJSONRenderer`` and ``FastJSONParser`` are listed in
+``REST_FRAMEWORK``; ``JsonResponse`` replaces ``django.http.JsonResponse``
+in the Yummly proxy views.
+"""
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Types the library does not encode natively, including datetimes, so
+    # they come out exactly as DRF writes them.
+    return _encoder.default(obj)
+
+
+def _escape_separators(data):
+    # Keep the output a strict JavaScript subset, as DRF does.
+    if b'\xe2\x80\xa8' in data or b'\xe2\x80\xa9' in data:
+        data = data.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return data
+
+
+def _orjson():
+    import orjson
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(data):
+        return _escape_separators(orjson.dumps(data, default=_default, option=options))
+
+    return dumps, orjson.loads
+
+
+def _msgspec():
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=_default)
+
+    def dumps(data):
+        return _escape_separators(encoder.encode(data))
+
+    def loads(data):
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+
+    return dumps, loads
+
+
+def _stdlib():
+    def dumps(data):
+        return _escape_separators(json.dumps(
+            data, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':'),
+        ).encode())
+
+    return dumps, json.loads
+
+
+BACKENDS = {'orjson': _orjson, 'msgspec': _msgspec, 'json': _stdlib}
+
+
+def load_backend(names=tuple(BACKENDS)):
+    """
+    Return ``(name, dumps, loads)`` for the first importable backend.
+    """
+    for name in names:
+        try:
+            return (name, *BACKENDS[name]())
+        except ImportError:
+            continue
+    return ('json', *_stdlib())
+
+
+BACKEND, dumps, loads = load_backend()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` encoding with the fast backend. Indented output, as
+    the browsable API asks for, still goes through the standard library.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    """
+    ``JSONParser`` decoding UTF-8 bodies with the fast backend.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class JsonResponse(HttpResponse):
+    """
+    ``django.http.JsonResponse`` encoding with the fast backend.
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
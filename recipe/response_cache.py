@@ -0,0 +1,193 @@
+"""
+Cache of serialized recipe payloads.
+
+Recipe detail bodies and recipe list pages are cached under keys that
+embed the current version of every *scope* the payload depends on: the
+recipe (``recipe:<pk>``), the ``category__name`` and ``author__username``
+filters of a list (``category:<name>``, ``author:<username>``), or every
+recipe (``all``) for unfiltered lists. A write bumps the versions of the
+scopes it touches (see ``recipe.signals``); entries under old versions
+are never read again and simply expire. Nothing is deleted, so an
+invalidation does not make every reader rebuild at once, and concurrent
+misses on the same key are built once per process.
+
+Versions are read before the database is, so a payload built from data
+older than a concurrent write is stored under the version that write
+retires.
+
+Scope versions live in the cache, so with a per-process backend only the
+worker that wrote sees them move. Views therefore also put a version read
+from the database in the ``variant`` (``recipe.mixins.CachedPayloadMixin``
+uses the ETag's), which every worker agrees on.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from monitoring.metrics import CACHE_EVENTS
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TTL': 600,
+    'KEY_PREFIX': 'recipes',
+}
+
+
+class _Build:
+    """
+    A payload build in progress, shared by every caller of the same key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def recipe_scopes(pk, category_name, username):
+    """
+    Scopes whose payloads include the given recipe.
+    """
+    return {f'recipe:{pk}', 'all', f'category:{category_name}', f'author:{username}'}
+
+
+class RecipeCache:
+    """
+    Version-keyed payload cache with per-process request coalescing.
+    """
+
+    def __init__(self, alias=None, ttl=None, key_prefix=None):
+        config = {**DEFAULTS, **getattr(settings, 'RECIPE_CACHE', {})}
+        self.alias = alias or config['ALIAS']
+        self.ttl = config['TTL'] if ttl is None else ttl
+        self.key_prefix = key_prefix or config['KEY_PREFIX']
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._counters = {'hits': 0, 'misses': 0, 'builds': 0, 'invalidations': 0}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self, scope):
+        return f'{self.key_prefix}:version:{scope}'
+
+    def get_versions(self, scopes):
+        """
+        Current version of each scope. A scope without one (never written,
+        or evicted) starts from the clock, so it can never reuse the
+        version of an entry still in the cache.
+        """
+        keys = {self._version_key(scope): scope for scope in scopes}
+        found = self.cache.get_many(list(keys))
+        versions = {}
+        for key, scope in keys.items():
+            version = found.get(key)
+            if version is None:
+                version = time.time_ns()
+                if not self.cache.add(key, version, None):
+                    version = self.cache.get(key, version)
+            versions[scope] = version
+        return versions
+
+    def make_key(self, scopes, variant):
+        """
+        Key of the payload ``variant`` (e.g. the request URL) at the current
+        versions of ``scopes``.
+        """
+        versions = sorted(self.get_versions(scopes).items())
+        digest = hashlib.sha1(repr((variant, versions)).encode()).hexdigest()
+        return f'{self.key_prefix}:payload:{digest}'
+
+    def get_or_build(self, scopes, variant, build):
+        """
+        Return the cached payload of ``variant``, calling ``build()`` to
+        produce it when missing. ``build`` may return None for payloads
+        that must not be cached (errors); exceptions are propagated.
+        """
+        key = self.make_key(scopes, variant)
+        value = self.cache.get(key)
+        if value is not None:
+            self._count('hits')
+            return value
+        self._count('misses')
+        return self._build(key, build)
+
+    def invalidate(self, scopes):
+        """
+        Retire the cached payloads of ``scopes`` by bumping their versions.
+        """
+        for scope in scopes:
+            key = self._version_key(scope)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # Not set yet: any fresh clock value is past every version
+                # handed out so far.
+                self.cache.set(key, time.time_ns(), None)
+        self._count('invalidations')
+
+    def invalidate_recipes(self, recipe_ids):
+        """
+        Retire the payloads that include any of the given recipes, as they
+        are stored now, once the current transaction commits.
+        """
+        from .models import Recipe
+
+        scopes = set()
+        for pk, category_name, username in (Recipe.objects.filter(pk__in=list(recipe_ids))
+                                            .values_list('pk', 'category__name', 'author__username')):
+            scopes |= recipe_scopes(pk, category_name, username)
+        if scopes:
+            transaction.on_commit(lambda: self.invalidate(scopes))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        served = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = counters['hits'] / served if served else 0.0
+        return counters
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+        CACHE_EVENTS.labels('recipes', name).inc()
+
+    def _build(self, key, build):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Build()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            self._count('builds')
+            call.value = build()
+            if call.value is not None:
+                self.cache.set(key, call.value, self.ttl)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+
+recipe_cache = RecipeCache()
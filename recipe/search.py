@@ -0,0 +1,258 @@
+"""
+Full-text recipe search.
+
+Recipes are indexed in an SQLite FTS5 table kept in its own file
+(``RECIPE_SEARCH_INDEX['PATH']``), independent of the main database, over
+the title, description, ingredients and procedure. Queries are ranked with
+BM25, weighting title matches above description, ingredient and procedure
+matches. The index is updated incrementally from the Recipe ``post_save``
+and ``post_delete`` signals and can be rebuilt with
+``manage.py rebuild_search_index``.
+
+The file is local to the machine (each dyno has its own, wiped on
+restart), so before searching, an index that is missing or empty is
+rebuilt from the database, and at most every ``SYNC_INTERVAL`` seconds
+recipes saved by other processes since the last sync (``updated_at``)
+are indexed too. Recipes deleted elsewhere are dropped from the results.
+"""
+import re
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+TABLE = 'recipe_fts'
+STATE_TABLE = 'recipe_fts_state'
+COLUMNS = ('title', 'desc', 'ingredients', 'procedure')
+# BM25 column weights, in COLUMNS order.
+WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def flatten_text(value):
+    """
+    Join every string found in a JSON value (the ``ingredients`` and
+    ``procedure`` fields hold lists of strings or objects).
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return ' '.join(flatten_text(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return ' '.join(flatten_text(item) for item in value)
+    return str(value)
+
+
+def build_match_query(query, prefix=False):
+    """
+    Turn free text into an FTS5 query matching every word, optionally the
+    last one as a prefix. Returns '' when the text has no searchable words.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+DEFAULTS = {
+    'PATH': 'recipe_search.sqlite3',
+    'SYNC_INTERVAL': 60,
+}
+
+
+def get_search_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'RECIPE_SEARCH_INDEX', {})}[name]
+
+
+class RecipeSearchIndex:
+    """
+    FTS5 index keyed by recipe id. Connections are per thread.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._synced = None
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._create_table(connection)
+            self._local.connection = connection
+        return connection
+
+    def _create_table(self, connection):
+        with connection:
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {STATE_TABLE}(key TEXT PRIMARY KEY, value TEXT)')
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE,)).fetchone()
+        if exists:
+            return
+        with connection:
+            connection.execute(
+                f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+                f'{", ".join(COLUMNS)}, tokenize="porter unicode61", prefix="2 3")')
+            connection.execute(
+                f"INSERT INTO {TABLE}({TABLE}, rank) VALUES ('rank', ?)",
+                (f'bm25({", ".join(map(str, WEIGHTS))})',))
+
+    @staticmethod
+    def _row(recipe):
+        return (recipe.pk, recipe.title, recipe.desc,
+                flatten_text(recipe.ingredients), flatten_text(recipe.procedure))
+
+    def index(self, recipes):
+        """
+        Add or replace the given recipes in the index.
+        """
+        rows = [self._row(recipe) for recipe in recipes]
+        with self.connection as connection:
+            connection.executemany(f'DELETE FROM {TABLE} WHERE rowid = ?',
+                                   [(row[0],) for row in rows])
+            connection.executemany(
+                f'INSERT INTO {TABLE}(rowid, {", ".join(COLUMNS)}) VALUES (?, ?, ?, ?, ?)', rows)
+
+    def remove(self, pks):
+        with self.connection as connection:
+            connection.executemany(f'DELETE FROM {TABLE} WHERE rowid = ?', [(pk,) for pk in pks])
+
+    def clear(self):
+        with self.connection as connection:
+            connection.execute(f'DELETE FROM {TABLE}')
+            connection.execute(f'DELETE FROM {STATE_TABLE}')
+
+    def _synced_at(self):
+        row = self.connection.execute(
+            f"SELECT value FROM {STATE_TABLE} WHERE key = 'synced_at'").fetchone()
+        return parse_datetime(row[0]) if row else None
+
+    def _set_synced_at(self, value):
+        with self.connection as connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO {STATE_TABLE}(key, value) VALUES ('synced_at', ?)",
+                (value.isoformat(),))
+
+    def _index_queryset(self, recipes, batch_size):
+        total = 0
+        batch = []
+        for recipe in recipes.only('pk', 'title', 'desc', 'ingredients', 'procedure').iterator(
+                chunk_size=batch_size):
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                self.index(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.index(batch)
+            total += len(batch)
+        return total
+
+    def rebuild(self, batch_size=2000):
+        """
+        Re-index every recipe in the database, ``batch_size`` per
+        transaction. Returns the number of recipes indexed.
+        """
+        from .models import Recipe
+
+        started = timezone.now()
+        self.clear()
+        total = self._index_queryset(Recipe.objects.order_by('pk'), batch_size)
+        self.optimize()
+        self._set_synced_at(started)
+        return total
+
+    def sync(self, batch_size=2000):
+        """
+        Rebuild the index if it was never built (or was lost with the
+        machine's disk), otherwise index the recipes saved since the last
+        sync. Returns the number of recipes indexed.
+        """
+        from .models import Recipe
+
+        synced_at = self._synced_at()
+        if synced_at is None:
+            return self.rebuild(batch_size)
+        started = timezone.now()
+        total = self._index_queryset(Recipe.objects.filter(updated_at__gte=synced_at), batch_size)
+        self._set_synced_at(started)
+        return total
+
+    def sync_if_due(self):
+        """
+        ``sync()`` at most every ``SYNC_INTERVAL`` seconds per process, and
+        always on first use.
+        """
+        with self._sync_lock:
+            now = time.monotonic()
+            if self._synced is not None and now - self._synced < get_search_setting('SYNC_INTERVAL'):
+                return
+            self.sync()
+            self._synced = now
+
+    def optimize(self):
+        """
+        Merge the index b-trees; worth running after a bulk rebuild.
+        """
+        with self.connection as connection:
+            connection.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+
+    def search(self, query, limit=20, offset=0):
+        """
+        Return ``(recipe_id, score)`` pairs best first; lower scores rank
+        higher, as with SQLite's ``bm25()``.
+
+        Whole words are matched first. Only when they do not fill a first
+        page of ``limit`` results is the last word also matched as a prefix
+        (for search-as-you-type), since ranking a prefix that expands to
+        many terms is much slower. The choice does not depend on
+        ``offset``, so every page of a query is cut from the same ranking.
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        if self._count(match, limit) < limit:
+            match = build_match_query(query, prefix=True)
+        return self._match(match, limit, offset)
+
+    def _count(self, match, limit):
+        # Unranked, so stops after ``limit`` hits.
+        return self.connection.execute(
+            f'SELECT count(*) FROM (SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH ? LIMIT ?)',
+            (match, limit)).fetchone()[0]
+
+    def _match(self, match, limit, offset):
+        return self.connection.execute(
+            f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH ? ORDER BY rank LIMIT ? OFFSET ?',
+            (match, limit, offset)).fetchall()
+
+    def count(self):
+        return self.connection.execute(f'SELECT count(*) FROM {TABLE}').fetchone()[0]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index():
+    """
+    Return the index configured by ``RECIPE_SEARCH_INDEX['PATH']``.
+    """
+    path = str(get_search_setting('PATH'))
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = RecipeSearchIndex(path)
+        return _indexes[path]
@@ -0,0 +1,200 @@
+"""
+Bulk seeding of a synthetic dataset for benchmarks and load tests.
+
+Rows are built in memory from a seeded ``random.Random`` and written with
+``bulk_create``, so the same arguments always produce the same data. The
+signal handlers do not run for bulk writes; the data they maintain
+(profiles, counters, ingredient links, the search index) is rebuilt once
+at the end instead.
+
+Popularity is skewed as on real social sites. Authors are picked with
+probability proportional to ``rank ** -exponent`` (a power law), so a few
+write most recipes; likes follow Zipf's law over the recipes, and the
+follower graph is power-law too, so a few users gather most followers.
+"""
+import datetime
+import io
+import itertools
+import random
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from followers.models import Follower
+from users.models import Profile
+
+from .feed import update_celebrities
+from .models import Recipe, RecipeCategory, RecipeLike
+from .response_cache import recipe_cache
+from .yummly.importer import link_ingredients
+
+PASSWORD = 'benchmark-password'
+BATCH_SIZE = 5000
+
+CATEGORIES = ('Breakfast', 'Lunch', 'Dinner', 'Dessert', 'Snack', 'Soup', 'Salad', 'Drinks', 'Baking',
+              'Vegetarian', 'Seafood', 'Others')
+INGREDIENTS = ('chicken breast', 'garlic', 'onion', 'olive oil', 'butter', 'flour', 'sugar', 'egg', 'milk',
+               'tomato', 'basil', 'rice', 'pasta', 'lemon', 'salt', 'black pepper', 'carrot', 'potato',
+               'cheddar cheese', 'parsley', 'ginger', 'soy sauce', 'honey', 'beef', 'salmon', 'spinach',
+               'mushroom', 'cream', 'chili flakes', 'cumin', 'coriander', 'yogurt', 'oats', 'banana',
+               'apple', 'cinnamon', 'vanilla', 'bell pepper', 'zucchini', 'chickpeas')
+UNITS = ('cup', 'tbsp', 'tsp', 'g', 'oz', 'clove', 'pinch', 'slice')
+DISHES = ('stew', 'salad', 'soup', 'bake', 'stir-fry', 'curry', 'pie', 'risotto', 'tart', 'bowl', 'roast')
+STEPS = ('Preheat the oven.', 'Chop the vegetables finely.', 'Heat the oil in a large pan.',
+         'Season with salt and pepper.', 'Simmer until thickened.', 'Stir in the herbs.',
+         'Bake until golden.', 'Rest for five minutes, then serve.')
+
+
+def _batches(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def power_law_weights(count, exponent):
+    """
+    Cumulative weights of ranks ``0..count-1`` proportional to
+    ``(rank + 1) ** -exponent``, for ``random.choices(cum_weights=...)``.
+    """
+    return list(itertools.accumulate((rank + 1) ** -exponent for rank in range(count)))
+
+
+def seed_users(count):
+    """
+    Create ``count`` users sharing the password ``PASSWORD``, with
+    profiles. Returns their ids.
+    """
+    User = get_user_model()
+    password = make_password(PASSWORD)
+    # Past every seeded name: a seeded user's number is below its pk, and
+    # pks are never reused, unlike the row count after deletions.
+    start = User.objects.aggregate(last=Max('pk'))['last'] or 0
+    ids = []
+    for batch in _batches(User(email=f'user{n}@example.com', username=f'user{n}', password=password)
+                          for n in range(start, start + count)):
+        User.objects.bulk_create(batch)
+        emails = [user.email for user in batch]
+        ids.extend(User.objects.filter(email__in=emails).order_by('pk').values_list('pk', flat=True))
+    for batch in _batches(Profile(user_id=pk) for pk in ids):
+        Profile.objects.bulk_create(batch)
+    return ids
+
+
+def _recipe(rng, author_id, category_id):
+    main = rng.choice(INGREDIENTS)
+    lines = [f'{rng.randint(1, 4)} {rng.choice(UNITS)} {name}'
+             for name in rng.sample(INGREDIENTS, rng.randint(5, 14))]
+    return Recipe(
+        author_id=author_id, category_id=category_id,
+        title=f'{main.capitalize()} {rng.choice(DISHES)}',
+        desc=f'A simple {main} dish for every day.',
+        cook_time=datetime.time(rng.randint(0, 2), rng.choice((0, 15, 30, 45))),
+        ingredients=lines,
+        procedure=rng.sample(STEPS, rng.randint(3, len(STEPS))),
+    )
+
+
+def seed_recipes(count, author_ids, rng, exponent=1.0, days=730):
+    """
+    Create ``count`` recipes by ``author_ids``, prolific authors first,
+    spread over the last ``days`` days. Returns their ids.
+    """
+    RecipeCategory.objects.bulk_create([RecipeCategory(name=name) for name in CATEGORIES], ignore_conflicts=True)
+    category_ids = list(RecipeCategory.objects.filter(name__in=CATEGORIES).values_list('pk', flat=True))
+    weights = power_law_weights(len(author_ids), exponent)
+    authors = rng.choices(author_ids, cum_weights=weights, k=count)
+    now = timezone.now()
+    step = datetime.timedelta(days=days) / max(count // BATCH_SIZE, 1)
+    ids = []
+    for number, batch in enumerate(_batches(_recipe(rng, author, rng.choice(category_ids)) for author in authors)):
+        created = Recipe.objects.bulk_create(batch)
+        pks = [recipe.pk for recipe in created]
+        # bulk_create stamps every row with now; age each batch instead.
+        Recipe.objects.filter(pk__in=pks).update(created_at=now - step * number)
+        link_ingredients(created)
+        ids.extend(pks)
+    return ids
+
+
+def seed_likes(count, user_ids, recipe_ids, rng, exponent=1.0):
+    """
+    Create about ``count`` likes, spread over ``recipe_ids`` by Zipf's law
+    in a random popularity order, each from distinct random users. A recipe
+    never gets more likes than there are users, so the most popular ones
+    can cap out. Returns the number created.
+    """
+    ranked = list(recipe_ids)
+    rng.shuffle(ranked)
+    per_recipe = Counter(rng.choices(ranked, cum_weights=power_law_weights(len(ranked), exponent), k=count))
+    now = timezone.now()
+    likes = (RecipeLike(user_id=user, recipe_id=recipe, created=now)
+             for recipe in recipe_ids
+             for user in rng.sample(user_ids, min(per_recipe[recipe], len(user_ids))))
+    created = 0
+    for batch in _batches(likes):
+        RecipeLike.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def seed_follows(count, user_ids, rng, exponent=1.1):
+    """
+    Create about ``count`` follows, spread over the followed users by a
+    power law in ``user_ids`` order, each from distinct other users. A user
+    never gets more followers than there are other users, so the most
+    followed can cap out. Returns the number created.
+    """
+    per_user = Counter(rng.choices(user_ids, cum_weights=power_law_weights(len(user_ids), exponent), k=count))
+    follows = (Follower(from_user_id=follower, to_user_id=followed)
+               for followed in user_ids
+               for follower in _others(rng, user_ids, followed, per_user[followed]))
+    created = 0
+    for batch in _batches(follows):
+        Follower.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def _others(rng, user_ids, user, count):
+    sample = rng.sample(user_ids, min(count + 1, len(user_ids)))
+    return [other for other in sample if other != user][:count]
+
+
+def seed_dataset(users, recipes, likes, follows, seed=0, progress=None):
+    """
+    Seed a complete dataset and rebuild the derived data. Returns a dict
+    of the ids created and the counts written.
+    """
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+
+    # One transaction per table: committing every batch is what makes bulk
+    # loads slow, on SQLite above all.
+    with transaction.atomic():
+        user_ids = seed_users(users)
+    report(f'{len(user_ids)} users')
+    with transaction.atomic():
+        recipe_ids = seed_recipes(recipes, user_ids, rng)
+    report(f'{len(recipe_ids)} recipes')
+    with transaction.atomic():
+        like_count = seed_likes(likes, user_ids, recipe_ids, rng)
+    report(f'{like_count} likes')
+    with transaction.atomic():
+        follow_count = seed_follows(follows, user_ids, rng)
+    report(f'{follow_count} follows')
+
+    Recipe.objects.reconcile_counters()
+    update_celebrities()
+    call_command('rebuild_search_index', stdout=io.StringIO())
+    # The new recipes are in every unfiltered and per-category list.
+    recipe_cache.invalidate({'all', *(f'category:{name}' for name in CATEGORIES)})
+    report('counters, celebrities and search index rebuilt')
+    return {'user_ids': user_ids, 'recipe_ids': recipe_ids, 'likes': like_count, 'follows': follow_count}
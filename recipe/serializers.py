@@ -1,5 +1,9 @@
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
 
+from monitoring.profiling import span
+
 from .models import Recipe, RecipeCategory, RecipeLike, RecipeComment
 
 
@@ -13,9 +17,9 @@ class RecipeSerializer(serializers.ModelSerializer):
     author = serializers.PrimaryKeyRelatedField(read_only=True)
     username = serializers.SerializerMethodField()
     category_name = serializers.CharField(write_only=True)
-    total_number_of_likes = serializers.SerializerMethodField()
-    total_number_of_comments = serializers.SerializerMethodField()
-    total_number_of_bookmarks = serializers.SerializerMethodField()
+    total_number_of_likes = serializers.IntegerField(source='like_count', read_only=True)
+    total_number_of_comments = serializers.IntegerField(source='comment_count', read_only=True)
+    total_number_of_bookmarks = serializers.IntegerField(source='bookmark_count', read_only=True)
 
     class Meta:
         model = Recipe
@@ -23,21 +27,19 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'cook_time', 'ingredients', 'procedure', 'author', 'username',
                   'total_number_of_likes', 'total_number_of_comments','total_number_of_bookmarks')
         read_only_fields = ('category',)
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_username(self, obj):
         return obj.author.username
 
     def get_category_name(self, obj):
         return obj.category.name
 
-    def get_total_number_of_likes(self, obj):
-        return obj.get_total_number_of_likes()
-
-    def get_total_number_of_comments(self, obj):
-        return obj.get_total_number_of_comments()
-
-    def get_total_number_of_bookmarks(self, obj):
-        return obj.get_total_number_of_bookmarks()
-
     def create(self, validated_data):
         category_name = validated_data.pop('category_name')
         category, _ = RecipeCategory.objects.get_or_create(name=category_name)
@@ -46,7 +48,6 @@ class RecipeSerializer(serializers.ModelSerializer):
         return recipe
 
     def update(self, instance, validated_data):
-        print(validated_data)
         if 'category' in validated_data:
             nested_serializer = self.fields['category']
             nested_instance = instance.category
@@ -57,6 +58,137 @@ class RecipeSerializer(serializers.ModelSerializer):
         return super(RecipeSerializer, self).update(instance, validated_data)
 
 
+def _split(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+class RecipeListSerializer:
+    """
+    Read-only counterpart of ``RecipeSerializer`` for list endpoints.
+
+    Builds the same representation straight from ``.values()`` rows,
+    skipping model instances and DRF's per-field machinery. ``fields``
+    restricts the output (and the columns read) to a sparse fieldset.
+
+    ``requested_fields`` reads the fieldset of a request: ``?view=card``
+    for the summary a feed card shows, or ``?fields=`` for an explicit
+    list, either widened by ``?expand=``.
+    """
+    # Output field -> values() lookup, in RecipeSerializer's order.
+    FIELDS = {
+        'id': 'id',
+        'category': 'category_id',
+        'picture': 'picture',
+        'title': 'title',
+        'desc': 'desc',
+        'cook_time': 'cook_time',
+        'ingredients': 'ingredients',
+        'procedure': 'procedure',
+        'author': 'author_id',
+        'username': 'author__username',
+        'total_number_of_likes': 'like_count',
+        'total_number_of_comments': 'comment_count',
+        'total_number_of_bookmarks': 'bookmark_count',
+    }
+    VIEWS = {
+        'full': tuple(FIELDS),
+        'card': ('id', 'picture', 'title', 'username', 'total_number_of_likes',
+                 'total_number_of_comments', 'total_number_of_bookmarks'),
+    }
+    # Always read: the keyset paginator positions on them.
+    KEY_LOOKUPS = ('id', 'created_at')
+
+    def __init__(self, fields=None, request=None):
+        if fields is None:
+            fields = self.FIELDS
+        unknown = set(fields) - self.FIELDS.keys()
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}.")
+        self.fields = [name for name in self.FIELDS if name in fields]
+        self.request = request
+        self._storage = Recipe._meta.get_field('picture').storage
+        # FileSystemStorage.url() is a urljoin() onto base_url; for plain
+        # upload names that is a concatenation.
+        self._base_url = None
+        if isinstance(self._storage, FileSystemStorage) and self._storage.base_url.endswith('/'):
+            self._base_url = self._storage.base_url
+        # build_absolute_uri() re-derives the scheme and host on every call.
+        self._origin = f'{request.scheme}://{request.get_host()}' if request is not None else None
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        Field names selected by the ``view``, ``fields`` and ``expand``
+        query parameters of ``request``, or None for every field. Raises
+        ValueError for an unknown view or field name.
+        """
+        params = request.query_params
+        view = params.get('view')
+        if view is not None and view not in cls.VIEWS:
+            raise ValueError(f"Unknown view: {view}. Choose from {', '.join(cls.VIEWS)}.")
+        fields = _split(params.get('fields'))
+        if not fields:
+            fields = list(cls.VIEWS[view]) if view else None
+        expand = _split(params.get('expand'))
+        unknown = set(fields or ()).union(expand) - cls.FIELDS.keys()
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}.")
+        if fields is None or set(fields).union(expand) >= cls.FIELDS.keys():
+            return None
+        return [name for name in cls.FIELDS if name in fields or name in expand]
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        Serializer for the fieldset ``request`` asks for; raises ValueError
+        as ``requested_fields`` does.
+        """
+        return cls(cls.requested_fields(request), request)
+
+    @classmethod
+    def only(cls, queryset, fields):
+        """
+        ``queryset`` loading just the model columns behind ``fields``,
+        following the author only when the username is wanted.
+        """
+        related = ['author'] if 'username' in fields else []
+        return queryset.select_related(None).select_related(*related).only('id', *(cls.FIELDS[name] for name in fields))
+
+    def lookups(self):
+        return list(dict.fromkeys([*self.KEY_LOOKUPS, *(self.FIELDS[name] for name in self.fields)]))
+
+    def rows(self, queryset):
+        """
+        ``queryset`` as ``.values()`` rows holding just the needed columns.
+        """
+        return queryset.values(*self.lookups())
+
+    def picture_url(self, name):
+        if not name:
+            return None
+        if self._base_url is not None and ':' not in name:
+            url = self._base_url + filepath_to_uri(name).lstrip('/')
+        else:
+            url = self._storage.url(name)
+        if self._origin is None:
+            return url
+        if url.startswith('/') and not url.startswith('//'):
+            return self._origin + url
+        return self.request.build_absolute_uri(url)
+
+    def serialize(self, rows):
+        converters = {
+            'picture': self.picture_url,
+            'cook_time': lambda value: value.isoformat() if value is not None else None,
+        }
+        plan = [(name, self.FIELDS[name], converters.get(name)) for name in self.fields]
+        with span('serializer'):
+            return [
+                {name: convert(row[lookup]) if convert else row[lookup] for name, lookup, convert in plan}
+                for row in rows
+            ]
+
+
 class RecipeLikeSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -0,0 +1,177 @@
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Profile
+
+from .ingredients import normalize_ingredients
+from .models import Ingredient, Recipe, RecipeComment, RecipeLike
+from .recommender.by_ingredients import ingredient_index
+from .recommender.similar import similar_index
+from .response_cache import recipe_cache, recipe_scopes
+from .search import get_search_index
+
+logger = logging.getLogger(__name__)
+
+
+def _bump_counter(recipe_ids, field, delta):
+    """
+    Atomically add ``delta`` to a counter column of the given recipes, and
+    bump their ``version`` so their ETag changes with it.
+    """
+    Recipe.objects.filter(pk__in=recipe_ids).update(**{field: F(field) + delta}, version=F('version') + 1)
+    recipe_cache.invalidate_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=RecipeLike)
+def increment_like_count(sender, instance, created, **kwargs):
+    if created:
+        _bump_counter([instance.recipe_id], 'like_count', 1)
+
+
+@receiver(post_delete, sender=RecipeLike)
+def decrement_like_count(sender, instance, **kwargs):
+    _bump_counter([instance.recipe_id], 'like_count', -1)
+
+
+@receiver(post_save, sender=RecipeComment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        _bump_counter([instance.recipe_id], 'comment_count', 1)
+
+
+@receiver(post_delete, sender=RecipeComment)
+def decrement_comment_count(sender, instance, **kwargs):
+    _bump_counter([instance.recipe_id], 'comment_count', -1)
+
+
+@receiver(m2m_changed, sender=Profile.bookmarks.through)
+def update_bookmark_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_remove':
+        # Django passes every requested pk to the remove signals, bookmarked
+        # or not. Narrow the set to the rows that will actually be deleted.
+        lookup = {'recipe': instance} if reverse else {'profile': instance}
+        column = 'profile_id' if reverse else 'recipe_id'
+        existing = sender.objects.filter(**lookup, **{column + '__in': pk_set})
+        pk_set.intersection_update(existing.values_list(column, flat=True))
+    elif action == 'pre_clear':
+        # pk_set is None for clear(); remember what is about to go.
+        if reverse:
+            instance._cleared_bookmarks = instance.bookmarked_by.count()
+        else:
+            instance._cleared_bookmarks = list(
+                instance.bookmarks.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        delta = 1 if action == 'post_add' else -1
+        if reverse:
+            _bump_counter([instance.pk], 'bookmark_count', delta * len(pk_set))
+        elif pk_set:
+            _bump_counter(pk_set, 'bookmark_count', delta)
+    elif action == 'post_clear':
+        cleared = instance.__dict__.pop('_cleared_bookmarks', None)
+        if reverse and cleared:
+            _bump_counter([instance.pk], 'bookmark_count', -cleared)
+        elif not reverse and cleared:
+            _bump_counter(cleared, 'bookmark_count', -1)
+
+
+@receiver(pre_save, sender=Recipe)
+def uncache_previous_recipe(sender, instance, raw=False, **kwargs):
+    # A recipe moved to another category leaves that category's lists.
+    if not raw and not instance._state.adding:
+        recipe_cache.invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def uncache_recipe(sender, instance, raw=False, **kwargs):
+    if not raw:
+        recipe_cache.invalidate_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def uncache_deleted_recipe(sender, instance, **kwargs):
+    scopes = recipe_scopes(instance.pk, instance.category.name, instance.author.username)
+    transaction.on_commit(lambda: recipe_cache.invalidate(scopes))
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def note_author_rename(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._renamed = False
+    if raw or instance._state.adding or (update_fields is not None and 'username' not in update_fields):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+    instance._renamed = previous is not None and previous != instance.username
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def uncache_renamed_author(sender, instance, raw=False, **kwargs):
+    # Recipe payloads carry the author's username. Cache scopes only move
+    # in this process, so bump the recipes' versions, which are part of
+    # every worker's cache keys and ETags. Only once the new username is
+    # saved: a reader in between would cache the old one under the new
+    # version.
+    if raw or not instance.__dict__.pop('_renamed', False):
+        return
+    recipes = Recipe.objects.filter(author=instance)
+    recipes.update(version=F('version') + 1)
+    recipe_cache.invalidate_recipes(recipes.values_list('pk', flat=True))
+
+
+def _update_search_index(method, argument):
+    def update():
+        try:
+            getattr(get_search_index(), method)([argument])
+        except Exception:
+            # A stale search index must never fail the write itself; it is
+            # repaired by rebuild_search_index.
+            logger.exception('Failed to update the recipe search index')
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _update_search_index('index', instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    _update_search_index('remove', instance.pk)
+
+
+def _sync_ingredients(recipe):
+    """
+    Link the recipe to the canonical names of its ingredient lines.
+    Returns whether the links changed.
+    """
+    names = normalize_ingredients(recipe.ingredients)
+    if set(names) == set(recipe.normalized_ingredients.values_list('name', flat=True)):
+        return False
+    Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+    recipe.normalized_ingredients.set(Ingredient.objects.filter(name__in=names))
+    return True
+
+
+@receiver(post_save, sender=Recipe)
+def sync_recipe_ingredients(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'ingredients' not in update_fields):
+        return
+    if _sync_ingredients(instance):
+        transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+def drop_recipe_ingredients(sender, instance, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_similar_recipes(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pk = instance.pk
+        transaction.on_commit(lambda: similar_index.invalidate([pk]))
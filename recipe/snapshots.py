@@ -0,0 +1,346 @@
+"""
+Precomputed time-of-day feeds.
+
+The day is split into dayparts, each with a Yummly feed tag and the local
+categories that suit it. A snapshot of each daypart (the Yummly feed plus
+the most liked local recipes in those categories) is rendered to JSON once
+and written atomically to ``FEED_SNAPSHOTS['PATH']/<daypart>.json``. The
+time-based feed endpoint serves the snapshot for the caller's local time
+straight from that file, so no request waits on upstream.
+
+Snapshots are refreshed by ``manage.py build_feed_snapshots`` (e.g. from
+cron) or, with ``FEED_SNAPSHOTS['SCHEDULE']`` on, by a background thread in
+each worker; a file lock lets only one process rebuild at a time. Without
+either, a request that finds its snapshot older than ``REFRESH_INTERVAL``
+starts a rebuild in the background and is served the old one meanwhile. A
+request that finds no snapshot builds it under the same lock, or waits up
+to ``BUILD_TIMEOUT`` seconds for the process that is building it.
+"""
+import collections
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows.
+    fcntl = None
+    import msvcrt
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Case, IntegerField, When
+
+from .models import Recipe
+from .serializers import RecipeSerializer
+from .yummly.client import yummly_client
+from .yummly.exceptions import YummlyError
+from .yummly.parsers import feeds_list_result, parse_feed
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'PATH': 'feed_snapshots',
+    'REFRESH_INTERVAL': 15 * 60,
+    'YUMMLY_LIMIT': 5,
+    'LOCAL_LIMIT': 5,
+    'SCHEDULE': False,
+    'BUILD_TIMEOUT': 10,
+}
+
+BREAKFAST_TAG = 'list.recipe.search_based:fq:attribute_s_mv:course^course-Breakfast and Brunch'
+
+Daypart = collections.namedtuple('Daypart', 'name hours tag categories')
+
+DAYPARTS = (
+    Daypart('breakfast', frozenset(range(0, 12)) | {23}, BREAKFAST_TAG,
+            ('Breakfast', 'Brunch')),
+    Daypart('lunch', frozenset(range(12, 15)),
+            'list.recipe.search_based:fq:attribute_s_mv:course^course-Lunch',
+            ('Lunch', 'Salad', 'Sandwich', 'Soup')),
+    Daypart('afternoon', frozenset(range(15, 20)),
+            'list.recipe.search_based: fq:attribute_s_mv: (dish\\ ^ dish\\-cake)',
+            ('Dessert', 'Cake', 'Snack')),
+    Daypart('dinner', frozenset(range(20, 23)),
+            'list.recipe.search_based:fq:attribute_s_mv:(course^course-Main Dishes)',
+            ('Dinner', 'Main Dishes', 'Main Course')),
+)
+
+
+def get_snapshot_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'FEED_SNAPSHOTS', {})}[name]
+
+
+def daypart_for_hour(hour):
+    for daypart in DAYPARTS:
+        if hour in daypart.hours:
+            return daypart
+    raise ValueError(f'No daypart for hour {hour}')
+
+
+def seconds_until_next_daypart(now):
+    """
+    Seconds from the local datetime ``now`` until a different daypart
+    starts.
+    """
+    current = daypart_for_hour(now.hour)
+    boundary = now.replace(minute=0, second=0, microsecond=0)
+    for _ in range(24):
+        boundary += datetime.timedelta(hours=1)
+        if boundary.hour not in current.hours:
+            break
+    return max(int((boundary - now).total_seconds()), 1)
+
+
+def top_local_recipes(daypart, limit):
+    """
+    The most liked local recipes, those in the daypart's categories first.
+    """
+    in_daypart = Case(When(category__name__in=daypart.categories, then=0),
+                      default=1, output_field=IntegerField())
+    return (Recipe.objects.with_stats().annotate(in_daypart=in_daypart)
+            .order_by('in_daypart', '-like_count', '-created_at', '-id')[:limit])
+
+
+class SnapshotStore:
+    """
+    Reads and writes snapshot files. Parsed snapshots are kept in memory
+    until their file changes, so serving one costs a ``stat()``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    @property
+    def directory(self):
+        return Path(get_snapshot_setting('PATH'))
+
+    def path(self, daypart):
+        return self.directory / f'{daypart.name}.json'
+
+    def load(self, daypart):
+        """
+        Return ``(snapshot, body)`` for ``daypart``, or None when it has
+        not been built.
+        """
+        path = self.path(daypart)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            loaded = self._loaded.get(daypart.name)
+        if loaded is not None and loaded[0] == key:
+            return loaded[1], loaded[2]
+        body = path.read_bytes()
+        snapshot = json.loads(body)
+        with self._lock:
+            self._loaded[daypart.name] = (key, snapshot, body)
+        return snapshot, body
+
+    def save(self, daypart, snapshot):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(daypart)
+        temporary = path.with_suffix('.json.tmp')
+        temporary.write_bytes(json.dumps(snapshot, cls=DjangoJSONEncoder).encode())
+        os.replace(temporary, path)
+
+    def age(self, daypart):
+        try:
+            return time.time() - os.stat(self.path(daypart)).st_mtime
+        except FileNotFoundError:
+            return None
+
+
+snapshot_store = SnapshotStore()
+
+
+@contextmanager
+def _try_lock(path):
+    """
+    Take an exclusive lock on the file ``path`` without waiting. Yields
+    whether it was taken; it is released on exit.
+    """
+    with open(path, 'w') as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+            return
+        try:
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def build_snapshot(daypart):
+    """
+    Fetch and store a fresh snapshot of ``daypart``. When Yummly fails the
+    previous snapshot's Yummly part is reused; with no previous snapshot
+    the ``YummlyError`` is raised.
+    """
+    previous = snapshot_store.load(daypart)
+    params = {'start': 0, 'limit': get_snapshot_setting('YUMMLY_LIMIT'), 'tag': daypart.tag}
+    try:
+        data = parse_feed(yummly_client.get_json('feeds/list', params), feeds_list_result)
+    except YummlyError:
+        if previous is None:
+            raise
+        logger.warning('Keeping the previous Yummly feed for the %s snapshot', daypart.name, exc_info=True)
+        data = previous[0]['data']
+
+    local = RecipeSerializer(top_local_recipes(daypart, get_snapshot_setting('LOCAL_LIMIT')), many=True).data
+    content = {'daypart': daypart.name, 'data': data, 'local': local}
+    encoded = json.dumps(content, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    snapshot = {
+        **content,
+        # Only changes with the content, so clients revalidate cheaply.
+        'version': hashlib.sha1(encoded).hexdigest()[:16],
+        'built_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    snapshot_store.save(daypart, snapshot)
+    return snapshot
+
+
+def build_all_snapshots(dayparts=DAYPARTS, max_age=None):
+    """
+    Rebuild the snapshots of ``dayparts``, skipping those younger than
+    ``max_age`` seconds and returning the names of those built. Only one
+    process builds at a time; others return an empty list.
+    """
+    store_dir = snapshot_store.directory
+    store_dir.mkdir(parents=True, exist_ok=True)
+    with _try_lock(store_dir / '.lock') as locked:
+        if not locked:
+            return []
+        built = []
+        for daypart in dayparts:
+            age = snapshot_store.age(daypart)
+            if max_age is not None and age is not None and age < max_age:
+                continue
+            try:
+                build_snapshot(daypart)
+            except YummlyError:
+                logger.warning('Could not build the %s feed snapshot', daypart.name, exc_info=True)
+                continue
+            built.append(daypart.name)
+        return built
+
+
+def load_or_build(daypart):
+    """
+    Return ``(snapshot, body)`` for ``daypart``, building it first if it
+    is missing. Only one process builds at a time; the others wait for it
+    up to ``BUILD_TIMEOUT`` seconds and get None if it is still missing.
+    Raises ``YummlyError`` when the build fails with no previous snapshot.
+    """
+    loaded = snapshot_store.load(daypart)
+    if loaded is not None:
+        return loaded
+    store_dir = snapshot_store.directory
+    store_dir.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + get_snapshot_setting('BUILD_TIMEOUT')
+    while True:
+        with _try_lock(store_dir / '.lock') as locked:
+            if locked:
+                # Whoever held the lock may have just built it.
+                if snapshot_store.load(daypart) is None:
+                    build_snapshot(daypart)
+                return snapshot_store.load(daypart)
+        loaded = snapshot_store.load(daypart)
+        if loaded is not None or time.monotonic() >= deadline:
+            return loaded
+        time.sleep(0.05)
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def refresh_if_stale(daypart):
+    """
+    Rebuild the snapshot of ``daypart`` in a background thread if it is
+    older than ``REFRESH_INTERVAL``, unless this process already is.
+    Returns whether a rebuild was started.
+    """
+    interval = get_snapshot_setting('REFRESH_INTERVAL')
+    age = snapshot_store.age(daypart)
+    if age is None or age < interval:
+        return False
+    with _refreshing_lock:
+        if daypart.name in _refreshing:
+            return False
+        _refreshing.add(daypart.name)
+
+    def refresh():
+        try:
+            build_all_snapshots([daypart], max_age=interval)
+        except Exception:
+            logger.exception('Feed snapshot refresh failed')
+        finally:
+            connection.close()
+            with _refreshing_lock:
+                _refreshing.discard(daypart.name)
+
+    threading.Thread(target=refresh, name='feed-snapshot-refresh', daemon=True).start()
+    return True
+
+
+class SnapshotScheduler:
+    """
+    Background thread refreshing every snapshot each ``REFRESH_INTERVAL``.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='feed-snapshots', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        interval = get_snapshot_setting('REFRESH_INTERVAL')
+        while not self._stop.is_set():
+            try:
+                # Workers wake at different times; whoever finds a snapshot
+                # older than the interval rebuilds it.
+                build_all_snapshots(max_age=interval * 0.9)
+            except Exception:
+                logger.exception('Feed snapshot refresh failed')
+            finally:
+                connection.close()
+            self._stop.wait(interval)
+
+
+snapshot_scheduler = SnapshotScheduler()
@@ -7,6 +7,7 @@ from users.tests.factories import UserFactory
 class RecipeCategoryFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = RecipeCategory
+        django_get_or_create = ('name',)
 
     name = factory.Faker('word')
 
@@ -21,8 +22,8 @@ class RecipeFactory(factory.django.DjangoModelFactory):
     title = factory.Faker('sentence')
     desc = factory.Faker('sentence')
     cook_time = factory.Faker('date_time')
-    ingredients = factory.Faker('text')
-    procedure = factory.Faker('text')
+    ingredients = factory.Faker('words', nb=5)
+    procedure = factory.Faker('sentences', nb=3)
 
 
 class RecipeLikeFactory(factory.django.DjangoModelFactory):
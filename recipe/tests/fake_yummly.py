@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+FIXTURES = Path(__file__).parent / 'fixtures' / 'yummly'
+
+
+def fixture(name):
+    """
+    A recorded Yummly response body from ``fixtures/yummly``.
+    """
+    return json.loads((FIXTURES / name).read_text())
+
+
+class FakeYummlyServer:
+    """
+    Local HTTP server standing in for the Yummly API in tests.
+
+    ``routes`` maps a path such as ``/feeds/list`` to a list of
+    ``(status, body, delay)`` responses served in order; the last one is
+    repeated once the list is exhausted.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                server.requests.append((url.path, dict(parse_qsl(url.query)), dict(self.headers)))
+                responses = server.routes.get(url.path) or [(404, {}, 0)]
+                status, body, delay = responses.pop(0) if len(responses) > 1 else responses[0]
+                if delay:
+                    time.sleep(delay)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up waiting, as timeout tests expect.
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}'
+
+    def add(self, path, body, status=200, delay=0):
+        self.routes.setdefault(path, []).append((status, body, delay))
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05},
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from unittest import mock
+
+import httpx
+from django.core.cache import caches
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from recipe.yummly.async_client import AsyncYummlyClient
+from recipe.yummly.exceptions import YummlyError
+from .fake_yummly import FakeYummlyServer
+
+
+def feed(name):
+    return {'feed': [{'display': {'displayName': name}, 'content': {'details': {'name': name}}}]}
+
+
+class AsyncYummlyViewTest(SimpleTestCase):
+    def setUp(self):
+        caches['yummly'].clear()
+        self.server = FakeYummlyServer().start()
+        self.addCleanup(self.server.stop)
+        self.yummly = AsyncYummlyClient(base_url=self.server.url, backoff=0, max_retries=0)
+        patcher = mock.patch('recipe.async_views.async_yummly_client', self.yummly)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_search(self):
+        self.server.add('/feeds/search', feed('Pancakes'))
+        response = await self.async_client.get(reverse('recipe:yummly_search_async'), {'query': 'pancakes'})
+        await self.yummly.aclose()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][0]['title'], 'Pancakes')
+        self.assertEqual(self.server.requests[0][1]['q'], 'pancakes')
+
+    async def test_upstream_error_status_is_forwarded(self):
+        self.server.add('/feeds/list', {}, status=404)
+        response = await self.async_client.get(reverse('recipe:category_feed_async'), {'tag': 'x'})
+        await self.yummly.aclose()
+        self.assertEqual(response.status_code, 404)
+
+    async def test_batch_fetches_concurrently(self):
+        self.server.add('/feeds/list', feed('Cake'), delay=0.3)
+        self.server.add('/feeds/search', {}, status=404)
+        tags = [f'tag-{i}' for i in range(5)]
+        started = time.monotonic()
+        response = await self.async_client.get(
+            reverse('recipe:yummly_batch'), {'tag': tags, 'query': 'soup'})
+        elapsed = time.monotonic() - started
+        await self.yummly.aclose()
+
+        data = response.json()
+        self.assertEqual(sorted(data['tags']), tags)
+        self.assertEqual(data['tags']['tag-0']['data'][0]['title'], 'Cake')
+        self.assertEqual(data['queries']['soup']['status_code'], 404)
+        self.assertLess(elapsed, 1.0)
+
+    def test_wsgi_requests_close_their_clients(self):
+        self.server.add('/feeds/search', feed('Pancakes'))
+        clients, async_client = [], httpx.AsyncClient
+
+        def client(**kwargs):
+            clients.append(async_client(**kwargs))
+            return clients[-1]
+
+        with mock.patch('recipe.yummly.async_client.httpx.AsyncClient', side_effect=client):
+            for query in ('pancakes', 'waffles'):
+                response = self.client.get(reverse('recipe:yummly_search_async'), {'query': query})
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(clients), 2)
+        self.assertTrue(all(client.is_closed for client in clients))
+
+    async def test_batch_requires_items(self):
+        response = await self.async_client.get(reverse('recipe:yummly_batch'))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_cancelled_trial_call_releases_the_breaker(self):
+        yummly = AsyncYummlyClient(base_url=self.server.url, backoff=0, max_retries=0,
+                                   failure_threshold=1, recovery_time=0)
+        self.server.add('/feeds/list', {}, status=503)
+        self.server.add('/feeds/list', feed('Cake'), delay=1)
+        self.server.add('/feeds/list', feed('Cake'))
+        with self.assertRaises(YummlyError):
+            await yummly.get_json('feeds/list')
+        self.assertTrue(yummly.breaker.is_open)
+
+        trial = asyncio.ensure_future(yummly.get_json('feeds/list'))
+        await asyncio.sleep(0.1)
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+        data = await yummly.get_json('feeds/list')
+        await yummly.aclose()
+        self.assertEqual(data['feed'][0]['content']['details']['name'], 'Cake')
+        self.assertFalse(yummly.breaker.is_open)
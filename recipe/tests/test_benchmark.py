@@ -0,0 +1,61 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from followers.models import Follower
+from recipe.management.commands.benchmark_api import ROUTES, percentile, regressions, route_names
+from recipe.models import Recipe, RecipeLike
+from recipe.seed import seed_dataset
+
+BASELINE = {'recipe:feed': {'status': 200, 'queries': 2, 'p50_ms': 4.0, 'p95_ms': 20.0, 'bytes': 1000}}
+
+
+class SeedDatasetTest(TestCase):
+    def test_seeds_consistent_data(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(RECIPE_SEARCH_INDEX={'PATH': f'{directory}/index.sqlite3'}):
+            dataset = seed_dataset(users=20, recipes=60, likes=200, follows=60, seed=1)
+
+        self.assertEqual(get_user_model().objects.count(), 20)
+        self.assertEqual(Recipe.objects.count(), 60)
+        self.assertEqual(RecipeLike.objects.count(), dataset['likes'])
+        self.assertEqual(Follower.objects.count(), dataset['follows'])
+        self.assertFalse(Follower.objects.filter(from_user=F('to_user')).exists())
+        recipe = Recipe.objects.get(pk=dataset['recipe_ids'][0])
+        self.assertIsInstance(recipe.ingredients, list)
+        self.assertTrue(recipe.normalized_ingredients.exists())
+        self.assertEqual(recipe.like_count, RecipeLike.objects.filter(recipe=recipe).count())
+
+
+class BenchmarkRoutesTest(SimpleTestCase):
+    def test_every_route_is_benchmarked(self):
+        self.assertEqual(route_names(), {route.name for route in ROUTES})
+
+
+class RegressionsTest(SimpleTestCase):
+    def check(self, **changes):
+        return regressions({'recipe:feed': {**BASELINE['recipe:feed'], **changes}}, BASELINE,
+                           latency_tolerance=0.5, bytes_tolerance=0.1, latency_floor=5)
+
+    def test_within_tolerance(self):
+        self.assertEqual(self.check(p95_ms=29.0, bytes=1099, queries=1), [])
+
+    def test_worse_results_are_reported(self):
+        self.assertEqual(self.check(queries=3), ['recipe:feed: queries 2 -> 3'])
+        self.assertEqual(self.check(bytes=1200), ['recipe:feed: bytes 1000 -> 1200'])
+        self.assertEqual(self.check(p95_ms=31.0), ['recipe:feed: p95 20.00 ms -> 31.00 ms'])
+        self.assertEqual(self.check(status=500), ['recipe:feed: status 200 -> 500'])
+
+    def test_small_latency_changes_are_noise(self):
+        baseline = {'recipe:feed': {**BASELINE['recipe:feed'], 'p95_ms': 2.0}}
+        result = {'recipe:feed': {**baseline['recipe:feed'], 'p95_ms': 6.5}}
+        self.assertEqual(regressions(result, baseline, 0.5, 0.1, 5), [])
+
+    def test_new_routes_are_not_regressions(self):
+        self.assertEqual(regressions({'recipe:new': BASELINE['recipe:feed']}, BASELINE, 0.5, 0.1, 5), [])
+
+    def test_percentile_is_nearest_rank(self):
+        self.assertEqual(percentile(list(range(1, 21)), 0.95), 19)
+        self.assertEqual(percentile([3.0], 0.95), 3.0)
@@ -0,0 +1,62 @@
+import statistics
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from followers.models import Follower
+from recipe.models import Recipe
+from .factories import RecipeFactory, RecipeLikeFactory
+
+
+class ReconcileRecipeCountersCommandTest(TestCase):
+    def setUp(self):
+        self.recipe = RecipeFactory()
+        self.other = RecipeFactory()
+        RecipeLikeFactory(recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(like_count=7, comment_count=2)
+
+    def test_dry_run_reports_without_fixing(self):
+        out = StringIO()
+        call_command('reconcile_recipe_counters', '--dry-run', stdout=out)
+        self.assertIn('found 1', out.getvalue())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 7)
+
+    def test_fixes_drifted_counters_in_batches(self):
+        out = StringIO()
+        call_command('reconcile_recipe_counters', '--batch-size', '1', stdout=out)
+        self.assertIn('Checked 2 recipes, fixed 1', out.getvalue())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 1)
+        self.assertEqual(self.recipe.comment_count, 0)
+
+
+class SeedLoadDataCommandTest(TestCase):
+    def seed(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(RECIPE_SEARCH_INDEX={'PATH': f'{directory}/index.sqlite3'}):
+            call_command('seed_load_data', '--users', '30', '--recipes', '200', '--likes', '1000',
+                         '--follows', '120', '--seed', '7', stdout=StringIO())
+        return list(Recipe.objects.order_by('pk').values_list('title', 'ingredients', 'like_count'))
+
+    def test_same_seed_gives_same_data(self):
+        first = self.seed()
+        Recipe.objects.all().delete()
+        get_user_model().objects.all().delete()
+        self.assertEqual(self.seed(), first)
+
+    def test_seeds_again_after_deletions(self):
+        self.seed()
+        # --follows is a total; only the most followed users cap out.
+        self.assertTrue(100 <= Follower.objects.count() <= 120)
+        get_user_model().objects.order_by('pk').first().delete()
+        self.seed()
+        self.assertEqual(get_user_model().objects.count(), 59)
+
+    def test_likes_are_skewed(self):
+        counts = [like_count for _, _, like_count in self.seed()]
+        self.assertGreater(max(counts), 5 * statistics.median(counts))
+        self.assertLessEqual(max(counts), 30)
@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from followers.models import Follower
+from recipe.feed import get_feed_keys, update_celebrities
+from recipe.models import FeedCelebrity, FeedEntry
+from .factories import RecipeCategoryFactory, RecipeFactory
+from users.tests.factories import UserFactory
+
+
+class FeedAPIViewTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('recipe:feed')
+        self.user = UserFactory()
+        self.author = UserFactory()
+        self.old_recipe = RecipeFactory(author=self.author)
+        self.client.force_authenticate(self.user)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        Follower.objects.follow_user(self.user, self.author)
+        self.assertTrue(FeedEntry.objects.filter(user=self.user, recipe=self.old_recipe).exists())
+        Follower.objects.remove_follow(self.user, self.author)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_created_recipe_is_fanned_out(self):
+        Follower.objects.follow_user(self.user, self.author)
+        self.client.force_authenticate(self.author)
+        response = self.client.post(reverse('recipe:recipe-create'), {
+            'category_name': RecipeCategoryFactory().name,
+            'title': 'Soup',
+            'desc': 'Warm soup',
+            'cook_time': '00:30:00',
+            'ingredients': ['water'],
+            'procedure': ['boil'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 2)
+
+    def test_feed_pages_newest_first(self):
+        Follower.objects.follow_user(self.user, self.author)
+        newer = RecipeFactory(author=self.author)
+        FeedEntry.objects.create(user=self.user, recipe=newer, created_at=newer.created_at)
+
+        response = self.client.get(self.url, {'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in response.data['results']], [newer.pk])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([r['id'] for r in response.data['results']], [self.old_recipe.pk])
+
+    def test_sparse_fieldset(self):
+        Follower.objects.follow_user(self.user, self.author)
+        response = self.client.get(self.url, {'fields': 'id,username'})
+        self.assertEqual(response.data['results'], [{'id': self.old_recipe.pk, 'username': self.author.username}])
+        response = self.client.get(self.url, {'fields': 'secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(FEED_FANOUT_FOLLOWER_THRESHOLD=0)
+    def test_celebrity_recipes_are_pulled_at_read_time(self):
+        Follower.objects.create(from_user=self.user, to_user=self.author)
+        self.assertEqual(update_celebrities(), 1)
+        self.assertFalse(FeedEntry.objects.exists())
+        response = self.client.get(self.url)
+        self.assertEqual([r['id'] for r in response.data['results']], [self.old_recipe.pk])
+
+    @override_settings(FEED_FANOUT_FOLLOWER_THRESHOLD=1)
+    def test_recipes_posted_as_celebrity_are_fanned_out_when_dropping_back(self):
+        Follower.objects.follow_user(self.user, self.author)
+        other = UserFactory()
+        Follower.objects.follow_user(other, self.author)
+        self.assertTrue(FeedCelebrity.objects.filter(author=self.author).exists())
+        self.client.force_authenticate(self.author)
+        response = self.client.post(reverse('recipe:recipe-create'), {
+            'category_name': RecipeCategoryFactory().name,
+            'title': 'Soup',
+            'desc': 'Warm soup',
+            'cook_time': '00:30:00',
+            'ingredients': ['water'],
+            'procedure': ['boil'],
+        }, format='json')
+        posted = response.data['data']['id']
+        self.assertFalse(FeedEntry.objects.filter(recipe=posted).exists())
+
+        Follower.objects.remove_follow(other, self.author)
+        self.assertFalse(FeedCelebrity.objects.exists())
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual([r['id'] for r in response.data['results']], [posted, self.old_recipe.pk])
+        self.assertTrue(FeedEntry.objects.filter(user=self.user, recipe=posted).exists())
+
+    @override_settings(FEED_FANOUT_FOLLOWER_THRESHOLD=1)
+    def test_feed_keys_merge_fanned_out_and_pulled_recipes(self):
+        Follower.objects.follow_user(self.user, self.author)
+        celebrity = UserFactory()
+        Follower.objects.create(from_user=UserFactory(), to_user=celebrity)
+        Follower.objects.create(from_user=self.user, to_user=celebrity)
+        pulled = RecipeFactory(author=celebrity)
+        update_celebrities()
+
+        keys = get_feed_keys(self.user, 10)
+        self.assertEqual(keys, [(pulled.created_at, pulled.pk), (self.old_recipe.created_at, self.old_recipe.pk)])
+        self.assertEqual(get_feed_keys(self.user, 10, keys[0]), keys[1:])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,87 @@
+import datetime
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from recipe.models import Recipe
+from recipe.yummly.client import YummlyClient
+from .fake_yummly import FakeYummlyServer, fixture
+
+BREAKFAST_TAG = 'list.recipe.search_based:fq:attribute_s_mv:course^course-Breakfast and Brunch'
+
+
+class ImportYummlyCommandTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = Path(directory.name) / 'checkpoint.json'
+
+        self.server = FakeYummlyServer().start()
+        client = YummlyClient(base_url=self.server.url, backoff=0, max_retries=0)
+        patcher = mock.patch('recipe.yummly.importer.yummly_client', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(client.close)
+        self.addCleanup(self.server.stop)
+
+    def serve(self, *names, status=200):
+        for name in names:
+            path = '/categories/list' if name.startswith('categories') else '/feeds/list'
+            self.server.add(path, fixture(name), status=status)
+
+    def call(self, *args):
+        call_command('import_yummly', '--page-size', '3', '--checkpoint', str(self.checkpoint),
+                     *args, stdout=StringIO())
+
+    def test_imports_every_category(self):
+        self.serve('categories_list.json', 'feeds_list_breakfast_0.json',
+                   'feeds_list_breakfast_3.json', 'feeds_list_dinner_0.json')
+        self.call()
+
+        starts = [params['start'] for path, params, _ in self.server.requests if path == '/feeds/list']
+        self.assertEqual(starts, ['0', '3', '0'])
+        recipes = {r.yummly_id: r for r in Recipe.objects.select_related('category', 'author')}
+        self.assertEqual(len(recipes), 4)
+        pancakes = recipes['yummly:5c4f6a21-pancakes']
+        # The later page's copy wins.
+        self.assertEqual(pancakes.title, 'Fluffy Buttermilk Pancakes')
+        self.assertEqual(pancakes.category.name, 'Breakfast and Brunch')
+        self.assertEqual(pancakes.author.email, 'yummly-import@localhost')
+        omelette = recipes['yummly:8d12e0f3-omelette']
+        self.assertEqual(omelette.category.name, 'Breakfast')
+        self.assertEqual(omelette.desc, 'Cheese Omelette')
+        self.assertEqual(recipes['yummly:1a2b3c4d-granola'].cook_time, datetime.time(1, 5))
+        self.assertEqual(set(omelette.normalized_ingredients.values_list('name', flat=True)),
+                         {'egg', 'cheddar cheese', 'salt', 'pepper'})
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_reimport_updates_in_place(self):
+        self.serve('feeds_list_dinner_0.json')
+        self.call('--tag', BREAKFAST_TAG)
+        lasagna = Recipe.objects.get()
+        Recipe.objects.filter(pk=lasagna.pk).update(title='Old title')
+        self.call('--tag', BREAKFAST_TAG)
+        self.assertEqual(Recipe.objects.get().pk, lasagna.pk)
+        self.assertEqual(Recipe.objects.get().title, 'Classic Lasagna')
+
+    def test_resumes_from_checkpoint(self):
+        self.serve('feeds_list_breakfast_0.json')
+        self.serve('feeds_list_breakfast_0.json', status=503)
+        with self.assertRaises(CommandError):
+            self.call('--tag', BREAKFAST_TAG)
+        self.assertEqual(json.loads(self.checkpoint.read_text())['tags'][BREAKFAST_TAG],
+                         {'start': 3, 'done': False})
+        self.assertEqual(Recipe.objects.count(), 2)
+
+        self.server.routes.clear()
+        self.serve('feeds_list_breakfast_3.json')
+        self.call('--tag', BREAKFAST_TAG)
+        self.assertEqual(self.server.requests[-1][1]['start'], '3')
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.assertFalse(self.checkpoint.exists())
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
+from recipe.models import Recipe
 from .factories import RecipeCategoryFactory, RecipeFactory, RecipeLikeFactory
 from users.tests.factories import UserFactory
 
@@ -37,6 +38,15 @@ class RecipeModelTest(TestCase):
         self.assertEqual(recipe.get_total_number_of_likes(),
                          total_number_of_likes)
 
+    def test_save_does_not_overwrite_counters(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        RecipeLikeFactory(recipe=self.recipe)
+        stale.title = 'Renamed'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.title, 'Renamed')
+        self.assertEqual(stale.like_count, 1)
+
 
 class RecipeLikeModelTest(TestCase):
     @classmethod
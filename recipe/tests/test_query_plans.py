@@ -0,0 +1,79 @@
+import unittest
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from followers.models import Follower
+from recipe.models import Recipe, RecipeCategory, RecipeComment
+from .factories import RecipeFactory
+from users.tests.factories import UserFactory
+
+
+class QueryPlanTest(TestCase):
+    """
+    The hot lookups are answered from an index, in the requested order.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        RecipeFactory.create_batch(3, author=cls.user)
+
+    def assertUsesIndex(self, queryset, index):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Tiny test tables are cheaper to scan; ask for the index plan.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+            self.assertIn(index, plan)
+            self.assertNotIn('Sort', plan)
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            self.assertRegex(plan, rf'SEARCH \w+ USING (COVERING )?INDEX {index}\b')
+            self.assertNotIn('TEMP B-TREE', plan)
+        else:
+            raise unittest.SkipTest(f'No plan assertions for {connection.vendor}')
+
+    def test_recipes_by_author_newest_first(self):
+        # MyRecipeView and the feed's read-time pull.
+        self.assertUsesIndex(
+            Recipe.objects.filter(author=self.user).order_by('-created_at', '-id'), 'recipe_author_created_idx')
+
+    def test_category_by_name(self):
+        index = 'recipe_recipecategory_name_key' if connection.vendor == 'postgresql' else 'sqlite_autoindex_recipe_recipecategory_1'
+        self.assertUsesIndex(RecipeCategory.objects.filter(name='Dinner'), index)
+
+    def test_comments_of_recipe_oldest_first(self):
+        self.assertUsesIndex(
+            RecipeComment.objects.filter(recipe_id=1).order_by('created', 'id'), 'recipe_comment_created_idx')
+
+    def test_followers_of_user(self):
+        self.assertUsesIndex(Follower.objects.filter(to_user=self.user), 'follower_to_user_idx')
+
+
+class DedupeCategoriesMigrationTest(TransactionTestCase):
+    before = [('recipe', '0012_recipe_yummly_id')]
+    after = [('recipe', '0014_recipe_indexes')]
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicates_are_merged_into_the_oldest(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        old_apps = executor.loader.project_state(self.before).apps
+        Category = old_apps.get_model('recipe', 'RecipeCategory')
+        OldRecipe = old_apps.get_model('recipe', 'Recipe')
+        author = old_apps.get_model('users', 'CustomUser').objects.create(email='cook@example.com', username='cook')
+        keep, duplicate, other = (Category.objects.create(name=name) for name in ('Dinner', 'Dinner', 'Lunch'))
+        recipe = OldRecipe.objects.create(author_id=author.pk, category=duplicate, title='Stew', desc='',
+                                          cook_time='01:00')
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        new_apps = executor.loader.project_state(self.after).apps
+        Category = new_apps.get_model('recipe', 'RecipeCategory')
+        self.assertEqual(sorted(Category.objects.filter(name__in=['Dinner', 'Lunch']).values_list('pk', 'name')),
+                         [(keep.pk, 'Dinner'), (other.pk, 'Lunch')])
+        self.assertEqual(new_apps.get_model('recipe', 'Recipe').objects.get(pk=recipe.pk).category_id, keep.pk)
@@ -0,0 +1,248 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from scipy import sparse
+
+from recipe.ingredients import ingredient_names, normalize_ingredients
+from recipe.models import Ingredient, RecommenderModel
+from recipe.recommender.by_ingredients import IngredientIndex, ingredient_index
+from recipe.recommender.collaborative import item_neighbors, latest_model
+from recipe.recommender.similar import SimilarIndex, similar_index
+from users.tests.factories import UserFactory
+from .factories import RecipeFactory, RecipeLikeFactory
+
+
+class IngredientNormalizationTest(TestCase):
+    def test_strips_quantities_units_and_preparation(self):
+        self.assertEqual(ingredient_names('2 cups finely chopped onions'), ['onion'])
+        self.assertEqual(ingredient_names('1 1/2 tbsp extra-virgin olive oil'), ['olive oil'])
+        self.assertEqual(ingredient_names('½ cup (1 stick) butter, softened'), ['butter'])
+        self.assertEqual(ingredient_names('1 (14.5 oz) can diced tomatoes'), ['tomato'])
+        self.assertEqual(ingredient_names({'name': 'Fresh Basil Leaves'}), ['basil leaf'])
+
+    def test_splits_and_folds(self):
+        self.assertEqual(ingredient_names('Salt and pepper, to taste'), ['salt', 'pepper'])
+        self.assertEqual(ingredient_names('butter or margarine'), ['butter'])
+        self.assertEqual(ingredient_names('4 scallions'), ['green onion'])
+
+    def test_normalize_ingredients_deduplicates(self):
+        self.assertEqual(normalize_ingredients(['1 onion', '2 onions', '', None, 5]), ['onion'])
+        self.assertEqual(normalize_ingredients(None), [])
+
+
+class IngredientIndexTest(TestCase):
+    def setUp(self):
+        names = {1: 'egg', 2: 'flour', 3: 'milk', 4: 'salt', 5: 'tomato'}
+        links = [
+            (10, 1), (10, 2), (10, 3), (10, 4),  # pancakes
+            (20, 1), (20, 4),                    # boiled egg
+            (30, 5), (30, 4),                    # tomato salad
+        ]
+        self.index = IngredientIndex.from_pairs([r for r, _ in links], [i for _, i in links], names)
+
+    def test_ranks_by_coverage(self):
+        results = self.index.recommend(['egg', 'flour'], staples=['salt'])
+        self.assertEqual([(pk, coverage) for pk, coverage, _ in results], [(20, 1.0), (10, 0.75)])
+        self.assertEqual(results[1][2], ['milk'])
+
+    def test_staples_alone_do_not_match(self):
+        self.assertEqual(self.index.recommend(['salt'], staples=['salt'])[0][0], 20)
+        self.assertEqual(self.index.recommend(['garlic'], staples=['salt']), [])
+
+    def test_limit_and_max_missing(self):
+        self.assertEqual(len(self.index.recommend(['egg'], limit=1)), 1)
+        self.assertEqual([pk for pk, _, _ in self.index.recommend(['egg'], max_missing=1)], [20])
+
+
+@override_settings(RECIPE_RECOMMENDER={'BACKGROUND_REBUILD': False, 'REBUILD_INTERVAL': 0,
+                                       'PANTRY_STAPLES': ['salt']})
+class RecipeByIngredientsAPIViewTest(APITestCase):
+    def setUp(self):
+        ingredient_index.reset()
+        self.addCleanup(ingredient_index.reset)
+        self.url = reverse('recipe:recipe-recommend-by-ingredients')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.omelette = RecipeFactory(ingredients=['3 eggs', 'Salt to taste', '1/4 cup milk'])
+            self.pancakes = RecipeFactory(ingredients=['2 eggs', '1 cup flour', '1 cup milk', '1 tbsp sugar'])
+            self.salad = RecipeFactory(ingredients=['2 tomatoes', 'salt'])
+
+    def test_ranks_recipes_by_coverage(self):
+        response = self.client.get(self.url, {'ingredients': 'eggs, milk'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['ingredients'], ['egg', 'milk'])
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [self.omelette.pk, self.pancakes.pk])
+        self.assertEqual(results[0]['coverage'], 1.0)
+        self.assertEqual(results[1]['missing_ingredients'], ['flour', 'sugar'])
+
+    def test_index_follows_recipe_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salad.ingredients = ['2 eggs', 'salt']
+            self.salad.save()
+            self.pancakes.delete()
+        response = self.client.get(self.url, {'ingredients': ['eggs']})
+        self.assertEqual({r['id'] for r in response.data['results']}, {self.omelette.pk, self.salad.pk})
+        self.assertFalse(Ingredient.objects.get(name='tomato').recipes.exists())
+
+    def test_version_is_shared_through_the_database(self):
+        self.client.get(self.url, {'ingredients': 'eggs'})
+        # Written by another worker, with a cache of its own.
+        with mock.patch('recipe.recommender.base.cache', LocMemCache('other-worker', {})):
+            with self.captureOnCommitCallbacks(execute=True):
+                stew = RecipeFactory(ingredients=['2 eggs', 'beef'])
+        response = self.client.get(self.url, {'ingredients': 'beef'})
+        self.assertEqual([r['id'] for r in response.data['results']], [stew.pk])
+
+    def test_ingredients_are_required(self):
+        response = self.client.get(self.url, {'ingredients': ' , '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ItemNeighborsTest(TestCase):
+    def test_keeps_most_similar_items_in_batches(self):
+        # Items 0 and 1 share two users, item 2 shares one user with item 1.
+        matrix = sparse.csr_matrix(np.array([
+            [1, 1, 0],
+            [1, 1, 1],
+            [0, 0, 1],
+        ], dtype=np.float32))
+        blocks = list(item_neighbors(matrix, neighbors=2, batch_size=2))
+        self.assertEqual([start for start, _, _ in blocks], [0, 2])
+        ids = np.concatenate([block for _, block, _ in blocks])
+        self.assertEqual(ids.tolist(), [[1, 2], [0, 2], [1, 0]])
+        self.assertNotIn(0, ids[0])
+
+
+class RecommendedRecipesAPIViewTest(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model_dir = Path(directory.name)
+        settings_override = override_settings(RECIPE_RECOMMENDER={
+            'MODEL_DIR': self.model_dir, 'MODEL_CHECK_INTERVAL': 0})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        latest_model.reset()
+        self.addCleanup(latest_model.reset)
+
+        self.url = reverse('recipe:recipe-recommended')
+        self.a, self.b, self.c, self.d = RecipeFactory.create_batch(4)
+        for recipes in ([self.a, self.b], [self.a, self.b], [self.c, self.d], [self.c]):
+            user = UserFactory()
+            for recipe in recipes:
+                RecipeLikeFactory(user=user, recipe=recipe)
+        self.user = UserFactory()
+        RecipeLikeFactory(user=self.user, recipe=self.a)
+        self.client.force_authenticate(self.user)
+
+    def test_falls_back_to_most_liked_without_a_model(self):
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in response.data['results']], [self.c.pk, self.b.pk])
+
+    def test_serves_trained_model(self):
+        out = StringIO()
+        call_command('train_recommender', '--batch-size', '2', stdout=out)
+        self.assertIn('Trained recommender model', out.getvalue())
+
+        response = self.client.get(self.url, {'limit': 3})
+        ids = [r['id'] for r in response.data['results']]
+        self.assertEqual(ids[0], self.b.pk)
+        self.assertNotIn(self.a.pk, ids)
+        self.assertEqual(len(ids), 3)
+
+    def test_serves_model_trained_on_another_machine(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('train_recommender', '--output', directory, stdout=StringIO())
+        response = self.client.get(self.url, {'limit': 3})
+        self.assertEqual(response.data['results'][0]['id'], self.b.pk)
+        version = RecommenderModel.objects.get().version
+        self.assertTrue((self.model_dir / version / 'neighbors.npy').exists())
+
+    def test_keeps_only_recent_versions(self):
+        for _ in range(3):
+            call_command('train_recommender', '--keep', '2', stdout=StringIO())
+        versions = sorted(child.name for child in self.model_dir.iterdir() if child.is_dir())
+        self.assertEqual(versions, sorted(RecommenderModel.objects.values_list('version', flat=True)))
+        self.assertEqual(len(versions), 2)
+
+
+class SimilarIndexTest(TestCase):
+    documents = [
+        (1, 'Chocolate cake', 'Rich chocolate sponge', 'Dessert', [1, 2, 3]),
+        (2, 'Chocolate brownies', 'Fudgy chocolate squares', 'Dessert', [1, 2, 4]),
+        (3, 'Tomato soup', 'Roasted tomato and basil', 'Soup', [5, 6]),
+        (4, 'Gazpacho', 'Cold tomato soup', 'Soup', [5, 7]),
+        (5, 'Lemon tart', 'Sharp and sweet', 'Dessert', [8, 2]),
+    ]
+
+    def test_exact_and_ivf_agree_on_nearest(self):
+        exact = SimilarIndex.build(self.documents)
+        self.assertIsNone(exact.centroids_t)
+        with override_settings(RECIPE_RECOMMENDER={'SIMILAR': {'EXACT_BELOW': 0, 'LISTS': 2, 'PROBES': 2}}):
+            ivf = SimilarIndex.build(self.documents)
+            self.assertEqual(ivf.centroids_t.shape[1], 2)
+            for index in (exact, ivf):
+                _, vectors = index.vectorize([self.documents[0]])
+                self.assertEqual(index.similar(vectors[0], 1, exclude=[1])[0][0], 2)
+                _, vectors = index.vectorize([self.documents[3]])
+                self.assertEqual(index.similar(vectors[0], 1, exclude=[4])[0][0], 3)
+
+    def test_with_changes_overlays_and_hides(self):
+        index = SimilarIndex.build(self.documents)
+        _, vectors = index.vectorize([self.documents[0]])
+        updated = index.with_changes(
+            [(5, 'Chocolate tart', 'Rich chocolate', 'Dessert', [1, 2])], [2, 5])
+        ids = [pk for pk, _ in updated.similar(vectors[0], 10, exclude=[1])]
+        self.assertEqual(ids[0], 5)
+        self.assertNotIn(2, ids)
+        self.assertEqual(len(updated), 4)
+        # The original is untouched.
+        self.assertIn(2, [pk for pk, _ in index.similar(vectors[0], 10)])
+
+
+@override_settings(RECIPE_RECOMMENDER={'BACKGROUND_REBUILD': False, 'REBUILD_INTERVAL': 3600})
+class SimilarRecipesAPIViewTest(APITestCase):
+    def setUp(self):
+        similar_index.reset()
+        self.addCleanup(similar_index.reset)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cake = RecipeFactory(title='Chocolate cake', desc='Rich chocolate sponge',
+                                      ingredients=['cocoa', 'flour', 'eggs'])
+            self.brownies = RecipeFactory(title='Chocolate brownies', desc='Fudgy chocolate squares',
+                                          ingredients=['cocoa', 'flour', 'butter'])
+            self.soup = RecipeFactory(title='Tomato soup', desc='Roasted tomato',
+                                      ingredients=['tomatoes', 'basil'])
+
+    def test_returns_most_similar_first(self):
+        response = self.client.get(reverse('recipe:recipe-similar', args=[self.cake.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(results[0]['id'], self.brownies.pk)
+        self.assertNotIn(self.cake.pk, [r['id'] for r in results])
+        self.assertGreater(results[0]['similarity'], 0)
+
+    def test_index_is_patched_on_save_and_delete(self):
+        url = reverse('recipe:recipe-similar', args=[self.cake.pk])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brownies.delete()
+            self.soup.title = 'Chocolate soup'
+            self.soup.desc = 'Rich chocolate'
+            self.soup.save()
+        # REBUILD_INTERVAL rules out a rebuild; only the change log applies.
+        results = self.client.get(url).data['results']
+        self.assertEqual([r['id'] for r in results], [self.soup.pk])
+
+    def test_unknown_recipe(self):
+        response = self.client.get(reverse('recipe:recipe-similar', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,84 @@
+import datetime
+import decimal
+import io
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from recipe import renderers
+from recipe.renderers import FastJSONParser, FastJSONRenderer, JsonResponse, load_backend
+from recipe.response_cache import recipe_cache
+from .factories import RecipeFactory
+
+PAYLOAD = {
+    'results': [{
+        'id': 1,
+        'title': 'Crème brûlée   for two',
+        'ingredients': ['2 eggs', '½ cup sugar'],
+        'created_at': datetime.datetime(2024, 5, 1, 12, 30, 5, 120, tzinfo=datetime.timezone.utc),
+        'day': datetime.date(2024, 5, 1),
+        'cook_time': datetime.time(0, 45),
+        'price': decimal.Decimal('3.50'),
+        'uuid': uuid.UUID(int=1),
+        'label': gettext_lazy('Breakfast'),
+        'scores': {1: 0.5},
+        'empty': None,
+    }],
+}
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    def test_every_backend_matches_drf(self):
+        expected = JSONRenderer().render(PAYLOAD)
+        for name in renderers.BACKENDS:
+            backend, dumps, loads = load_backend([name])
+            if backend != name:
+                continue
+            with self.subTest(backend=name), mock.patch.object(renderers, 'dumps', dumps):
+                self.assertEqual(FastJSONRenderer().render(PAYLOAD), expected)
+                self.assertEqual(loads(expected), loads(dumps(PAYLOAD)))
+
+    def test_indented_output_for_browsable_api(self):
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_parser(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"title": "Crème"}'.encode())), {'title': 'Crème'})
+        latin = io.BytesIO('{"title": "Crème"}'.encode('latin-1'))
+        self.assertEqual(parser.parse(latin, parser_context={'encoding': 'latin-1'}), {'title': 'Crème'})
+        for body in (b'{"title": ', b'{"n": NaN}'):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+    def test_json_response(self):
+        response = JsonResponse({'data': ['é']})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, '{"data":["é"]}'.encode())
+        with self.assertRaises(TypeError):
+            JsonResponse([1])
+
+
+class FastJSONAPITest(APITestCase):
+    def test_api_renders_and_parses_json(self):
+        recipe_cache.cache.clear()
+        recipe = RecipeFactory(ingredients=['1 egg'])
+        response = self.client.get(reverse('recipe:recipe-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'][0]['ingredients'], ['1 egg'])
+        self.assertNotIn(b', ', response.content)
+
+        self.client.force_authenticate(recipe.author)
+        response = self.client.patch(reverse('recipe:recipe-detail', args=[recipe.pk]),
+                                     {'procedure': ['Boil.']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.procedure, ['Boil.'])
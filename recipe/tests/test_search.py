@@ -0,0 +1,95 @@
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipe.models import Recipe
+from recipe.search import build_match_query, flatten_text, get_search_index
+from .factories import RecipeFactory
+
+
+def temporary_index():
+    directory = tempfile.TemporaryDirectory()
+    return directory, override_settings(RECIPE_SEARCH_INDEX={'PATH': f'{directory.name}/index.sqlite3'})
+
+
+class SearchHelpersTest(TestCase):
+    def test_flatten_text(self):
+        self.assertEqual(flatten_text(['2 eggs', {'name': 'flour', 'qty': 1}]), '2 eggs flour 1')
+
+    def test_build_match_query(self):
+        self.assertEqual(build_match_query('Choc cake'), '"choc" "cake"')
+        self.assertEqual(build_match_query('Choc cake', prefix=True), '"choc" "cake"*')
+        self.assertEqual(build_match_query('"); DROP --'), '"drop"')
+        self.assertEqual(build_match_query('!!'), '')
+
+
+class RecipeSearchAPIViewTest(APITestCase):
+    def setUp(self):
+        directory, settings_override = temporary_index()
+        self.addCleanup(directory.cleanup)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = reverse('recipe:recipe-search')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cake = RecipeFactory(title='Chocolate cake', desc='Rich and dark',
+                                      ingredients=['cocoa', 'flour'], procedure=['bake'])
+            self.soup = RecipeFactory(title='Tomato soup', desc='With a hint of chocolate',
+                                      ingredients=['tomato'], procedure=['simmer'])
+
+    def test_ranks_title_matches_first(self):
+        response = self.client.get(self.url, {'q': 'chocolate'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in response.data['results']], [self.cake.pk, self.soup.pk])
+
+    def test_matches_ingredients_and_prefixes(self):
+        response = self.client.get(self.url, {'q': 'coc'})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.cake.pk])
+
+    def test_pages_share_one_ranking(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeFactory(title='Chocolatier tips', desc='', ingredients=[], procedure=[])
+        # Whole words fill the first page, so no page falls back to prefixes.
+        pages = [self.client.get(self.url, {'q': 'chocolate', 'limit': 2, 'offset': offset}).data['results']
+                 for offset in (0, 2)]
+        self.assertEqual([[r['id'] for r in page] for page in pages], [[self.cake.pk, self.soup.pk], []])
+
+    def test_index_follows_updates_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soup.title = 'Gazpacho'
+            self.soup.save()
+            self.cake.delete()
+        self.assertEqual(self.client.get(self.url, {'q': 'gazpacho'}).data['results'][0]['id'], self.soup.pk)
+        self.assertEqual(self.client.get(self.url, {'q': 'cake'}).data['results'], [])
+
+    def test_missing_index_is_rebuilt_on_first_search(self):
+        # As on a freshly started dyno.
+        directory, settings_override = temporary_index()
+        self.addCleanup(directory.cleanup)
+        with settings_override:
+            response = self.client.get(self.url, {'q': 'chocolate'})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.cake.pk, self.soup.pk])
+
+    def test_indexes_recipes_saved_by_other_processes(self):
+        self.client.get(self.url, {'q': 'soup'})
+        # No signal reaches this process.
+        Recipe.objects.filter(pk=self.soup.pk).update(title='Gazpacho', updated_at=timezone.now())
+        self.assertEqual(self.client.get(self.url, {'q': 'gazpacho'}).data['results'], [])
+        with override_settings(RECIPE_SEARCH_INDEX={**settings.RECIPE_SEARCH_INDEX, 'SYNC_INTERVAL': 0}):
+            response = self.client.get(self.url, {'q': 'gazpacho'})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.soup.pk])
+
+    def test_query_is_required(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_command(self):
+        get_search_index().clear()
+        call_command('rebuild_search_index', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(get_search_index().count(), 2)
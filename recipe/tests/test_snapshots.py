@@ -0,0 +1,199 @@
+import datetime
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipe.models import Recipe
+from recipe.snapshots import _try_lock, build_snapshot, daypart_for_hour, seconds_until_next_daypart, snapshot_store
+from recipe.yummly.client import YummlyClient
+from .factories import RecipeCategoryFactory, RecipeFactory
+from .fake_yummly import FakeYummlyServer
+
+FEED = {'feed': [{'content': {'details': {'name': 'Pancakes', 'images': [{'resizableImageUrl': 'x'}]}}}]}
+
+
+class DaypartTest(SimpleTestCase):
+    def test_hours_map_to_dayparts(self):
+        self.assertEqual([daypart_for_hour(h).name for h in (0, 11, 12, 15, 20, 23)],
+                         ['breakfast', 'breakfast', 'lunch', 'afternoon', 'dinner', 'breakfast'])
+
+    def test_seconds_until_next_daypart(self):
+        now = datetime.datetime(2024, 1, 1, 14, 30)
+        self.assertEqual(seconds_until_next_daypart(now), 30 * 60)
+        # 23:00 through 11:59 is one daypart.
+        self.assertEqual(seconds_until_next_daypart(now.replace(hour=21)), 90 * 60)
+        self.assertEqual(seconds_until_next_daypart(now.replace(hour=23)), 12 * 60 * 60 + 30 * 60)
+
+
+class SnapshotLockTest(SimpleTestCase):
+    def test_one_holder_at_a_time(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / '.lock'
+            with _try_lock(path) as first:
+                with _try_lock(path) as second:
+                    self.assertEqual((first, second), (True, False))
+            with _try_lock(path) as again:
+                self.assertTrue(again)
+
+
+class TimeBasedFeedTest(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(FEED_SNAPSHOTS={'PATH': directory.name, 'REFRESH_INTERVAL': 600})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.server = FakeYummlyServer().start()
+        client = YummlyClient(base_url=self.server.url, backoff=0, max_retries=0)
+        patcher = mock.patch('recipe.snapshots.yummly_client', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(client.close)
+        self.addCleanup(self.server.stop)
+
+        self.url = reverse('recipe:get_time_based_feed')
+        self.breakfast = RecipeFactory(category=RecipeCategoryFactory(name='Breakfast'))
+        self.popular = RecipeFactory()
+        Recipe.objects.filter(pk=self.popular.pk).update(like_count=10)
+
+    def freeze(self, hour):
+        now = datetime.datetime(2024, 1, 1, hour, 30, tzinfo=datetime.timezone.utc)
+        patcher = mock.patch('recipe.views.datetime')
+        patcher.start().datetime.now.side_effect = now.astimezone
+        self.addCleanup(patcher.stop)
+
+    def test_serves_snapshot_for_callers_timezone(self):
+        self.freeze(2)
+        self.server.add('/feeds/list', FEED)
+        call_command('build_feed_snapshots', stdout=StringIO())
+        self.assertEqual(len(self.server.requests), 4)
+
+        # 02:30 UTC is 11:30 in Tokyo and 21:30 the day before in New York.
+        response = self.client.get(self.url, {'tz': 'Asia/Tokyo'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.json()
+        self.assertEqual(body['daypart'], 'breakfast')
+        self.assertEqual(body['data'][0]['name'], 'Pancakes')
+        self.assertEqual([r['id'] for r in body['local']], [self.breakfast.pk, self.popular.pk])
+        self.assertEqual(response['ETag'], f'"{body["version"]}"')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+
+        response = self.client.get(self.url, {'tz': 'America/New_York'})
+        self.assertEqual(response.json()['daypart'], 'dinner')
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_async_view_serves_the_same_snapshot(self):
+        self.freeze(2)
+        self.server.add('/feeds/list', FEED)
+        call_command('build_feed_snapshots', stdout=StringIO())
+        url = reverse('recipe:get_time_based_feed_async')
+        for tz, daypart in (('Asia/Tokyo', 'breakfast'), ('America/New_York', 'dinner')):
+            response = self.client.get(url, {'tz': tz})
+            self.assertEqual(response.json()['daypart'], daypart)
+            self.assertEqual(response['ETag'], self.client.get(self.url, {'tz': tz})['ETag'])
+        self.assertEqual(self.client.get(url, {'tz': 'Mars/Olympus'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_not_modified(self):
+        self.freeze(12)
+        self.server.add('/feeds/list', FEED)
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_if_none_match_lists(self):
+        self.freeze(12)
+        self.server.add('/feeds/list', FEED)
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"other", {etag}')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"x{etag}"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_waits_for_a_snapshot_being_built_elsewhere(self):
+        self.freeze(12)
+        self.server.add('/feeds/list', FEED)
+        directory = snapshot_store.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        with override_settings(FEED_SNAPSHOTS={'PATH': directory, 'BUILD_TIMEOUT': 0.1}), \
+                _try_lock(directory / '.lock'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.server.requests, [])
+
+        daypart = daypart_for_hour(12)
+        snapshot = build_snapshot(daypart)
+        snapshot_store.path(daypart).unlink()
+
+        def build_elsewhere():
+            with _try_lock(directory / '.lock'):
+                time.sleep(0.2)
+                snapshot_store.save(daypart, snapshot)
+
+        builder = threading.Thread(target=build_elsewhere)
+        with mock.patch('recipe.snapshots.build_snapshot') as build:
+            builder.start()
+            time.sleep(0.05)
+            response = self.client.get(self.url)
+            builder.join()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        build.assert_not_called()
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_version_only_changes_with_content(self):
+        self.server.add('/feeds/list', FEED)
+        daypart = daypart_for_hour(12)
+        call_command('build_feed_snapshots', '--daypart', 'lunch', stdout=StringIO())
+        first = snapshot_store.load(daypart)[0]['version']
+        call_command('build_feed_snapshots', '--daypart', 'lunch', stdout=StringIO())
+        self.assertEqual(snapshot_store.load(daypart)[0]['version'], first)
+        Recipe.objects.filter(pk=self.breakfast.pk).update(like_count=20)
+        call_command('build_feed_snapshots', '--daypart', 'lunch', stdout=StringIO())
+        self.assertNotEqual(snapshot_store.load(daypart)[0]['version'], first)
+
+    def test_keeps_previous_feed_when_yummly_fails(self):
+        self.server.add('/feeds/list', FEED)
+        self.server.add('/feeds/list', {}, status=503)
+        daypart = daypart_for_hour(12)
+        call_command('build_feed_snapshots', '--daypart', 'lunch', stdout=StringIO())
+        call_command('build_feed_snapshots', '--daypart', 'lunch', stdout=StringIO())
+        self.assertEqual(snapshot_store.load(daypart)[0]['data'][0]['name'], 'Pancakes')
+
+    def test_stale_snapshot_is_rebuilt_in_background(self):
+        self.freeze(12)
+        self.server.add('/feeds/list', FEED)
+        daypart = daypart_for_hour(12)
+        call_command('build_feed_snapshots', '--daypart', 'lunch', stdout=StringIO())
+        version = self.client.get(self.url).json()['version']
+        self.assertEqual(len(self.server.requests), 1)
+
+        Recipe.objects.filter(pk=self.breakfast.pk).update(like_count=20)
+        stale = time.time() - 601
+        os.utime(snapshot_store.path(daypart), (stale, stale))
+        # Run the rebuild inline, on the test's connection.
+        with mock.patch('recipe.snapshots.threading.Thread') as thread, \
+                mock.patch('recipe.snapshots.connection'):
+            thread.return_value.start.side_effect = lambda: thread.call_args.kwargs['target']()
+            self.assertEqual(self.client.get(self.url).json()['version'], version)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertNotEqual(self.client.get(self.url).json()['version'], version)
+
+    def test_unknown_timezone(self):
+        for name in ('Mars/Olympus', 'America', 'x' * 300, '/etc/passwd'):
+            response = self.client.get(self.url, {'tz': name})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, name)
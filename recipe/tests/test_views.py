@@ -0,0 +1,303 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from recipe.models import Recipe, RecipeComment
+from recipe.response_cache import recipe_cache
+from recipe.serializers import RecipeListSerializer, RecipeSerializer
+from .factories import RecipeFactory, RecipeLikeFactory
+from users.tests.factories import UserFactory
+
+
+class RecipeListAPIViewTest(APITestCase):
+    def setUp(self):
+        recipe_cache.cache.clear()
+        self.url = reverse('recipe:recipe-list')
+        self.recipe = RecipeFactory()
+        RecipeLikeFactory(recipe=self.recipe)
+        RecipeLikeFactory(recipe=self.recipe)
+
+    def test_list_reports_totals(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['total_number_of_likes'], 2)
+        self.assertEqual(response.data['results'][0]['username'],
+                         self.recipe.author.username)
+
+    def test_query_count_does_not_grow_with_results(self):
+        # The ETag validator, then the page.
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeFactory.create_batch(5)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_cursor_pages_do_not_overlap(self):
+        recipes = RecipeFactory.create_batch(4)
+        response = self.client.get(self.url, {'limit': 3})
+        first = [r['id'] for r in response.data['results']]
+        with self.assertNumQueries(2):
+            response = self.client.get(response.data['next'])
+        second = [r['id'] for r in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(sorted(first + second),
+                         sorted([self.recipe.pk] + [r.pk for r in recipes]))
+
+    def test_forged_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'WyIyMDI0LTAxLTAxIiwgMV0'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_serializer_matches_recipe_serializer(self):
+        RecipeFactory(picture='', ingredients=['1 egg'], procedure=['Boil.'])
+        request = APIRequestFactory().get(self.url)
+        queryset = Recipe.objects.with_stats().order_by('pk')
+        expected = RecipeSerializer(queryset, many=True, context={'request': request}).data
+        serializer = RecipeListSerializer(request=request)
+        self.assertEqual(serializer.serialize(serializer.rows(queryset)), expected)
+
+    def test_sparse_fieldset(self):
+        response = self.client.get(self.url, {'fields': 'title, id'})
+        self.assertEqual(response.data['results'], [{'id': self.recipe.pk, 'title': self.recipe.title}])
+        response = self.client.get(self.url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_card_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'view': 'card', 'expand': 'cook_time'})
+        self.assertEqual(set(response.data['results'][0]),
+                         {'id', 'picture', 'title', 'username', 'cook_time', 'total_number_of_likes',
+                          'total_number_of_comments', 'total_number_of_bookmarks'})
+        self.assertNotIn('"ingredients"', queries[-1]['sql'])
+        for params in ({'view': 'tiny'}, {'view': 'card', 'expand': 'secret'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeAPIViewTest(APITestCase):
+    def setUp(self):
+        recipe_cache.cache.clear()
+        self.recipe = RecipeFactory(ingredients=['1 egg'])
+        self.url = reverse('recipe:recipe-detail', args=[self.recipe.pk])
+        self.client.force_authenticate(UserFactory())
+
+    def test_sparse_fieldset_defers_heavy_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'title,username'})
+        self.assertEqual(response.data, {'title': self.recipe.title, 'username': self.recipe.author.username})
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"procedure"', queries[-1]['sql'])
+
+        response = self.client.get(self.url, {'view': 'card', 'expand': 'ingredients'})
+        self.assertEqual(response.data['ingredients'], ['1 egg'])
+        self.assertNotIn('procedure', response.data)
+        self.assertIn('procedure', self.client.get(self.url).data)
+        self.assertEqual(self.client.get(self.url, {'fields': 'nope'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+class UserBookmarkAPIViewTest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.other = UserFactory()
+        self.recipe = RecipeFactory()
+        self.user.profile.bookmarks.add(self.recipe)
+        self.other.profile.bookmarks.add(self.recipe)
+        self.client.force_authenticate(self.user)
+
+    def test_bookmark_totals_count_every_profile(self):
+        url = reverse('users:user-bookmark', kwargs={'pk': self.user.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['total_number_of_bookmarks'], 2)
+        response = self.client.get(url, {'fields': 'id'})
+        self.assertEqual(response.data, [{'id': self.recipe.pk}])
+
+
+class RecipeCounterAPITest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.recipe = RecipeFactory()
+        self.client.force_authenticate(self.user)
+
+    def test_like_and_unlike_update_like_count(self):
+        url = reverse('recipe:recipe-like', kwargs={'pk': self.recipe.pk})
+        self.client.post(url)
+        self.client.post(url)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 1)
+        self.client.delete(url)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.like_count, 0)
+
+    def test_comment_updates_comment_count(self):
+        url = reverse('recipe:recipe-comment', kwargs={'pk': self.recipe.pk})
+        self.client.post(url, {'text': 'Tasty'}, format='json')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, 1)
+
+    def test_bookmark_and_unbookmark_update_bookmark_count(self):
+        url = reverse('users:user-bookmark', kwargs={'pk': self.user.pk})
+        self.client.post(url, {'id': self.recipe.pk}, format='json')
+        self.client.post(url, {'id': self.recipe.pk}, format='json')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.bookmark_count, 1)
+        self.client.delete(url, {'id': self.recipe.pk}, format='json')
+        self.client.delete(url, {'id': self.recipe.pk}, format='json')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.bookmark_count, 0)
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        recipe_cache.cache.clear()
+        self.user = UserFactory()
+        self.recipe = RecipeFactory()
+        self.client.force_authenticate(self.user)
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_recipe_detail(self):
+        url = reverse('recipe:recipe-detail', args=[self.recipe.pk])
+        updated_at = self.recipe.updated_at
+        self.assertRevalidates(url, lambda: RecipeLikeFactory(recipe=self.recipe))
+        # Likes bump the version, not updated_at, so If-Modified-Since alone is not trusted.
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.updated_at, updated_at)
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(self.client.get(url, {'view': 'card'})['ETag'], response['ETag'])
+
+    def rename_author(self):
+        self.recipe.author.username = 'renamed'
+        self.recipe.author.save()
+
+    def test_recipe_detail_follows_author_rename(self):
+        self.assertRevalidates(reverse('recipe:recipe-detail', args=[self.recipe.pk]), self.rename_author)
+
+    def test_recipe_list(self):
+        url = reverse('recipe:recipe-list')
+        self.assertRevalidates(url, lambda: self.recipe.delete())
+        self.assertRevalidates(url, lambda: RecipeFactory())
+        self.assertRevalidates(url, lambda: RecipeLikeFactory(recipe=Recipe.objects.first()))
+        self.recipe = Recipe.objects.first()
+        self.assertRevalidates(url, self.rename_author)
+        # Aggregate timestamps miss deletions, so If-Modified-Since alone is not trusted.
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_recipe_comments(self):
+        url = reverse('recipe:recipe-comments', args=[self.recipe.pk])
+        comment_url = reverse('recipe:recipe-comment', args=[self.recipe.pk])
+        self.assertRevalidates(url, lambda: self.client.post(comment_url, {'text': 'Tasty'}, format='json'))
+
+
+class RecipeCacheTest(APITestCase):
+    def setUp(self):
+        recipe_cache.cache.clear()
+        recipe_cache.reset_stats()
+        self.user = UserFactory()
+        self.recipe = RecipeFactory(category__name='Dinner')
+        self.other = RecipeFactory(category__name='Lunch')
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, params=None, queries=1):
+        # One query for the ETag validator; a miss loads the body as well.
+        with self.assertNumQueries(queries):
+            return self.client.get(url, params).data
+
+    def test_detail_is_served_from_cache_until_written(self):
+        url = reverse('recipe:recipe-detail', args=[self.recipe.pk])
+        self.get(url, queries=2)
+        self.assertEqual(self.get(url)['total_number_of_likes'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeLikeFactory(recipe=self.recipe)
+        self.assertEqual(self.get(url, queries=2)['total_number_of_likes'], 1)
+        self.assertEqual(self.get(url, {'fields': 'id'}, queries=2), {'id': self.recipe.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.bookmarks.add(self.recipe)
+        self.assertEqual(self.get(url, queries=2)['total_number_of_bookmarks'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.author.username = 'renamed'
+            self.recipe.author.save()
+        self.assertEqual(self.get(url, queries=2)['username'], 'renamed')
+
+    def test_list_invalidation_follows_filters(self):
+        url = reverse('recipe:recipe-list')
+        self.get(url, {'category__name': 'Dinner'}, queries=2)
+        self.get(url, {'category__name': 'Lunch'}, queries=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeComment.objects.create(user=self.user, recipe=self.other, text='Tasty')
+        self.get(url, {'category__name': 'Dinner'})
+        lunch = self.get(url, {'category__name': 'Lunch'}, queries=2)
+        self.assertEqual(lunch['results'][0]['total_number_of_comments'], 1)
+
+        # Moving a recipe retires the lists of both categories.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.category = self.recipe.category
+            self.other.save()
+        self.assertEqual(len(self.get(url, {'category__name': 'Dinner'}, queries=2)['results']), 2)
+        self.assertEqual(self.get(url, {'category__name': 'Lunch'}, queries=2)['results'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(len(self.get(url, {'category__name': 'Dinner'}, queries=2)['results']), 1)
+
+    def test_writes_of_other_workers_retire_entries(self):
+        # An update made elsewhere bumps no version in this process's cache.
+        detail = reverse('recipe:recipe-detail', args=[self.recipe.pk])
+        self.get(detail, queries=2)
+        self.get(reverse('recipe:recipe-list'), queries=2)
+
+        Recipe.objects.filter(pk=self.recipe.pk).update(title='Changed', updated_at=timezone.now())
+        self.assertEqual(self.get(detail, queries=2)['title'], 'Changed')
+        results = self.get(reverse('recipe:recipe-list'), queries=2)['results']
+        self.assertIn('Changed', [recipe['title'] for recipe in results])
+
+    def test_renames_in_other_workers_retire_entries(self):
+        detail = reverse('recipe:recipe-detail', args=[self.recipe.pk])
+        self.get(detail, queries=2)
+        self.get(reverse('recipe:recipe-list'), queries=2)
+
+        # The renaming worker bumps no version in this process's cache.
+        with mock.patch('recipe.signals.recipe_cache'):
+            self.recipe.author.username = 'renamed'
+            self.recipe.author.save()
+        self.assertEqual(self.get(detail, queries=2)['username'], 'renamed')
+        results = self.get(reverse('recipe:recipe-list'), queries=2)['results']
+        self.assertIn('renamed', [recipe['username'] for recipe in results])
+
+    def test_stats(self):
+        url = reverse('recipe:recipe-detail', args=[self.recipe.pk])
+        self.client.get(url)
+        self.client.get(url)
+        self.client.force_authenticate(UserFactory(is_staff=True))
+        response = self.client.get(reverse('recipe:recipe_cache_stats'))
+        self.assertEqual(response.data['hits'], 1)
+        self.assertEqual(response.data['misses'], 1)
+        self.assertEqual(response.data['hit_ratio'], 0.5)
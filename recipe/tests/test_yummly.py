@@ -0,0 +1,224 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from recipe.yummly.cache import YummlyCache, yummly_cache
+from recipe.yummly.client import CircuitOpenError, YummlyClient
+from recipe.yummly.exceptions import YummlyError
+from recipe.yummly.parsers import (FeedItem, category_feed_result, feeds_list_result, iter_json_array,
+                                   parse_duration, parse_feed, recipe_record, search_result)
+from .fake_yummly import FakeYummlyServer, fixture
+
+
+class YummlyCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['yummly'].clear()
+        self.cache = YummlyCache(alias='yummly', default_ttl=60, stale_ttl=60)
+
+    def test_key_ignores_param_order_and_whitespace(self):
+        self.assertEqual(self.cache.make_key('feeds/search', {'q': 'egg ', 'start': 0}),
+                         self.cache.make_key('feeds/search', {'start': '0', 'q': 'egg'}))
+        self.assertNotEqual(self.cache.make_key('feeds/search', {'q': 'egg'}),
+                            self.cache.make_key('feeds/list', {'q': 'egg'}))
+
+    def test_hit_after_miss(self):
+        fetch = mock.Mock(return_value={'feed': []})
+        self.cache.get_or_fetch('feeds/search', {'q': 'egg'}, fetch)
+        self.cache.get_or_fetch('feeds/search', {'q': 'egg'}, fetch)
+        self.assertEqual(fetch.call_count, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_errors_are_not_cached(self):
+        fetch = mock.Mock(side_effect=YummlyError('boom', 503))
+        for _ in range(2):
+            with self.assertRaises(YummlyError):
+                self.cache.get_or_fetch('feeds/search', {}, fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_stale_entry_is_served_while_revalidating(self):
+        self.cache.ttls = {'feeds/list': 0}
+        self.cache.get_or_fetch('feeds/list', {}, lambda: 'old')
+        refreshed = threading.Event()
+
+        def fetch():
+            refreshed.set()
+            return 'new'
+
+        self.assertEqual(self.cache.get_or_fetch('feeds/list', {}, fetch), 'old')
+        self.assertTrue(refreshed.wait(5))
+        for _ in range(50):
+            if self.cache.cache.get(self.cache.make_key('feeds/list'))[1] == 'new':
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.cache.stats()['stale_hits'], 1)
+        self.assertEqual(self.cache.cache.get(self.cache.make_key('feeds/list'))[1], 'new')
+
+    def test_concurrent_misses_share_one_upstream_call(self):
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.cache.get_or_fetch('feeds/search', {'q': 'egg'}, fetch)))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 20)
+
+
+class YummlyClientTest(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeYummlyServer().start()
+        self.client_ = YummlyClient(base_url=self.server.url, api_key='key',
+                                    read_timeout=0.2, backoff=0, max_retries=2,
+                                    failure_threshold=2, recovery_time=60)
+
+    def tearDown(self):
+        self.client_.close()
+        self.server.stop()
+
+    def test_returns_json_and_sends_rapidapi_headers(self):
+        self.server.add('/feeds/search', {'feed': []})
+        self.assertEqual(self.client_.get_json('feeds/search', {'q': 'egg'}), {'feed': []})
+        path, params, headers = self.server.requests[0]
+        self.assertEqual(params, {'q': 'egg'})
+        self.assertEqual(headers['X-RapidAPI-Key'], 'key')
+
+    def test_retries_transient_errors(self):
+        self.server.add('/feeds/list', {}, status=503)
+        self.server.add('/feeds/list', {'feed': [1]})
+        self.assertEqual(self.client_.get_json('feeds/list'), {'feed': [1]})
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.add('/feeds/list', {}, status=404)
+        with self.assertRaises(YummlyError) as cm:
+            self.client_.get_json('feeds/list')
+        self.assertEqual(cm.exception.status_code, 404)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_read_timeout(self):
+        self.server.add('/feeds/list', {}, delay=0.5)
+        self.client_.max_retries = 0
+        with self.assertRaises(YummlyError) as cm:
+            self.client_.get_json('feeds/list')
+        self.assertEqual(cm.exception.status_code, 504)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.server.add('/feeds/list', {}, status=500)
+        for _ in range(2):
+            with self.assertRaises(YummlyError):
+                self.client_.get_json('feeds/list')
+        calls = len(self.server.requests)
+        with self.assertRaises(CircuitOpenError):
+            self.client_.get_json('feeds/list')
+        self.assertEqual(len(self.server.requests), calls)
+
+    def test_circuit_closes_after_successful_trial(self):
+        self.client_.breaker.recovery_time = 0
+        self.server.add('/feeds/list', {}, status=500)
+        for _ in range(2):
+            with self.assertRaises(YummlyError):
+                self.client_.get_json('feeds/list')
+        self.assertTrue(self.client_.breaker.is_open)
+        self.server.routes['/feeds/list'] = [(200, {'feed': []}, 0)]
+        self.assertEqual(self.client_.get_json('feeds/list'), {'feed': []})
+        self.assertFalse(self.client_.breaker.is_open)
+
+
+    def test_unexpected_error_in_trial_call_releases_the_breaker(self):
+        self.client_.breaker.recovery_time = 0
+        self.server.add('/feeds/list', {}, status=500)
+        for _ in range(2):
+            with self.assertRaises(YummlyError):
+                self.client_.get_json('feeds/list')
+        with mock.patch.object(self.client_.session, 'get', side_effect=KeyError), \
+                self.assertRaises(KeyError):
+            self.client_.get_json('feeds/list')
+        self.server.routes['/feeds/list'] = [(200, {'feed': []}, 0)]
+        self.assertEqual(self.client_.get_json('feeds/list'), {'feed': []})
+        self.assertFalse(self.client_.breaker.is_open)
+
+
+class YummlyParserTest(SimpleTestCase):
+    def test_recipe_record(self):
+        recipes = parse_feed(fixture('feeds_list_breakfast_0.json'), recipe_record)
+        self.assertEqual([r['name'] for r in recipes], ['Fluffy Pancakes', 'Cheese Omelette'])
+        pancakes = recipes[0]
+        self.assertEqual(pancakes['id'], 'yummly:5c4f6a21-pancakes')
+        self.assertEqual(pancakes['ingredient_lines'], ['1 cup flour', '2 eggs', '1 cup milk'])
+        self.assertEqual(pancakes['tags']['course'], ['Breakfast and Brunch'])
+        self.assertEqual(pancakes['total_time_seconds'], 1500)
+        self.assertEqual(parse_duration('1 hr 5 min'), 3900)
+        self.assertIsNone(parse_duration(''))
+
+    def test_endpoint_records(self):
+        item = FeedItem(fixture('feeds_list_breakfast_0.json')['feed'][0])
+        self.assertEqual(search_result(item)['tags']['technique'],
+                         [{'display-name': 'Baking', 'tag-url': 'technique^technique-baking'}])
+        self.assertEqual(category_feed_result(item)['course'], ['Breakfast and Brunch'])
+        self.assertEqual(feeds_list_result(item)['image'], 'https://lh3.example.com/pancakes')
+        # Items without details or images do not break any builder.
+        empty = FeedItem({'content': {'details': {'images': []}}})
+        self.assertIsNone(search_result(empty)['image_url'])
+        self.assertEqual(feeds_list_result(empty)['ingredients'], [])
+
+    def test_iter_json_array_matches_json_loads(self):
+        data = {'seo': {'title': 'x', 'n': [1, 2.5e3]}, 'feed': fixture('feeds_list_breakfast_0.json')['feed'],
+                'related': {'feed': [{'not': 'this'}]}, 'count': 12345}
+        body = json.dumps(data, ensure_ascii=False).encode()
+        for size in (1, 7, len(body)):
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            self.assertEqual(list(iter_json_array(chunks)), data['feed'])
+        self.assertEqual(list(iter_json_array([b'{"feed": [], "n": 1}'])), [])
+        self.assertEqual(list(iter_json_array([b'{"n": 12', b'34, "feed": [7, 89', b'0]}'])), [7, 890])
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"feed": [1, ']))
+
+
+class YummlyProxyViewTest(SimpleTestCase):
+    def setUp(self):
+        caches['yummly'].clear()
+        yummly_cache.reset_stats()
+        self.server = FakeYummlyServer().start()
+        client = YummlyClient(base_url=self.server.url, backoff=0, max_retries=0)
+        patcher = mock.patch('recipe.views.yummly_client', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(client.close)
+        self.addCleanup(self.server.stop)
+
+    def test_categories_list_is_cached(self):
+        self.server.add('/categories/list', {
+            'browse-categories': [{'tracking-id': 't', 'display': {'displayName': 'Cakes', 'tag': 'cake'}}],
+        })
+        url = reverse('recipe:get_categories_list')
+        for _ in range(3):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(response.json()['data'][0]['display name'], 'Cakes')
+
+    def test_upstream_error_status_is_forwarded(self):
+        self.server.add('/feeds/search', {}, status=429)
+        response = self.client.get(reverse('recipe:yummly_search'), {'query': 'egg'})
+        self.assertEqual(response.status_code, 429)
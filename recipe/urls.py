@@ -1,6 +1,7 @@
 from django.urls import path
 
-from .views import RecipeCreateAPIView, RecipeListAPIView, RecipeAPIView, RecipeLikeAPIView, RecipeCommentAPIView, CommentsonRecipesView, MyRecipeView, FeedAPIView, yummly_autocomplete, category_feed, yummly_feeds_list, yummly_search, get_categories_list, get_list_similarities, time_based_yummly_feeds
+from . import async_views
+from .views import RecipeCreateAPIView, RecipeListAPIView, RecipeAPIView, RecipeLikeAPIView, RecipeCommentAPIView, CommentsonRecipesView, MyRecipeView, FeedAPIView, RecipeSearchAPIView, RecipeByIngredientsAPIView, RecommendedRecipesAPIView, SimilarRecipesAPIView, yummly_autocomplete, category_feed, yummly_feeds_list, yummly_search, get_categories_list, get_list_similarities, time_based_yummly_feeds, yummly_cache_stats, recipe_cache_stats
 
 app_name = 'recipe'
 
@@ -8,11 +9,15 @@ urlpatterns = [
     path('', RecipeListAPIView.as_view(), name="recipe-list"),
     path('<int:pk>/', RecipeAPIView.as_view(), name="recipe-detail"),
     path('create/', RecipeCreateAPIView.as_view(), name="recipe-create"),
+    path('<int:pk>/similar/', SimilarRecipesAPIView.as_view(), name='recipe-similar'),
     path('<int:pk>/like/', RecipeLikeAPIView.as_view(), name='recipe-like'),
     path('<int:pk>/comment/', RecipeCommentAPIView.as_view(), name='recipe-comment'),
     path('<int:recipe_id>/comments/', CommentsonRecipesView.as_view(), name='recipe-comments'),
     path('my-recipes/', MyRecipeView.as_view(), name="view-user-recipe"),
     path('feed/', FeedAPIView.as_view(), name='feed'),
+    path('search/', RecipeSearchAPIView.as_view(), name='recipe-search'),
+    path('recommend/by-ingredients/', RecipeByIngredientsAPIView.as_view(), name='recipe-recommend-by-ingredients'),
+    path('recommended/', RecommendedRecipesAPIView.as_view(), name='recipe-recommended'),
     path('yummly-autocomplete/', yummly_autocomplete, name='yummly_autocomplete'),
     path('yummly-search/', yummly_search, name='yummly_search'),
     path('yummly-feeds-list/', yummly_feeds_list, name='yummly_feeds_list'),
@@ -20,4 +25,10 @@ urlpatterns = [
     path('get-categories-list/', get_categories_list, name='get_categories_list'),
     path('get-list-similarities/', get_list_similarities, name='get_list_similarities'),
     path('get-time-based-recipes/', time_based_yummly_feeds, name='get_time_based_feed'),
+    path('yummly-cache-stats/', yummly_cache_stats, name='yummly_cache_stats'),
+    path('cache-stats/', recipe_cache_stats, name='recipe_cache_stats'),
+    path('async/yummly-search/', async_views.yummly_search, name='yummly_search_async'),
+    path('async/category-feed/', async_views.category_feed, name='category_feed_async'),
+    path('async/get-time-based-recipes/', async_views.time_based_yummly_feeds, name='get_time_based_feed_async'),
+    path('async/yummly-batch/', async_views.yummly_batch, name='yummly_batch'),
 ]
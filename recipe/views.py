@@ -1,44 +1,84 @@
 from rest_framework import generics, status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from django.db.models import Count, Max, Sum
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.pagination import PageNumberPagination
 from .models import Recipe, RecipeLike, RecipeComment
-from followers.models import Follower
-from .serializers import RecipeLikeSerializer, RecipeSerializer, RecipeCommentSerializer
+from .feed import fan_out_recipe, get_feed_keys
+from .ingredients import normalize_ingredients
+from .mixins import CachedPayloadMixin, ConditionalGetMixin, RecipeListMixin
+from .pagination import CommentPagination, KeysetPagination
+from .recommender.by_ingredients import get_pantry_staples, ingredient_index
+from .recommender.collaborative import recommend_for_user
+from .recommender.similar import similar_recipes
+from .response_cache import recipe_cache
+from .search import get_search_index
+from .snapshots import (daypart_for_hour, get_snapshot_setting, load_or_build, refresh_if_stale,
+                        seconds_until_next_daypart, snapshot_store)
+from .serializers import RecipeLikeSerializer, RecipeListSerializer, RecipeSerializer, RecipeCommentSerializer
 from .permissions import IsAuthorOrReadOnly
-from django.http import JsonResponse
+from .renderers import JsonResponse
+from .yummly.cache import yummly_cache
+from .yummly.client import yummly_client
+from .yummly.exceptions import YummlyError
+from .yummly.parsers import category_feed_result, feeds_list_result, parse_feed, search_result
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from rest_framework import filters
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from drf_spectacular.utils import extend_schema, OpenApiParameter, inline_serializer
 from drf_spectacular.types import OpenApiTypes
-import requests
 import datetime
+import zoneinfo
 
-headers = {
-	"X-RapidAPI-Key": "0a6b63336amshbafb527ce18a6c9p184c71jsnaa99550c9707",
-	"X-RapidAPI-Host": "yummly2.p.rapidapi.com"
-}
+def cached_yummly(path, params=None, parse=None):
+    """
+    Fetch a Yummly endpoint through the response cache, caching the
+    ``parse``d body when a parser is given.
+    """
+    def fetch():
+        data = yummly_client.get_json(path, params)
+        return parse(data) if parse else data
+    variant = parse.__name__ if parse else ''
+    return yummly_cache.get_or_fetch(path, params, fetch, variant=variant)
 
 @extend_schema(
     description="Retrieve a list of all recipes. Filters can be applied.",
     parameters=[
         OpenApiParameter(name='category__name', description='Filter by recipe category name', required=False, type=OpenApiTypes.STR),
         OpenApiParameter(name='author__username', description='Filter by author username', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='fields', description='Comma-separated fields to return, e.g. id,title,picture', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='view', description='Preset fieldset: full (default) or card', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='expand', description='Comma-separated fields to add to the view, e.g. ingredients,procedure', required=False, type=OpenApiTypes.STR),
     ],
     responses={200: RecipeSerializer(many=True)}
 )
-class RecipeListAPIView(generics.ListAPIView):
+class RecipeListAPIView(ConditionalGetMixin, CachedPayloadMixin, RecipeListMixin, generics.ListAPIView):
     """
     Get: a collection of recipes
     """
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.with_stats()
     serializer_class = RecipeSerializer
     permission_classes = (AllowAny,)
+    pagination_class = KeysetPagination
     filterset_fields = ('category__name', 'author__username')
+    last_modified_is_exact = False
+
+    def get_validators(self):
+        stats = self.filter_queryset(Recipe.objects.all()).aggregate(
+            count=Count('id'), last_modified=Max('updated_at'), versions=Sum('version'))
+        return (stats['count'], stats['last_modified'], stats['versions']), stats['last_modified']
+
+    def get_cache_scopes(self):
+        params = self.request.query_params
+        scopes = {f'{scope}:{params[name]}' for scope, name in (('category', 'category__name'),
+                                                                 ('author', 'author__username'))
+                  if params.get(name)}
+        return scopes or {'all'}
 
 
 @extend_schema(
@@ -58,7 +98,8 @@ class RecipeCreateAPIView(generics.CreateAPIView):
     permission_classes = (IsAuthenticated,)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        fan_out_recipe(recipe)
         self.status = status.HTTP_201_CREATED
 
     def create(self, request, *args, **kwargs):
@@ -75,18 +116,52 @@ class RecipeCreateAPIView(generics.CreateAPIView):
 
 @extend_schema(
     description="Retrieve, update, or delete a recipe.",
+    parameters=[
+        OpenApiParameter(name='fields', description='Comma-separated fields to return, e.g. id,title,picture', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='view', description='Preset fieldset: full (default) or card', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='expand', description='Comma-separated fields to add to the view, e.g. ingredients,procedure', required=False, type=OpenApiTypes.STR),
+    ],
     responses={
         200: RecipeSerializer,
         404: OpenApiTypes.OBJECT
     }
 )
-class RecipeAPIView(generics.RetrieveUpdateDestroyAPIView):
+class RecipeAPIView(ConditionalGetMixin, CachedPayloadMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Get, Update, Delete a recipe
     """
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.with_stats()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthorOrReadOnly,)
+    # The sparse fieldset of a GET; None reads and returns every field.
+    fields = None
+    # Counter changes bump the version but leave updated_at alone.
+    last_modified_is_exact = False
+
+    def get_validators(self):
+        row = Recipe.objects.filter(pk=self.kwargs['pk']).values_list(
+            'updated_at', 'version', 'author__username').first()
+        return (row, row[0]) if row is not None else None
+
+    def get_cache_scopes(self):
+        return {f"recipe:{self.kwargs['pk']}"}
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            self.fields = RecipeListSerializer.requested_fields(request)
+        except ValueError as e:
+            return Response({"status": 0, "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.fields is not None:
+            queryset = RecipeListSerializer.only(queryset, self.fields)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.fields)
+        return super().get_serializer(*args, **kwargs)
 
 
 @extend_schema(
@@ -117,7 +192,6 @@ class RecipeLikeAPIView(generics.CreateAPIView):
         new_like, created = RecipeLike.objects.get_or_create(
             user=request.user, recipe=recipe)
         if created:
-            new_like.save()
             return Response({"status": 1,"message": "Recipe liked successfully."}, status=status.HTTP_201_CREATED)
         return Response({"status": 0,"message": "You already liked this recipe."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -168,9 +242,17 @@ class RecipeCommentAPIView(generics.ListCreateAPIView):
         200: RecipeCommentSerializer(many=True),
     }
 )
-class CommentsonRecipesView(generics.ListCreateAPIView):
+class CommentsonRecipesView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = RecipeComment.objects.all()
     serializer_class = RecipeCommentSerializer
+    pagination_class = CommentPagination
+    last_modified_is_exact = False
+
+    def get_validators(self):
+        # Comments are never edited, so the count and the newest id cover
+        # additions and deletions.
+        stats = self.get_queryset().aggregate(count=Count('id'), last_id=Max('id'), last_modified=Max('created'))
+        return (stats['count'], stats['last_id']), stats['last_modified']
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -191,28 +273,194 @@ class CommentsonRecipesView(generics.ListCreateAPIView):
 class MyRecipeView(generics.ListCreateAPIView):
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticated,)
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
     filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'category_name']
+    search_fields = ['title', 'category__name']
 
     def get_queryset(self):
-        return Recipe.objects.filter(author=self.request.user)
+        return Recipe.objects.with_stats().filter(author=self.request.user)
+
+
+@extend_schema(
+    description="Full-text search over recipe titles, descriptions, ingredients and procedures, best matches first.",
+    parameters=[
+        OpenApiParameter(name='q', description='Search text', required=True, type=OpenApiTypes.STR),
+        OpenApiParameter(name='limit', description='Number of results to return', required=False, type=OpenApiTypes.INT, default=20),
+        OpenApiParameter(name='offset', description='Number of results to skip', required=False, type=OpenApiTypes.INT, default=0),
+    ],
+    responses={
+        200: RecipeSerializer(many=True),
+        400: OpenApiTypes.OBJECT
+    }
+)
+class RecipeSearchAPIView(APIView):
+    """
+    Get: recipes matching a search query
+    """
+    permission_classes = (AllowAny,)
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"status": 0, "message": "The q parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({"status": 0, "message": "limit and offset must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        index = get_search_index()
+        index.sync_if_due()
+        hits = index.search(query, limit=max(limit, 1), offset=max(offset, 0))
+        recipes = Recipe.objects.with_stats().in_bulk([pk for pk, _ in hits])
+        # Recipes deleted since they were indexed are skipped.
+        results = [recipes[pk] for pk, _ in hits if pk in recipes]
+        serializer = RecipeSerializer(results, many=True)
+        return Response({'results': serializer.data})
+
+
+@extend_schema(
+    description="Recipes that can be cooked with the given ingredients, ranked by the share of each recipe's ingredients covered. Common pantry staples count as available.",
+    parameters=[
+        OpenApiParameter(name='ingredients', description='Ingredients on hand, comma separated or repeated', required=True, type=OpenApiTypes.STR),
+        OpenApiParameter(name='limit', description='Number of results to return', required=False, type=OpenApiTypes.INT, default=20),
+        OpenApiParameter(name='max_missing', description='Skip recipes missing more than this many ingredients', required=False, type=OpenApiTypes.INT),
+    ],
+    responses={
+        200: RecipeSerializer(many=True),
+        400: OpenApiTypes.OBJECT
+    }
+)
+class RecipeByIngredientsAPIView(APIView):
+    """
+    Get: recipes ranked by ingredient coverage
+    """
+    permission_classes = (AllowAny,)
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        lines = [line for value in request.query_params.getlist('ingredients') for line in value.split(',')]
+        ingredients = normalize_ingredients(lines)
+        if not ingredients:
+            return Response({"status": 0, "message": "The ingredients parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+            max_missing = request.query_params.get('max_missing')
+            max_missing = int(max_missing) if max_missing not in (None, '') else None
+        except ValueError:
+            return Response({"status": 0, "message": "limit and max_missing must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = ingredient_index.get().recommend(
+            ingredients, limit=limit, max_missing=max_missing, staples=get_pantry_staples())
+        recipes = Recipe.objects.with_stats().in_bulk([pk for pk, _, _ in ranked])
+        results = []
+        for pk, coverage, missing in ranked:
+            if pk not in recipes:
+                continue
+            data = RecipeSerializer(recipes[pk]).data
+            data['coverage'] = round(coverage, 4)
+            data['missing_ingredients'] = missing
+            results.append(data)
+        return Response({'ingredients': ingredients, 'results': results})
+
+
+@extend_schema(
+    description="Recipes recommended to the authenticated user from what similar users liked and bookmarked, falling back to the most liked recipes.",
+    parameters=[
+        OpenApiParameter(name='limit', description='Number of results to return', required=False, type=OpenApiTypes.INT, default=20),
+    ],
+    responses={
+        200: RecipeSerializer(many=True),
+    }
+)
+class RecommendedRecipesAPIView(APIView):
+    """
+    Get: recipes recommended to the current user
+    """
+    permission_classes = (IsAuthenticated,)
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"status": 0, "message": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        recipe_ids = recommend_for_user(request.user, max(limit, 0))
+        recipes = Recipe.objects.with_stats().in_bulk(recipe_ids)
+        serializer = RecipeSerializer([recipes[pk] for pk in recipe_ids if pk in recipes], many=True)
+        return Response({'results': serializer.data})
+
+
+@extend_schema(
+    description="Recipes most similar to this one by title, description, category and ingredients.",
+    parameters=[
+        OpenApiParameter(name='limit', description='Number of results to return', required=False, type=OpenApiTypes.INT, default=10),
+    ],
+    responses={
+        200: RecipeSerializer(many=True),
+        404: OpenApiTypes.OBJECT
+    }
+)
+class SimilarRecipesAPIView(APIView):
+    """
+    Get: recipes similar to a recipe
+    """
+    permission_classes = (AllowAny,)
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, pk, *args, **kwargs):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"status": 0, "message": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = similar_recipes(recipe, limit)
+        recipes = Recipe.objects.with_stats().in_bulk([similar_pk for similar_pk, _ in ranked])
+        results = []
+        for similar_pk, similarity in ranked:
+            if similar_pk in recipes:
+                data = RecipeSerializer(recipes[similar_pk]).data
+                data['similarity'] = round(similarity, 4)
+                results.append(data)
+        return Response({'results': results})
 
 
 @extend_schema(
     description="Retrieve a feed of recipes from users the authenticated user is following.",
+    parameters=[
+        OpenApiParameter(name='fields', description='Comma-separated fields to return, e.g. id,title,picture', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='view', description='Preset fieldset: full (default) or card', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='expand', description='Comma-separated fields to add to the view, e.g. ingredients,procedure', required=False, type=OpenApiTypes.STR),
+    ],
     responses={
         200: RecipeSerializer(many=True),
     }
 )
 class FeedAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get(self, request, *args, **kwargs):
-        following_users = Follower.objects.filter(from_user=request.user).values_list('to_user_id', flat=True)
-        recipes = Recipe.objects.filter(author__in=following_users).order_by('-created_at')
-        serializer = RecipeSerializer(recipes, many=True)
-        return Response(serializer.data)
+        try:
+            serializer = RecipeListSerializer.from_request(request)
+        except ValueError as e:
+            return Response({"status": 0, "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def fetch(position, limit):
+            recipe_ids = [pk for _, pk in get_feed_keys(request.user, limit, position)]
+            rows = {row['id']: row for row in serializer.rows(Recipe.objects.filter(pk__in=recipe_ids))}
+            return [rows[pk] for pk in recipe_ids if pk in rows]
+
+        paginator = self.pagination_class()
+        rows = paginator.paginate(request, fetch)
+        return paginator.get_paginated_response(serializer.serialize(rows))
 
 
 @extend_schema(
@@ -236,14 +484,16 @@ class FeedAPIView(APIView):
 @api_view(['GET'])
 def yummly_autocomplete(request):
     query = request.GET.get('query', '')
-    url = "https://yummly2.p.rapidapi.com/feeds/auto-complete"
-    response = requests.get(url, headers=headers, params={"q": query})
-    if response.status_code == 200:
-        data = response.json()
-        return JsonResponse(data, safe=False)
-    else:
+    try:
+        data = cached_yummly("feeds/auto-complete", {"q": query})
+    except YummlyError:
         return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=500)
+    return JsonResponse(data, safe=False)
+
+
 
+def _parse_search_feed(data):
+    return parse_feed(data, search_result)
 
 
 @csrf_exempt
@@ -282,47 +532,18 @@ def yummly_search(request):
     query = request.GET.get('query', '')
     start = request.GET.get('start', '0')
     maxResults = request.GET.get('maxResults', '20 ')
-    url = "https://yummly2.p.rapidapi.com/feeds/search"
     params = {"q": query,"start": start,"maxResult": maxResults,}
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        parsed_recipes = []
-        for item in data.get('feed', []):
-            title = item.get('content', {}).get('details', {}).get('name')
-            image_url = item.get('content', {}).get('details', {}).get('images', [{}])[0].get('hostedLargeUrl')
-            total_time = item.get('content', {}).get('details', {}).get('totalTime')
-            tags = item.get('content', {}).get('tags', {})
-            course = [{'display-name': tag.get('display-name'), 'tag-url': tag.get('tag-url')} for tag in tags.get('course', [])]
-            cuisine = [{'display-name': tag.get('display-name'), 'tag-url': tag.get('tag-url')} for tag in tags.get('cuisine', [])]
-            holiday = [{'display-name': tag.get('display-name'), 'tag-url': tag.get('tag-url')} for tag in tags.get('holiday', [])]
-            technique = [{'display-name': tag.get('display-name'), 'tag-url': tag.get('tag-url')} for tag in tags.get('technique', [])]
-            preparation_steps = item.get('content', {}).get('preparationSteps', [])
-            # resizable_image_url = item.get('content', {}).get('details', {}).get('images', [{}])[0].get('resizableImageUrl')
-            ingredient_lines = [ line.get('wholeLine') for line in item.get('content', {}).get('ingredientLines', [])]
-    
-            parsed_recipe = {
-                'title': title,
-                'image_url': image_url,
-                'total_time':total_time,
-                'tags': {
-                    'course': course,
-                    'cuisine': cuisine,
-                    'holiday': holiday,
-                    'technique': technique
-                },
-                'preparation_steps': preparation_steps,
-                # 'resizable_image_url': resizable_image_url,
-                'ingredient_lines': ingredient_lines
-            }
-        
-            # Adding the parsed recipe to the list
-            parsed_recipes.append(parsed_recipe)
-    
-        # Returning the parsed recipes as a JSON response
-        return JsonResponse({"data":parsed_recipes}, safe=False)
-    else:
-        return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=response.status_code)
+    try:
+        parsed_recipes = cached_yummly("feeds/search", params, _parse_search_feed)
+    except YummlyError as e:
+        return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=e.status_code)
+
+    # Returning the parsed recipes as a JSON response
+    return JsonResponse({"data":parsed_recipes}, safe=False)
+
+
+def _parse_category_feed(data):
+    return parse_feed(data, category_feed_result)
 
 
 @csrf_exempt
@@ -352,8 +573,6 @@ def category_feed(request):
     limit = request.GET.get('limit', '10')
     tag = request.GET.get('tag', '')
 
-    url = "https://yummly2.p.rapidapi.com/feeds/list"
-
     params = {
         "start": start,
         "limit": limit,
@@ -361,90 +580,55 @@ def category_feed(request):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            data = response.json()
-        
-            filtered_data = []
-            for item in data.get('feed', []):
-                content = item.get('content', {})
-                details = content.get('details', {})
-                tags = content.get('tags', {})
-                images = details.get('images', [])
-                ingredients_info = content.get('ingredientLines', [])  # Get the ingredients part
-                ingredients = [ingredient.get('wholeLine') for ingredient in ingredients_info]
-
-                recipe_info = {
-                    'title': item.get('display', {}).get('displayName'),  # Assuming you meant the recipe name here
-                    'description': content.get('description', {}).get('text'),
-                    'image': images[0].get('hostedLargeUrl') if images else None,
-                    'ingredients':ingredients,
-                    'preparationSteps': content.get('preparationSteps', []),
-                    'course': [tag.get('display-name') for tag in tags.get('course', [])],
-                    'difficulty': [tag.get('display-name') for tag in tags.get('difficulty', [])],
-                    'nutrition': [tag.get('display-name') for tag in tags.get('nutrition', [])],
-                    'technique': [tag.get('display-name') for tag in tags.get('technique', [])],
-                    'total_time': details.get('totalTime'),
-                    'rating': details.get('rating'),
-                    'author': details.get('displayName')
-                }
-                
-                filtered_data.append(recipe_info)
-        
-            return JsonResponse(filtered_data, safe=False)
-        else:
-            return JsonResponse({"error": "Failed to fetch data from Yummly2 API", "status_code": response.status_code}, status=response.status_code)
-    except requests.exceptions.RequestException as e:
-        return JsonResponse({"error": str(e)}, status=500)
-    
+        filtered_data = cached_yummly("feeds/list", params, _parse_category_feed)
+        return JsonResponse(filtered_data, safe=False)
+    except YummlyError as e:
+        return JsonResponse({"error": "Failed to fetch data from Yummly2 API", "status_code": e.status_code}, status=e.status_code)
+
+
+def _parse_feeds_list(data):
+    return parse_feed(data, feeds_list_result)
+
 
 def yummly_feeds_list(start, limit, tag=''):
-    url = "https://yummly2.p.rapidapi.com/feeds/list"
     params = {"start": start, "limit": limit, "tag": tag }
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        filtered_data = []
-        for item in data.get('feed', []):
-            details = item.get('content', {}).get('details', {})
-            content = item.get('content', {})
-            ingredients_info = content.get('ingredientLines', [])  # Get the ingredients part
-
-            # Process ingredients to extract name and amount in imperial format
-            ingredients = []
-            for ingredient in ingredients_info:
-                ingredient_name = ingredient.get('ingredient')
-                amount_imperial = ingredient.get('amount', {}).get('imperial', {})
-                quantity_imperial = amount_imperial.get('quantity')
-                unit_imperial = amount_imperial.get('unit', {}).get('abbreviation', '')
-                
-                ingredients.append(f"{quantity_imperial} {unit_imperial} {ingredient_name}")
-
-            recipe = {
-                'name': details.get('name'),
-                'image': details.get('images', [{}])[0].get('resizableImageUrl'),
-                'totalTime': details.get('totalTime'),
-                'preparationSteps': content.get('preparationSteps', []),
-                'ingredients': ingredients,  # Adjusted to include only names and amounts in imperial
-                'rating': details.get('rating')
-            }
-            filtered_data.append(recipe)
-        
-        return JsonResponse({"data":filtered_data}, safe=False)
-    else:
-        return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=response.status_code)
+    try:
+        filtered_data = cached_yummly("feeds/list", params, _parse_feeds_list)
+    except YummlyError as e:
+        return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=e.status_code)
+    return JsonResponse({"data":filtered_data}, safe=False)
 
 @csrf_exempt
 @require_http_methods(["GET"])  # Only allow GET requests for this view
 def get_list_similarities(request):
-    url = "https://yummly2.p.rapidapi.com/feeds/list-similarities"
     params = request.GET.dict()
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        return JsonResponse(data, safe=False)
-    else:
-        return JsonResponse({"error": "Failed to fetch data from the API"}, status=response.status_code)
+    try:
+        data = cached_yummly("feeds/list-similarities", params)
+    except YummlyError as e:
+        return JsonResponse({"error": "Failed to fetch data from the API"}, status=e.status_code)
+    return JsonResponse(data, safe=False)
+
+def _parse_categories(data):
+    # Initialize an empty list to hold the simplified categories
+    simplified_categories = []
+
+    # Iterate through the categories in the response
+    for category in data.get("browse-categories", []):
+        # Extract the required fields
+        tracking_id = category.get("tracking-id")
+        display_name = category.get("display", {}).get("displayName")
+        category_image = category.get("display", {}).get("categoryImage")
+        tag = category.get("display", {}).get("tag")
+
+        # Add the simplified category to the list
+        simplified_categories.append({
+            "tracking-id": tracking_id,
+            "display name": display_name,
+            "category image": category_image,
+            "tag": tag
+        })
+    return simplified_categories
+
 
 @csrf_exempt
 @extend_schema(
@@ -463,65 +647,102 @@ def get_list_similarities(request):
 )
 @api_view(['GET'])
 def get_categories_list(request):
-    url = "https://yummly2.p.rapidapi.com/categories/list"
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        # Initialize an empty list to hold the simplified categories
-        simplified_categories = []
-        
-        # Iterate through the categories in the response
-        for category in data.get("browse-categories", []):
-            # Extract the required fields
-            tracking_id = category.get("tracking-id")
-            display_name = category.get("display", {}).get("displayName")
-            category_image = category.get("display", {}).get("categoryImage")
-            tag = category.get("display", {}).get("tag")
-            
-            # Add the simplified category to the list
-            simplified_categories.append({
-                "tracking-id": tracking_id,
-                "display name": display_name,
-                "category image": category_image,
-                "tag": tag
-            })
-        
-        # Return the simplified categories as a JsonResponse
-        return JsonResponse({"data":simplified_categories})
+    try:
+        simplified_categories = cached_yummly("categories/list", parse=_parse_categories)
+    except YummlyError as e:
+        return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=e.status_code)
+    # Return the simplified categories as a JsonResponse
+    return JsonResponse({"data":simplified_categories})
+
+
+def time_based_feed_response(request):
+    """
+    Snapshot response for the caller's daypart (``?tz=``), shared by the
+    sync and async time-based feed views.
+    """
+    tz_name = request.GET.get('tz') or settings.TIME_ZONE
+    try:
+        tz = zoneinfo.ZoneInfo(tz_name)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError, OSError):
+        # OSError: names of tzdata directories ("America") or too long.
+        return JsonResponse({"status": 0, "message": "Unknown timezone."}, status=400)
+    now = datetime.datetime.now(tz)
+    daypart = daypart_for_hour(now.hour)
+
+    loaded = snapshot_store.load(daypart)
+    if loaded is None:
+        # Not built yet; build it now rather than fail the first caller.
+        try:
+            loaded = load_or_build(daypart)
+        except YummlyError as e:
+            return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=e.status_code)
+        if loaded is None:
+            # Another process is still building it.
+            response = JsonResponse({"error": "The feed is being prepared, try again shortly."}, status=503)
+            response['Retry-After'] = '1'
+            return response
     else:
-        return JsonResponse({"error": "Failed to fetch data from Yummly2 API"}, status=response.status_code)
+        refresh_if_stale(daypart)
+    snapshot, body = loaded
+
+    etag = f'"{snapshot["version"]}"'
+    max_age = min(get_snapshot_setting('REFRESH_INTERVAL'), seconds_until_next_daypart(now))
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in etags or '*' in etags:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={max_age}'
+    return response
 
 
 @extend_schema(
-    description='Fetch feeds list from Yummly based on the current time of day.',
+    description='Yummly feeds and the most liked local recipes for the time of day in the given timezone, '
+                'served from a precomputed snapshot.',
     summary='Yummly Time-Based Feeds List',
     parameters=[
-        OpenApiParameter(name='start', description='Start index for fetching feeds', required=False, type=OpenApiTypes.INT, default=0),
-        OpenApiParameter(name='limit', description='Number of feeds to fetch', required=False, type=OpenApiTypes.INT, default=10),
+        OpenApiParameter(name='tz', description='IANA timezone of the caller, e.g. Europe/Paris (default: server timezone)',
+                         required=False, type=OpenApiTypes.STR),
     ],
     responses={
-        200: {
-"type": "object",
-
-        },
-        500: OpenApiTypes.OBJECT
+        200: inline_serializer(
+            name='TimeBasedFeedsResponse',
+            fields={
+                'daypart': OpenApiTypes.STR,
+                'data': OpenApiTypes.OBJECT,
+                'local': RecipeSerializer(many=True),
+                'version': OpenApiTypes.STR,
+                'built_at': OpenApiTypes.DATETIME,
+            }
+        ),
+        304: None,
+        400: OpenApiTypes.OBJECT,
+        500: OpenApiTypes.OBJECT,
+        503: OpenApiTypes.OBJECT
     }
 )
 @api_view(['GET'])
 def time_based_yummly_feeds(request):
-        now = datetime.datetime.now()
-        hour = now.hour
-        tag = ''
-
-        if hour < 12:
-            tag = 'list.recipe.search_based:fq:attribute_s_mv:course^course-Breakfast and Brunch'
-        elif 12 <= hour < 15:
-            tag = 'list.recipe.search_based:fq:attribute_s_mv:course^course-Lunch'
-        elif 15 <= hour < 20:
-            tag='list.recipe.search_based: fq:attribute_s_mv: (dish\\ ^ dish\\-cake)'
-        elif 20 <= hour < 23:
-            tag = 'list.recipe.search_based:fq:attribute_s_mv:(course^course-Main Dishes)'
-        else:
-            tag = 'list.recipe.search_based:fq:attribute_s_mv:course^course-Breakfast and Brunch'
-        return yummly_feeds_list(0,5,tag)
+    return time_based_feed_response(request)
 
+@extend_schema(
+    description='Hit and miss counters of the Yummly response cache in this worker process.',
+    summary='Yummly Cache Stats',
+    responses={200: OpenApiTypes.OBJECT}
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def yummly_cache_stats(request):
+    return Response(yummly_cache.stats())
+
+
+@extend_schema(
+    description='Hit and miss counters of the recipe payload cache in this worker process.',
+    summary='Recipe Cache Stats',
+    responses={200: OpenApiTypes.OBJECT}
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def recipe_cache_stats(request):
+    return Response(recipe_cache.stats())
@@ -0,0 +1,133 @@
+"""
+Async counterpart of ``recipe.yummly.client`` for the ASGI proxy views.
+
+Built on ``httpx.AsyncClient`` with the same timeouts, retry policy and
+circuit breaker as the sync client, so one worker can keep many upstream
+requests in flight without blocking a thread on each.
+"""
+import asyncio
+import random
+import weakref
+
+import httpx
+from django.conf import settings
+
+from monitoring.metrics import upstream_call
+
+from .client import DEFAULTS, RETRY_STATUSES, CircuitBreaker
+from .exceptions import YummlyError
+
+
+class AsyncYummlyClient:
+    """
+    Async client returning decoded JSON bodies.
+
+    ``httpx.AsyncClient`` instances are bound to the event loop that created
+    them, so one is kept per running loop. Under ASGI that is a single
+    pooled client per worker; loops that end with the request (async views
+    under WSGI) close theirs with ``aclose_loop()``.
+    """
+
+    def __init__(self, base_url=None, api_key=None, host=None, pool_size=None,
+                 connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff=None, failure_threshold=None, recovery_time=None):
+        config = {**DEFAULTS, **getattr(settings, 'YUMMLY_CLIENT', {})}
+
+        def option(value, name):
+            return config[name] if value is None else value
+
+        self.base_url = option(base_url, 'BASE_URL').rstrip('/')
+        self.timeout = httpx.Timeout(option(read_timeout, 'READ_TIMEOUT'),
+                                     connect=option(connect_timeout, 'CONNECT_TIMEOUT'))
+        self.limits = httpx.Limits(max_connections=option(pool_size, 'POOL_SIZE'),
+                                   max_keepalive_connections=option(pool_size, 'POOL_SIZE'))
+        self.headers = {
+            'X-RapidAPI-Key': option(api_key, 'API_KEY'),
+            'X-RapidAPI-Host': option(host, 'HOST'),
+        }
+        self.max_retries = option(max_retries, 'MAX_RETRIES')
+        self.backoff = option(backoff, 'BACKOFF')
+        self.breaker = CircuitBreaker(option(failure_threshold, 'FAILURE_THRESHOLD'),
+                                      option(recovery_time, 'RECOVERY_TIME'))
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _get_http(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = httpx.AsyncClient(
+                base_url=self.base_url, headers=self.headers,
+                timeout=self.timeout, limits=self.limits)
+        return client
+
+    async def get_json(self, path, params=None):
+        """
+        GET ``path`` and return the decoded JSON body, raising
+        ``YummlyError`` with the status to report when no usable response
+        could be obtained.
+        """
+        with upstream_call('yummly', path.strip('/')):
+            return await self._get_json(path, params)
+
+    async def _get_json(self, path, params):
+        self.breaker.before_call()
+        try:
+            response, status_code = await self._fetch(path, params)
+        except BaseException:
+            # Cancelled (e.g. the client went away) or an unexpected error:
+            # count it, so a half-open trial call is not left running.
+            self.breaker.record_failure()
+            raise
+        if response is None:
+            self.breaker.record_failure()
+            raise YummlyError('Failed to fetch data from Yummly2 API', status_code)
+
+        # Anything but a retryable status means upstream is up, even a 4xx.
+        self.breaker.record_success()
+        if response.status_code != 200:
+            raise YummlyError('Failed to fetch data from Yummly2 API', response.status_code)
+        try:
+            return response.json()
+        except ValueError:
+            raise YummlyError('Yummly2 API returned invalid JSON', 502)
+
+    async def _fetch(self, path, params):
+        """
+        Return the first response not worth retrying and its status, or
+        None and the status to report once the retries are used up.
+        """
+        http = self._get_http()
+        status_code = 502
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            try:
+                response = await http.get('/' + path.lstrip('/'), params=params)
+            except httpx.TimeoutException:
+                status_code = 504
+                continue
+            except httpx.HTTPError:
+                status_code = 502
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                status_code = response.status_code
+                continue
+            return response, response.status_code
+        return None, status_code
+
+    async def aclose_loop(self):
+        """
+        Close the client of the running loop, if it has one.
+        """
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def aclose(self):
+        for client in list(self._clients.values()):
+            await client.aclose()
+        self._clients.clear()
+
+
+async_yummly_client = AsyncYummlyClient()
@@ -0,0 +1,214 @@
+"""
+Response cache for the Yummly proxy endpoints.
+
+Entries are stored in a Django cache (``YUMMLY_CACHE['ALIAS']``) together with
+the time they stop being fresh. Fresh entries are served directly; stale
+entries are served while a single background thread refreshes them; missing
+entries are fetched once per key, with concurrent callers waiting on that
+fetch instead of calling upstream themselves. Coalescing is per process.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from monitoring.metrics import CACHE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'DEFAULT_TTL': 300,
+    'STALE_TTL': 3600,
+    'TTLS': {},
+    'KEY_PREFIX': 'yummly',
+}
+
+
+class _Call:
+    """
+    An upstream fetch in progress, shared by every caller of the same key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class YummlyCache:
+    """
+    TTL + stale-while-revalidate cache with request coalescing.
+    """
+
+    def __init__(self, alias=None, default_ttl=None, stale_ttl=None, ttls=None,
+                 key_prefix=None):
+        config = {**DEFAULTS, **getattr(settings, 'YUMMLY_CACHE', {})}
+        self.alias = alias or config['ALIAS']
+        self.default_ttl = config['DEFAULT_TTL'] if default_ttl is None else default_ttl
+        self.stale_ttl = config['STALE_TTL'] if stale_ttl is None else stale_ttl
+        self.ttls = config['TTLS'] if ttls is None else ttls
+        self.key_prefix = key_prefix or config['KEY_PREFIX']
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._async_inflight = weakref.WeakKeyDictionary()
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'upstream_calls': 0, 'errors': 0}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_ttl(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def make_key(self, endpoint, params=None, variant=''):
+        """
+        Build a key from the endpoint and its parameters, insensitive to
+        parameter order and surrounding whitespace. ``variant`` separates
+        differently processed copies of the same upstream response.
+        """
+        normalized = sorted(
+            (str(name), str(value).strip()) for name, value in (params or {}).items()
+        )
+        digest = hashlib.sha1(json.dumps([variant, normalized]).encode()).hexdigest()
+        return f'{self.key_prefix}:{endpoint}:{digest}'
+
+    def get_or_fetch(self, endpoint, params, fetch, variant=''):
+        """
+        Return the cached response for ``endpoint``/``params``, calling
+        ``fetch()`` to produce it when missing. Exceptions raised by
+        ``fetch`` are propagated and nothing is cached.
+        """
+        key = self.make_key(endpoint, params, variant)
+        entry = self.cache.get(key)
+        if entry is not None:
+            fresh_until, value = entry
+            if time.time() < fresh_until:
+                self._count('hits')
+            else:
+                self._count('stale_hits')
+                self._revalidate(key, endpoint, fetch)
+            return value
+
+        self._count('misses')
+        return self._fetch(key, endpoint, fetch)
+
+    async def aget_or_fetch(self, endpoint, params, fetch, variant=''):
+        """
+        Async variant of ``get_or_fetch`` where ``fetch`` is a coroutine
+        function. Concurrent misses on the same event loop share one task.
+        """
+        key = self.make_key(endpoint, params, variant)
+        entry = await self._in_thread(self.cache.get)(key)
+        if entry is not None:
+            fresh_until, value = entry
+            if time.time() < fresh_until:
+                self._count('hits')
+            else:
+                self._count('stale_hits')
+                self._afetch_task(key, endpoint, fetch, revalidate=True)
+            return value
+
+        self._count('misses')
+        return await asyncio.shield(self._afetch_task(key, endpoint, fetch))
+
+    def _afetch_task(self, key, endpoint, fetch, revalidate=False):
+        inflight = self._async_inflight.setdefault(asyncio.get_running_loop(), {})
+        task = inflight.get(key)
+        if task is None:
+            task = inflight[key] = asyncio.ensure_future(self._afetch(key, endpoint, fetch))
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+            if revalidate:
+                task.add_done_callback(self._log_failed_refresh)
+        return task
+
+    async def _afetch(self, key, endpoint, fetch):
+        self._count('upstream_calls')
+        try:
+            value = await fetch()
+        except Exception:
+            self._count('errors')
+            raise
+        ttl = self.get_ttl(endpoint)
+        await self._in_thread(self.cache.set)(key, (time.time() + ttl, value), ttl + self.stale_ttl)
+        return value
+
+    @staticmethod
+    def _in_thread(func):
+        # Django 4.2's cache.aget()/aset() are thread-sensitive and deadlock
+        # when an async view runs nested under sync middleware. Cache
+        # backends are thread-safe, so any pool thread will do.
+        return sync_to_async(func, thread_sensitive=False)
+
+    @staticmethod
+    def _log_failed_refresh(task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning('Failed to refresh Yummly cache entry', exc_info=task.exception())
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        served = counters['hits'] + counters['stale_hits'] + counters['misses']
+        counters['hit_ratio'] = (counters['hits'] + counters['stale_hits']) / served if served else 0.0
+        return counters
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+        CACHE_EVENTS.labels('yummly', name).inc()
+
+    def _fetch(self, key, endpoint, fetch):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            self._count('upstream_calls')
+            call.value = fetch()
+            ttl = self.get_ttl(endpoint)
+            self.cache.set(key, (time.time() + ttl, call.value), ttl + self.stale_ttl)
+            return call.value
+        except Exception as e:
+            self._count('errors')
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def _revalidate(self, key, endpoint, fetch):
+        with self._lock:
+            if key in self._inflight:
+                return
+
+        def refresh():
+            try:
+                self._fetch(key, endpoint, fetch)
+            except Exception:
+                logger.warning('Failed to refresh Yummly cache entry %s', key, exc_info=True)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+yummly_cache = YummlyCache()
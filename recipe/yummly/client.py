@@ -0,0 +1,205 @@
+"""
+HTTP client for the Yummly API on RapidAPI.
+
+One ``requests.Session`` is shared per client so connections are pooled and
+kept alive across requests. Every call has connect/read timeouts, transient
+failures are retried a bounded number of times with jittered exponential
+backoff, and a circuit breaker stops calling upstream for a while after
+repeated failures so a slow API cannot tie up every worker.
+"""
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from monitoring.metrics import upstream_call
+
+from .exceptions import YummlyError
+from .parsers import iter_json_array
+
+DEFAULTS = {
+    'BASE_URL': 'https://yummly2.p.rapidapi.com',
+    'API_KEY': '',
+    'HOST': 'yummly2.p.rapidapi.com',
+    'POOL_SIZE': 10,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'MAX_RETRIES': 2,
+    'BACKOFF': 0.2,
+    'FAILURE_THRESHOLD': 5,
+    'RECOVERY_TIME': 30,
+}
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class CircuitOpenError(YummlyError):
+    """
+    Raised instead of calling upstream while the circuit breaker is open.
+    """
+
+    def __init__(self, message='Yummly API is temporarily unavailable'):
+        super().__init__(message, status_code=503)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failed calls in a row the circuit opens and
+    calls fail fast for ``recovery_time`` seconds. Then a single trial call
+    is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_time=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial_running or time.monotonic() - self._opened_at < self.recovery_time:
+                raise CircuitOpenError()
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class YummlyClient:
+    """
+    Pooled, keep-alive client returning decoded JSON bodies.
+    """
+
+    def __init__(self, base_url=None, api_key=None, host=None, pool_size=None,
+                 connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff=None, failure_threshold=None, recovery_time=None):
+        config = {**DEFAULTS, **getattr(settings, 'YUMMLY_CLIENT', {})}
+
+        def option(value, name):
+            return config[name] if value is None else value
+
+        self.base_url = option(base_url, 'BASE_URL').rstrip('/')
+        self.timeout = (option(connect_timeout, 'CONNECT_TIMEOUT'),
+                        option(read_timeout, 'READ_TIMEOUT'))
+        self.max_retries = option(max_retries, 'MAX_RETRIES')
+        self.backoff = option(backoff, 'BACKOFF')
+        self.breaker = CircuitBreaker(option(failure_threshold, 'FAILURE_THRESHOLD'),
+                                      option(recovery_time, 'RECOVERY_TIME'))
+
+        pool_size = option(pool_size, 'POOL_SIZE')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'X-RapidAPI-Key': option(api_key, 'API_KEY'),
+            'X-RapidAPI-Host': option(host, 'HOST'),
+        })
+
+    def get_json(self, path, params=None):
+        """
+        GET ``path`` and return the decoded JSON body, raising
+        ``YummlyError`` with the status to report when no usable response
+        could be obtained.
+        """
+        response = self._get(path, params)
+        try:
+            return response.json()
+        except ValueError:
+            raise YummlyError('Yummly2 API returned invalid JSON', 502)
+
+    def iter_feed(self, path, params=None):
+        """
+        GET ``path`` and yield the items of its ``feed`` array as they are
+        read off the connection, without holding the whole body.
+        """
+        with self._get(path, params, stream=True) as response:
+            try:
+                yield from iter_json_array(response.iter_content(STREAM_CHUNK_SIZE), 'feed')
+            except (ValueError, requests.RequestException):
+                raise YummlyError('Yummly2 API returned invalid JSON', 502)
+
+    def _get(self, path, params=None, stream=False):
+        with upstream_call('yummly', path.strip('/')):
+            return self._request(path, params, stream)
+
+    def _request(self, path, params, stream):
+        self.breaker.before_call()
+        try:
+            response, status_code = self._fetch(path, params, stream)
+        except BaseException:
+            # An unexpected error (or KeyboardInterrupt, a worker timeout):
+            # count it, so a half-open trial call is not left running.
+            self.breaker.record_failure()
+            raise
+        if response is None:
+            self.breaker.record_failure()
+            raise YummlyError('Failed to fetch data from Yummly2 API', status_code)
+
+        # Anything else means upstream is up, even a 4xx.
+        self.breaker.record_success()
+        if response.status_code != 200:
+            response.close()
+            raise YummlyError('Failed to fetch data from Yummly2 API', response.status_code)
+        return response
+
+    def _fetch(self, path, params, stream):
+        """
+        Return the first response not worth retrying and its status, or
+        None and the status to report once the retries are used up.
+        """
+        url = f'{self.base_url}/{path.lstrip("/")}'
+        status_code = 502
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._sleep(attempt)
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+            except requests.Timeout:
+                status_code = 504
+                continue
+            except requests.RequestException:
+                status_code = 502
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                status_code = response.status_code
+                response.close()
+                continue
+            return response, response.status_code
+        return None, status_code
+
+    def _sleep(self, attempt):
+        # Full jitter keeps retries from many workers from synchronizing.
+        time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+
+    def close(self):
+        self.session.close()
+
+
+yummly_client = YummlyClient()
@@ -0,0 +1,8 @@
+class YummlyError(Exception):
+    """
+    Raised when the Yummly API does not return a usable response.
+    """
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
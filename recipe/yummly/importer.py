@@ -0,0 +1,233 @@
+"""
+Bulk import of Yummly feeds into the local recipe tables.
+
+``YummlyImporter`` pages through ``feeds/list`` for each tag, streams each
+page item by item through ``parsers.recipe_record`` and upserts them by ``yummly_id`` a
+chunk at a time with ``bulk_create(update_conflicts=True)``. The next
+offset of every tag is recorded in a checkpoint file once its page is
+committed, so an interrupted import resumes where it stopped.
+
+``bulk_create`` does not send ``post_save``; the ingredient links, search
+index and recommender indexes that the signals maintain for single saves
+are updated here per chunk instead.
+"""
+import datetime
+import json
+import logging
+import os
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from ..ingredients import normalize_ingredients
+from ..models import Ingredient, Recipe, RecipeCategory
+from ..recommender.by_ingredients import ingredient_index
+from ..recommender.similar import similar_index
+from ..response_cache import recipe_cache
+from ..search import get_search_index
+from .client import yummly_client
+from .parsers import FeedItem, recipe_record
+
+logger = logging.getLogger(__name__)
+
+AUTHOR_EMAIL = 'yummly-import@localhost'
+DEFAULT_CATEGORY = 'Others'
+UPDATE_FIELDS = ('category', 'title', 'desc', 'cook_time', 'ingredients', 'procedure', 'updated_at')
+
+
+def cook_time(seconds):
+    """
+    ``Recipe.cook_time`` for a duration, capped just below a day.
+    """
+    seconds = min(int(seconds or 0), 24 * 60 * 60 - 1)
+    return datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def get_import_author(email=AUTHOR_EMAIL):
+    """
+    The user imported recipes are attributed to; it cannot log in.
+    """
+    User = get_user_model()
+    try:
+        return User.objects.get(email=email)
+    except User.DoesNotExist:
+        user = User(email=email, username=email.split('@')[0], is_active=False)
+        user.set_unusable_password()
+        user.save()
+        return user
+
+
+def link_ingredients(recipes):
+    """
+    Replace the normalized ingredient links of ``recipes`` in bulk.
+    """
+    Link = Recipe.normalized_ingredients.through
+    names = {recipe.pk: normalize_ingredients(recipe.ingredients) for recipe in recipes}
+    all_names = set().union(*names.values())
+    Ingredient.objects.bulk_create([Ingredient(name=name) for name in all_names], ignore_conflicts=True)
+    ingredient_ids = dict(Ingredient.objects.filter(name__in=all_names).values_list('name', 'pk'))
+    Link.objects.filter(recipe_id__in=names).delete()
+    Link.objects.bulk_create([
+        Link(recipe_id=recipe_id, ingredient_id=ingredient_ids[name])
+        for recipe_id, recipe_names in names.items() for name in recipe_names
+    ])
+
+
+class Checkpoint:
+    """
+    Next ``feeds/list`` offset per tag, persisted as JSON after every page.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path) if path else None
+        self.tags = {}
+        if self.path and self.path.exists():
+            self.tags = json.loads(self.path.read_text())['tags']
+
+    def position(self, tag):
+        """
+        Return ``(start, done)`` for ``tag``.
+        """
+        state = self.tags.get(tag, {})
+        return state.get('start', 0), state.get('done', False)
+
+    def advance(self, tag, start, done=False):
+        self.tags[tag] = {'start': start, 'done': done}
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + '.tmp')
+        temporary.write_text(json.dumps({'tags': self.tags}, indent=2))
+        os.replace(temporary, self.path)
+
+    def delete(self):
+        self.tags = {}
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+class YummlyImporter:
+    """
+    Imports ``feeds/list`` pages for a list of ``(tag, category_name)``
+    pairs. Recipes get their first Yummly course as category, or the tag's
+    category when they have none.
+    """
+
+    def __init__(self, client=None, author=None, checkpoint=None, page_size=40,
+                 chunk_size=500, max_pages=None, progress=None):
+        self.client = client or yummly_client
+        self.author = author or get_import_author()
+        self.checkpoint = checkpoint or Checkpoint(None)
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.max_pages = max_pages
+        self.progress = progress
+        self._category_ids = {}
+
+    def run(self, tags):
+        """
+        Import every tag and return the number of recipes upserted. The
+        checkpoint is deleted once all tags are done.
+        """
+        total = 0
+        for tag, category_name in tags:
+            total += self.import_tag(tag, category_name)
+        if all(self.checkpoint.position(tag)[1] for tag, _ in tags):
+            self.checkpoint.delete()
+        return total
+
+    def import_tag(self, tag, category_name=None):
+        start, done = self.checkpoint.position(tag)
+        total = pages = 0
+        while not done and (self.max_pages is None or pages < self.max_pages):
+            params = {'start': start, 'limit': self.page_size, 'tag': tag}
+            items = 0
+            records = []
+            for item in self.client.iter_feed('feeds/list', params):
+                items += 1
+                record = recipe_record(FeedItem(item))
+                if record and record['id']:
+                    records.append(record)
+            count = self.save(records, category_name or DEFAULT_CATEGORY)
+            total += count
+            pages += 1
+            start += items
+            done = items < self.page_size
+            self.checkpoint.advance(tag, start, done)
+            if self.progress:
+                self.progress(tag, start, count)
+        return total
+
+    def save(self, records, default_category):
+        """
+        Upsert ``records`` and return how many were saved.
+        """
+        # The same recipe often shows up on several pages; keep the last copy.
+        records = list({record['id']: record for record in records}.values())
+        saved = 0
+        for offset in range(0, len(records), self.chunk_size):
+            saved += self._save_chunk(records[offset:offset + self.chunk_size], default_category)
+        return saved
+
+    def _save_chunk(self, records, default_category):
+        category_ids = self._categories(
+            [(record['tags']['course'] or [default_category])[0] for record in records])
+        recipes = []
+        for record in records:
+            name = (record['name'] or '').strip()
+            if not name:
+                continue
+            category = (record['tags']['course'] or [default_category])[0]
+            recipes.append(Recipe(
+                yummly_id=record['id'],
+                author=self.author,
+                category_id=category_ids[category],
+                title=name[:200],
+                desc=(record['description'] or name)[:200],
+                cook_time=cook_time(record['total_time_seconds']),
+                ingredients=[line for line in record['ingredient_lines'] if line],
+                procedure=record['preparation_steps'],
+            ))
+        if not recipes:
+            return 0
+
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes, update_conflicts=True, unique_fields=['yummly_id'],
+                                       update_fields=UPDATE_FIELDS)
+            # Django 4.2 does not return the primary keys of upserted rows.
+            saved = list(Recipe.objects.filter(yummly_id__in=[recipe.yummly_id for recipe in recipes])
+                         .only('pk', 'title', 'desc', 'ingredients', 'procedure'))
+            link_ingredients(saved)
+            recipe_cache.invalidate_recipes([recipe.pk for recipe in saved])
+
+        try:
+            get_search_index().index(saved)
+        except Exception:
+            logger.exception('Failed to update the recipe search index')
+        ingredient_index.invalidate()
+        similar_index.invalidate([recipe.pk for recipe in saved])
+        return len(saved)
+
+    def _categories(self, names):
+        """
+        Map category names to ids, creating the missing categories.
+        """
+        missing = set(names) - self._category_ids.keys()
+        if missing:
+            RecipeCategory.objects.bulk_create([RecipeCategory(name=name) for name in missing], ignore_conflicts=True)
+            self._category_ids.update(RecipeCategory.objects.filter(name__in=missing).values_list('name', 'pk'))
+        return self._category_ids
+
+
+def category_tags(client=None):
+    """
+    ``(tag, display name)`` of every Yummly browse category.
+    """
+    data = (client or yummly_client).get_json('categories/list')
+    pairs = []
+    for category in data.get('browse-categories') or []:
+        display = category.get('display') or {}
+        if display.get('tag'):
+            pairs.append((display['tag'], display.get('displayName') or DEFAULT_CATEGORY))
+    return pairs
@@ -0,0 +1,302 @@
+"""
+Parsing of Yummly feed responses.
+
+Yummly nests each recipe under ``content`` and ``content.details`` and the
+proxy endpoints each return a different subset of it. ``FeedItem`` looks
+the nested dicts up once per item; the ``*_result`` builders turn it into
+the record shape of one endpoint, and ``parse_feed`` applies a builder to
+every item of a decoded response.
+
+``iter_json_array`` decodes the ``feed`` array of a response body item by
+item as the bytes arrive, so large pages are processed with memory bounded
+by the largest item rather than by the page (``YummlyClient.iter_feed``).
+"""
+import codecs
+import json
+import re
+from typing import Dict, List, Optional, TypedDict
+
+TAG_GROUPS = ('course', 'cuisine', 'difficulty', 'holiday', 'nutrition', 'technique')
+SEARCH_TAG_GROUPS = ('course', 'cuisine', 'holiday', 'technique')
+
+DURATION_RE = re.compile(r'(\d+)\s*(d|h|m|s)[a-z]*', re.IGNORECASE)
+DURATION_SECONDS = {'d': 24 * 60 * 60, 'h': 60 * 60, 'm': 60, 's': 1}
+
+EMPTY = {}
+
+Tag = TypedDict('Tag', {'display-name': Optional[str], 'tag-url': Optional[str]})
+
+
+class SearchResult(TypedDict):
+    title: Optional[str]
+    image_url: Optional[str]
+    total_time: Optional[str]
+    tags: Dict[str, List[Tag]]
+    preparation_steps: List[str]
+    ingredient_lines: List[Optional[str]]
+
+
+class CategoryFeedResult(TypedDict):
+    title: Optional[str]
+    description: Optional[str]
+    image: Optional[str]
+    ingredients: List[Optional[str]]
+    preparationSteps: List[str]
+    course: List[Optional[str]]
+    difficulty: List[Optional[str]]
+    nutrition: List[Optional[str]]
+    technique: List[Optional[str]]
+    total_time: Optional[str]
+    rating: Optional[float]
+    author: Optional[str]
+
+
+class FeedsListResult(TypedDict):
+    name: Optional[str]
+    image: Optional[str]
+    totalTime: Optional[str]
+    preparationSteps: List[str]
+    ingredients: List[str]
+    rating: Optional[float]
+
+
+class RecipeRecord(TypedDict):
+    id: Optional[str]
+    name: Optional[str]
+    description: Optional[str]
+    image: Optional[str]
+    total_time: Optional[str]
+    total_time_seconds: Optional[int]
+    rating: Optional[float]
+    author: Optional[str]
+    ingredient_lines: List[Optional[str]]
+    preparation_steps: List[str]
+    tags: Dict[str, List[Optional[str]]]
+
+
+def parse_duration(value):
+    """
+    Seconds in a Yummly duration such as ``'1 hr 30 min'``, or None.
+    """
+    if not value:
+        return None
+    parts = DURATION_RE.findall(str(value))
+    if not parts:
+        return None
+    return sum(int(amount) * DURATION_SECONDS[unit.lower()] for amount, unit in parts)
+
+
+class FeedItem:
+    """
+    The nested dicts of one ``feed`` item, each looked up once.
+    """
+    __slots__ = ('item', 'content', 'details', 'tags', 'image')
+
+    def __init__(self, item):
+        self.item = item
+        self.content = item.get('content') or EMPTY
+        self.details = self.content.get('details') or EMPTY
+        self.tags = self.content.get('tags') or EMPTY
+        images = self.details.get('images')
+        self.image = images[0] if images else EMPTY
+
+    def tag_names(self, group):
+        return [tag.get('display-name') for tag in self.tags.get(group) or ()]
+
+    def whole_lines(self):
+        return [line.get('wholeLine') for line in self.content.get('ingredientLines') or ()]
+
+    def preparation_steps(self):
+        return self.content.get('preparationSteps') or []
+
+
+def search_result(item) -> SearchResult:
+    """
+    Record of ``/api/recipe/yummly-search/``.
+    """
+    content, details, tags = item.content, item.details, item.tags
+    return {
+        'title': details.get('name'),
+        'image_url': item.image.get('hostedLargeUrl'),
+        'total_time': details.get('totalTime'),
+        'tags': {
+            group: [{'display-name': tag.get('display-name'), 'tag-url': tag.get('tag-url')}
+                    for tag in tags.get(group) or ()]
+            for group in SEARCH_TAG_GROUPS
+        },
+        'preparation_steps': content.get('preparationSteps') or [],
+        'ingredient_lines': [line.get('wholeLine') for line in content.get('ingredientLines') or ()],
+    }
+
+
+def category_feed_result(item) -> CategoryFeedResult:
+    """
+    Record of ``/api/recipe/category-feed/``.
+    """
+    content, details, tags = item.content, item.details, item.tags
+    return {
+        'title': (item.item.get('display') or EMPTY).get('displayName'),
+        'description': (content.get('description') or EMPTY).get('text'),
+        'image': item.image.get('hostedLargeUrl'),
+        'ingredients': [line.get('wholeLine') for line in content.get('ingredientLines') or ()],
+        'preparationSteps': content.get('preparationSteps') or [],
+        'course': [tag.get('display-name') for tag in tags.get('course') or ()],
+        'difficulty': [tag.get('display-name') for tag in tags.get('difficulty') or ()],
+        'nutrition': [tag.get('display-name') for tag in tags.get('nutrition') or ()],
+        'technique': [tag.get('display-name') for tag in tags.get('technique') or ()],
+        'total_time': details.get('totalTime'),
+        'rating': details.get('rating'),
+        'author': details.get('displayName'),
+    }
+
+
+def feeds_list_result(item) -> FeedsListResult:
+    """
+    Record of ``/api/recipe/yummly-feeds-list/``: ingredients as imperial
+    amount and name.
+    """
+    content, details = item.content, item.details
+    ingredients = []
+    for line in content.get('ingredientLines') or ():
+        imperial = (line.get('amount') or EMPTY).get('imperial') or EMPTY
+        unit = (imperial.get('unit') or EMPTY).get('abbreviation', '')
+        ingredients.append(f"{imperial.get('quantity')} {unit} {line.get('ingredient')}")
+    return {
+        'name': details.get('name'),
+        'image': item.image.get('resizableImageUrl'),
+        'totalTime': details.get('totalTime'),
+        'preparationSteps': content.get('preparationSteps') or [],
+        'ingredients': ingredients,
+        'rating': details.get('rating'),
+    }
+
+
+def recipe_record(item) -> Optional[RecipeRecord]:
+    """
+    Everything the importer keeps of a recipe, or None for items that are
+    not recipes (promotions, articles).
+    """
+    details = item.details
+    if not details:
+        return None
+    total_time_seconds = details.get('totalTimeInSeconds')
+    if total_time_seconds is None:
+        total_time_seconds = parse_duration(details.get('totalTime'))
+    return {
+        'id': details.get('globalId') or details.get('id'),
+        'name': details.get('name') or (item.item.get('display') or EMPTY).get('displayName'),
+        'description': (item.content.get('description') or EMPTY).get('text'),
+        'image': item.image.get('hostedLargeUrl') or item.image.get('resizableImageUrl'),
+        'total_time': details.get('totalTime'),
+        'total_time_seconds': total_time_seconds,
+        'rating': details.get('rating'),
+        'author': details.get('displayName'),
+        'ingredient_lines': item.whole_lines(),
+        'preparation_steps': item.preparation_steps(),
+        'tags': {group: item.tag_names(group) for group in TAG_GROUPS},
+    }
+
+
+def parse_feed(items, build):
+    """
+    Apply ``build`` to each of ``items``, a decoded response or an
+    iterable of feed items, dropping the items it returns None for.
+    """
+    if isinstance(items, dict):
+        items = items.get('feed') or ()
+    results = []
+    for raw in items:
+        result = build(FeedItem(raw))
+        if result is not None:
+            results.append(result)
+    return results
+
+
+class _StreamDecoder:
+    """
+    Pulls JSON values off a stream of byte chunks, holding only the text
+    not yet consumed.
+    """
+    decoder = json.JSONDecoder()
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buffer += self.text.decode(b'', final=True)
+        else:
+            self.buffer += self.text.decode(chunk)
+        if self.pos > 65536:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number ending the buffer may continue in the next chunk.
+            if end == len(self.buffer) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(chunks, key='feed'):
+    """
+    Yield the elements of the array under ``key`` in the top-level JSON
+    object read from ``chunks`` (bytes), one at a time. Other top-level
+    values are decoded and discarded.
+    """
+    stream = _StreamDecoder(chunks)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name == key and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.pos += 1
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.peek() == ']':
+                        stream.pos += 1
+                        break
+                    stream.expect(',')
+        else:
+            stream.value()
+        if stream.peek() == '}':
+            return
+        stream.expect(',')
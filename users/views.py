@@ -6,6 +6,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 
+from recipe.mixins import RecipeListMixin
 from recipe.models import Recipe
 from .models import Profile, Certificate
 from recipe.serializers import RecipeSerializer
@@ -146,7 +147,7 @@ class UserAvatarAPIView(RetrieveUpdateAPIView):
         return self.request.user.profile
 
 
-class UserBookmarkAPIView(ListCreateAPIView):
+class UserBookmarkAPIView(RecipeListMixin, ListCreateAPIView):
     """
     Get, Create, Delete favorite recipe
     """
@@ -155,9 +156,10 @@ class UserBookmarkAPIView(ListCreateAPIView):
     profile = Profile.objects.all()
 
     def get_queryset(self):
-        user = User.objects.get(id=self.kwargs['pk'])
-        user_profile = get_object_or_404(self.profile, user=user)
-        return user_profile.bookmarks.all()
+        user_profile = get_object_or_404(self.profile, user_id=self.kwargs['pk'])
+        # Annotate before filtering so the bookmark join used for the filter
+        # does not restrict the bookmark totals.
+        return Recipe.objects.with_stats().filter(bookmarked_by=user_profile)
 
     def post(self, request, pk):
         user = User.objects.get(id=pk)